@@ -2,13 +2,24 @@
 
 Safety: provides contexts and quote helpers only.
 Order submission should happen in executor with explicit mode.
+
+Quotes:
+- get_quote(ctx, symbol): one fresh ctx.quote([symbol]) round-trip.
+- get_quotes(ctx, symbols): all symbols in one ctx.quote(list) request (chunks of
+  QUOTE_BATCH_MAX), served from a short-TTL snapshot cache (env QUOTE_CACHE_TTL_SEC,
+  default 5s) so repeated reads within one monitor pass do not hit the network.
+  Every fetch (get_quote included) refreshes the cache; QuoteSnapshot.ts stays the
+  fetch time, so staleness checks still see the real quote age.
 """
 
 from __future__ import annotations
 
+import os
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from longport.openapi import Config, QuoteContext, TradeContext
 
@@ -34,16 +45,40 @@ def make_trade_ctx(config: Config | None = None) -> TradeContext:
     return TradeContext(config or load_config())
 
 
-def get_quote(ctx: QuoteContext, symbol: str) -> QuoteSnapshot:
-    """Best-effort quote snapshot.
+QUOTE_BATCH_MAX = 500  # symbols per quote request (SDK limit)
+QUOTE_CACHE_TTL_SEC = float(os.environ.get('QUOTE_CACHE_TTL_SEC', '5'))
 
-    SDK returns typed objects; we defensively parse expected fields.
-    """
-    resp = ctx.quote([symbol])
-    if not resp:
-        return QuoteSnapshot(symbol=symbol, ts=datetime.now(timezone.utc))
 
-    q = resp[0]
+class QuoteCache:
+    """Thread-safe symbol -> (monotonic fetch time, QuoteSnapshot)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items: Dict[str, Tuple[float, QuoteSnapshot]] = {}
+
+    def get(self, symbol: str, max_age_s: float) -> Optional[QuoteSnapshot]:
+        with self._lock:
+            item = self._items.get(symbol.upper())
+        if item is None or (time.monotonic() - item[0]) > max_age_s:
+            return None
+        return item[1]
+
+    def put(self, snap: QuoteSnapshot):
+        with self._lock:
+            self._items[snap.symbol.upper()] = (time.monotonic(), snap)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+QUOTE_CACHE = QuoteCache()
+
+
+def _parse_quote(symbol: str, q) -> QuoteSnapshot:
+    """SDK returns typed objects; we defensively parse expected fields."""
+    if q is None:
+        return QuoteSnapshot(symbol=symbol, ts=datetime.now(timezone.utc))
 
     def g(obj, name, default=None):
         return getattr(obj, name, default)
@@ -69,6 +104,44 @@ def get_quote(ctx: QuoteContext, symbol: str) -> QuoteSnapshot:
     )
 
 
+def _fetch_quotes(ctx: QuoteContext, symbols: List[str]) -> Dict[str, QuoteSnapshot]:
+    out: Dict[str, QuoteSnapshot] = {}
+    for i in range(0, len(symbols), QUOTE_BATCH_MAX):
+        chunk = symbols[i:i + QUOTE_BATCH_MAX]
+        resp = ctx.quote(chunk) or []
+        by_sym = {str(getattr(q, 'symbol', '') or '').upper(): q for q in resp}
+        if len(chunk) == 1 and len(resp) == 1:
+            by_sym.setdefault(chunk[0].upper(), resp[0])
+        for sym in chunk:
+            snap = _parse_quote(sym, by_sym.get(sym.upper()))
+            QUOTE_CACHE.put(snap)
+            out[sym] = snap
+    return out
+
+
+def get_quote(ctx: QuoteContext, symbol: str) -> QuoteSnapshot:
+    """Best-effort quote snapshot (always a fresh request)."""
+    return _fetch_quotes(ctx, [symbol])[symbol]
+
+
+def get_quotes(ctx: QuoteContext, symbols: Iterable[str], *,
+               max_age_s: Optional[float] = None) -> Dict[str, QuoteSnapshot]:
+    """Quote snapshots for all symbols: cache hits younger than max_age_s (default
+    QUOTE_CACHE_TTL_SEC), the rest in one batched request. {symbol: QuoteSnapshot}."""
+    ttl = QUOTE_CACHE_TTL_SEC if max_age_s is None else float(max_age_s)
+    out: Dict[str, QuoteSnapshot] = {}
+    missing: List[str] = []
+    for sym in dict.fromkeys(symbols):
+        snap = QUOTE_CACHE.get(sym, ttl) if ttl > 0 else None
+        if snap is None:
+            missing.append(sym)
+        else:
+            out[sym] = snap
+    if missing:
+        out.update(_fetch_quotes(ctx, missing))
+    return out
+
+
 def get_quote_twice(ctx: QuoteContext, symbol: str, *, max_drift_pct: float = 0.006):
     # Fetch quote twice and return (q1, q2, drift_pct).
     q1 = get_quote(ctx, symbol)
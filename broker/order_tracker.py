@@ -21,7 +21,7 @@ from typing import Dict, Any
 from broker.orders import list_today_orders, get_order_detail, normalize_status
 from broker.state_store import (
     list_pending_orders, update_pending_order, remove_pending_order,
-    add_open_position, remove_open_position, set_cooldown,
+    add_open_position, remove_open_position, set_cooldown, session,
 )
 from broker.cooldown import iso_after_hours
 
@@ -49,6 +49,7 @@ def _detail_extract(detail: Any) -> dict:
     }
 
 
+@session()
 def reconcile_pending_orders(*, cooldown_hours: float = 24.0) -> Dict[str, Any]:
     pending = list_pending_orders()
     if not pending:
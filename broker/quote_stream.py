@@ -0,0 +1,221 @@
+"""Real-time quote stream for open positions (exit monitoring without polling).
+
+exit_only polls once per cron run, so a stop-loss is seen at most every cron interval.
+ExitQuoteStream keeps a quote subscription for every open_positions symbol and evaluates
+exit_monitor.check_open_positions on each push, for the symbols whose price changed only.
+
+Pieces:
+- Quote source: set_on_quote(cb(symbol, last)) / subscribe(symbols) / unsubscribe(symbols)
+  - LongPortQuoteSource: QuoteContext push API (SubType.Quote)
+  - FakeQuotePublisher: in-process publisher for tests / dry runs (publish(symbol, last))
+- ExitQuoteStream(source, load_positions, on_events)
+  - refresh() + publish() + pump() drive it synchronously (jobs/verify_exit_stream.py)
+  - pushes arrive on the SDK thread and are queued; run() drains the queue on its own thread
+  - on_events(open_positions, events) runs the existing exit path; a symbol is not
+    re-evaluated for retrigger_sec after an event (the exit order needs time to fill)
+  - positions are reloaded after every handled event and every refresh_sec; symbols are
+    subscribed / unsubscribed as positions open and close (on_refresh runs first, e.g.
+    order / position reconcile)
+
+Usage:
+  src = LongPortQuoteSource(make_quote_ctx(load_config()))
+  ExitQuoteStream(src, load_positions, handle_events).run()
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from broker.exit_monitor import ExitEvent, check_open_positions
+
+OnQuote = Callable[[str, Optional[float]], None]
+
+
+def _f(x) -> Optional[float]:
+    try:
+        return float(x) if x is not None else None
+    except Exception:
+        return None
+
+
+class LongPortQuoteSource:
+    """LongPort QuoteContext push subscription (last_done of SubType.Quote pushes)."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+
+    def set_on_quote(self, cb: OnQuote):
+        self.ctx.set_on_quote(lambda symbol, event: cb(symbol, _f(getattr(event, 'last_done', None))))
+
+    def subscribe(self, symbols: List[str]):
+        from longport.openapi import SubType
+        self.ctx.subscribe(symbols, [SubType.Quote], is_first_push=True)
+
+    def unsubscribe(self, symbols: List[str]):
+        from longport.openapi import SubType
+        self.ctx.unsubscribe(symbols, [SubType.Quote])
+
+
+class FakeQuotePublisher:
+    """Local stand-in for LongPortQuoteSource: publish() pushes to subscribed symbols only."""
+
+    def __init__(self):
+        self._cb: Optional[OnQuote] = None
+        self.subscribed: Set[str] = set()
+        self.calls: List[tuple] = []  # ('subscribe' | 'unsubscribe', symbols)
+
+    def set_on_quote(self, cb: OnQuote):
+        self._cb = cb
+
+    def subscribe(self, symbols: List[str]):
+        self.calls.append(('subscribe', sorted(symbols)))
+        self.subscribed.update(s.upper() for s in symbols)
+
+    def unsubscribe(self, symbols: List[str]):
+        self.calls.append(('unsubscribe', sorted(symbols)))
+        self.subscribed.difference_update(s.upper() for s in symbols)
+
+    def publish(self, symbol: str, last: float) -> bool:
+        if self._cb is None or symbol.upper() not in self.subscribed:
+            return False
+        self._cb(symbol, _f(last))
+        return True
+
+
+class ExitQuoteStream:
+    def __init__(
+        self,
+        source,
+        load_positions: Callable[[], Dict[str, dict]],
+        on_events: Callable[[Dict[str, dict], List[ExitEvent]], None],
+        *,
+        refresh_sec: float = 60.0,
+        retrigger_sec: float = 60.0,
+        on_refresh: Optional[Callable[[], None]] = None,
+    ):
+        self.source = source
+        self.load_positions = load_positions
+        self.on_events = on_events
+        self.refresh_sec = float(refresh_sec)
+        self.retrigger_sec = float(retrigger_sec)
+        self.on_refresh = on_refresh
+        self.positions: Dict[str, dict] = {}
+        self.last: Dict[str, float] = {}       # position symbol -> last pushed price
+        self.ticks = 0
+        self.evaluated = 0
+        self._keys: Dict[str, str] = {}        # upper symbol -> open_positions key
+        self._subscribed: Set[str] = set()
+        self._handled_at: Dict[str, float] = {}
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stop = threading.Event()
+        self._next_refresh = 0.0
+        source.set_on_quote(self._on_quote)
+
+    def _on_quote(self, symbol: str, last: Optional[float]):
+        # SDK callback thread: only enqueue
+        self._queue.put((symbol, last))
+
+    def stop(self):
+        self._stop.set()
+        self._queue.put(None)
+
+    def refresh(self):
+        """Reload open positions and (un)subscribe the difference."""
+        if self.on_refresh is not None:
+            try:
+                self.on_refresh()
+            except Exception as e:
+                print(f"  [exit-stream refresh hook failed] {e}")
+        self.positions = dict(self.load_positions() or {})
+        self._keys = {k.upper(): k for k in self.positions}
+        want = set(self._keys.values())
+        gone = sorted(self._subscribed - want)
+        new = sorted(want - self._subscribed)
+        if gone:
+            self.source.unsubscribe(gone)
+            for s in gone:
+                self.last.pop(s, None)
+                self._handled_at.pop(s, None)
+        if new:
+            self.source.subscribe(new)
+        self._subscribed = want
+        self._next_refresh = time.monotonic() + self.refresh_sec
+        if gone or new:
+            print(f"EXIT_STREAM_SUBSCRIPTIONS: +{len(new)} -{len(gone)} total={len(want)}")
+
+    def _drain(self, first) -> Dict[str, float]:
+        """Coalesce queued pushes: {position symbol: latest changed price}."""
+        changed: Dict[str, float] = {}
+        item = first
+        while item is not None:
+            sym, last = item
+            self.ticks += 1
+            key = self._keys.get(str(sym).upper())
+            if key is not None and last is not None and last > 0 and self.last.get(key) != last:
+                self.last[key] = last
+                changed[key] = last
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        return changed
+
+    def process(self, changed: Iterable[str]) -> List[ExitEvent]:
+        now = time.monotonic()
+        syms = [s for s in changed
+                if s in self.positions and now - self._handled_at.get(s, -1e18) >= self.retrigger_sec]
+        if not syms:
+            return []
+        self.evaluated += len(syms)
+        events = check_open_positions({s: self.positions[s] for s in syms}, self.last)
+        if events:
+            for ev in events:
+                self._handled_at[ev.symbol] = now
+            try:
+                self.on_events(self.positions, events)
+            finally:
+                self.refresh()  # the exit path may have closed / changed positions
+        return events
+
+    def pump(self) -> List[ExitEvent]:
+        """Handle every queued push now without blocking (deterministic driver for checks)."""
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return []
+        if item is None:
+            return []
+        changed = self._drain(item)
+        return self.process(changed) if changed else []
+
+    def run(self, max_seconds: Optional[float] = None):
+        """Block until stop() (or max_seconds): refresh, then evaluate every push."""
+        deadline = None if not max_seconds else time.monotonic() + float(max_seconds)
+        self.refresh()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if now >= self._next_refresh:
+                self.refresh()
+            wait = self._next_refresh - now
+            if deadline is not None:
+                wait = min(wait, deadline - now)
+            try:
+                item = self._queue.get(timeout=max(0.01, wait))
+            except queue.Empty:
+                continue
+            if item is None:
+                continue
+            changed = self._drain(item)
+            if changed:
+                self.process(changed)
+        if self._subscribed:
+            try:
+                self.source.unsubscribe(sorted(self._subscribed))
+            except Exception:
+                pass
+            self._subscribed = set()
@@ -14,9 +14,10 @@ from __future__ import annotations
 from typing import Dict, Any
 
 from broker.positions import fetch_stock_positions
-from broker.state_store import load_state, save_state
+from broker.state_store import load_state, save_state, session
 
 
+@session()
 def reconcile_open_positions() -> Dict[str, Any]:
     st = load_state()
     local = st.get('open_positions') or {}
@@ -0,0 +1,351 @@
+"""SQLite backend for the trading state (TRADING_STATE_BACKEND=sqlite).
+
+Why:
+- trading_state.json is one blob: executed_keys grows forever, pending-order lookups scan
+  every order, and full_scan / exit_only / jobs/reconcile_orders.py running at the same
+  time rewrite the whole file over each other.
+
+Storage: data/trades/trading_state.db (env TRADING_STATE_DB)
+- WAL journal: readers never block, writers wait (busy_timeout) instead of failing.
+- One table per state section, one row per key; every mutation is a row-level upsert in
+  its own short transaction, so concurrent processes only ever touch their own rows.
+  Counters (daily, exit_escalations) are incremented in SQL.
+- pending_orders keeps the full record as JSON plus indexed symbol (upper) / side (lower) /
+  status columns for has_pending_symbol_side / pending_order_ids.
+- executed_keys older than EXECUTED_KEYS_TTL_DAYS (default 30) are pruned on open.
+- Other top-level keys (e.g. last_exec_skip) live in the meta table as JSON ('state.<key>').
+
+Migration:
+- On first open the JSON file (state_store.STATE_PATH) is imported once in one transaction;
+  meta 'migrated_from' records it. The JSON file is left in place.
+
+SqliteTradingState has the same methods as state_store.TradingState; use it through
+state_store.session() / the state_store functions.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from broker import state_store
+from broker.state_store import SECTIONS, _cooldown_check, _now_iso, _open_risk
+
+DB_PATH = os.environ.get(
+    'TRADING_STATE_DB', os.path.join(os.path.dirname(__file__), '..', 'data', 'trades', 'trading_state.db'))
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_S = 30.0
+
+_pruned: set = set()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS executed_keys (key TEXT PRIMARY KEY, at TEXT NOT NULL, meta TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_executed_keys_at ON executed_keys(at);
+CREATE TABLE IF NOT EXISTS daily (day TEXT PRIMARY KEY, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS cooldowns (symbol TEXT PRIMARY KEY, until TEXT, reason TEXT);
+CREATE TABLE IF NOT EXISTS open_positions (symbol TEXT PRIMARY KEY, record TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS pending_orders (
+    order_id TEXT PRIMARY KEY, symbol TEXT NOT NULL, side TEXT NOT NULL, status TEXT,
+    updated_at TEXT, record TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_pending_orders_symbol_side ON pending_orders(symbol, side);
+CREATE INDEX IF NOT EXISTS ix_pending_orders_status ON pending_orders(status);
+CREATE TABLE IF NOT EXISTS exit_escalations (symbol TEXT PRIMARY KEY, attempts INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _dumps(x) -> str:
+    return json.dumps(x, ensure_ascii=False, default=str)
+
+
+def _pending_row(order_id: str, rec: Dict[str, Any]) -> tuple:
+    return (order_id, (rec.get('symbol') or '').upper(), (rec.get('side') or '').lower(),
+            rec.get('status'), rec.get('updated_at'), _dumps(rec))
+
+
+# section -> (table, columns (primary key first), dict item -> row, row -> dict value)
+_TABLES = {
+    'executed_keys': ('executed_keys', ('key', 'at', 'meta'),
+                      lambda k, v: (k, (v or {}).get('at') or _now_iso(), _dumps((v or {}).get('meta') or {})),
+                      lambda r: {'at': r[1], 'meta': json.loads(r[2])}),
+    'daily': ('daily', ('day', 'count'),
+              lambda k, v: (k, int(v or 0)),
+              lambda r: r[1]),
+    'cooldowns': ('cooldowns', ('symbol', 'until', 'reason'),
+                  lambda k, v: (k, (v or {}).get('until'), (v or {}).get('reason')),
+                  lambda r: {'until': r[1], 'reason': r[2]}),
+    'open_positions': ('open_positions', ('symbol', 'record'),
+                       lambda k, v: (k, _dumps(v or {})),
+                       lambda r: json.loads(r[1])),
+    'pending_orders': ('pending_orders', ('order_id', 'symbol', 'side', 'status', 'updated_at', 'record'),
+                       lambda k, v: _pending_row(k, v or {}),
+                       lambda r: json.loads(r[5])),
+    'exit_escalations': ('exit_escalations', ('symbol', 'attempts'),
+                         lambda k, v: (k, int(v or 0)),
+                         lambda r: r[1]),
+}
+
+
+def _upsert_sql(table: str, cols: tuple) -> str:
+    sets = ", ".join(f"{c}=excluded.{c}" for c in cols[1:])
+    return (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT({cols[0]}) DO UPDATE SET {sets}")
+
+
+class SqliteTradingState:
+    """Trading state in SQLite (WAL); every mutation commits immediately (row-level)."""
+
+    def __init__(self, path: Optional[str] = None, json_path: Optional[str] = None,
+                 ttl_days: Optional[float] = None):
+        self.path = path or DB_PATH
+        self.json_path = json_path or state_store.STATE_PATH
+        self.ttl_days = float(os.environ.get('EXECUTED_KEYS_TTL_DAYS', '30')) if ttl_days is None else float(ttl_days)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    # --- connection / transactions ---
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._conn is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                c = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None, check_same_thread=False)
+                c.execute("PRAGMA journal_mode=WAL")
+                c.execute("PRAGMA synchronous=NORMAL")
+                c.executescript(_SCHEMA)
+                self._conn = c
+                self._migrate()
+                if self.ttl_days > 0 and self.path not in _pruned:  # once per process and db
+                    _pruned.add(self.path)
+                    self.prune_executed_keys(self.ttl_days)
+            return self._conn
+
+    @contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE ... COMMIT (takes the write lock up front: no upgrade deadlocks)."""
+        with self._lock:
+            c = self.conn
+            c.execute("BEGIN IMMEDIATE")
+            try:
+                yield c
+            except BaseException:
+                c.execute("ROLLBACK")
+                raise
+            c.execute("COMMIT")
+
+    def _one(self, sql: str, args: tuple = ()):
+        with self._lock:
+            return self.conn.execute(sql, args).fetchone()
+
+    def _meta_get(self, key: str) -> Optional[str]:
+        r = self._one("SELECT value FROM meta WHERE key=?", (key,))
+        return r[0] if r else None
+
+    def _migrate(self):
+        c = self._conn
+        if c.execute("SELECT 1 FROM meta WHERE key='schema_version'").fetchone() is not None:
+            return
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            if c.execute("SELECT 1 FROM meta WHERE key='schema_version'").fetchone() is None:
+                src = ''
+                if os.path.exists(self.json_path):
+                    self._put_state(c, state_store._read(self.json_path))
+                    src = os.path.abspath(self.json_path)
+                up = _upsert_sql('meta', ('key', 'value'))
+                c.execute(up, ('schema_version', str(SCHEMA_VERSION)))
+                c.execute(up, ('migrated_from', src))
+                c.execute(up, ('migrated_at', _now_iso()))
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        c.execute("COMMIT")
+
+    def _put_state(self, c: sqlite3.Connection, state: Dict[str, Any]):
+        for sec in SECTIONS:
+            table, cols, to_row, _ = _TABLES[sec]
+            items = state.get(sec) or {}
+            if items:
+                c.executemany(_upsert_sql(table, cols), [to_row(k, v) for k, v in items.items()])
+        extra = [(f"state.{k}", _dumps(v)) for k, v in state.items()
+                 if k not in SECTIONS and k not in ('version', 'updated_at')]
+        if extra:
+            c.executemany(_upsert_sql('meta', ('key', 'value')), extra)
+
+    def _touch(self, c: sqlite3.Connection):
+        c.execute(_upsert_sql('meta', ('key', 'value')), ('updated_at', _now_iso()))
+
+    def _upsert(self, section: str, key: str, value):
+        table, cols, to_row, _ = _TABLES[section]
+        with self._tx() as c:
+            c.execute(_upsert_sql(table, cols), to_row(key, value))
+            self._touch(c)
+
+    def _delete(self, section: str, key: str):
+        table, cols, _, _ = _TABLES[section]
+        with self._tx() as c:
+            c.execute(f"DELETE FROM {table} WHERE {cols[0]}=?", (key,))
+            self._touch(c)
+
+    # --- session interface (see state_store.TradingState) ---
+
+    @property
+    def dirty(self) -> bool:
+        return False
+
+    def flush(self) -> bool:
+        return False  # every mutation is already committed
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reload(self):
+        pass
+
+    def _section(self, section: str) -> Dict[str, Any]:
+        table, cols, _, from_row = _TABLES[section]
+        with self._lock:
+            rows = self.conn.execute(f"SELECT {', '.join(cols)} FROM {table}").fetchall()
+        return {r[0]: from_row(r) for r in rows}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The state as the JSON layout (what load_state() returns)."""
+        with self._lock:
+            out: Dict[str, Any] = {'version': 1, 'updated_at': self._meta_get('updated_at') or _now_iso()}
+            for sec in SECTIONS:
+                out[sec] = self._section(sec)
+            for k, v in self.conn.execute("SELECT key, value FROM meta WHERE key LIKE 'state.%'").fetchall():
+                out[k[len('state.'):]] = json.loads(v)
+        return state_store._loaded(out)
+
+    data = property(snapshot)
+
+    def replace(self, state: Dict[str, Any]):
+        """save_state(): upsert / delete only the rows the caller changed since its load_state().
+
+        Diffed against state.baseline (a dict not from load_state() is diffed against the
+        current rows), so rows another process wrote in between are left alone.
+        """
+        with self._lock:
+            base = getattr(state, 'baseline', None)
+            changes = state_store.state_changes(self.snapshot() if base is None else base, state)
+            if changes:
+                with self._tx() as c:
+                    for sec, k, v in changes:
+                        if sec in SECTIONS:
+                            table, cols, to_row, _ = _TABLES[sec]
+                            if v is state_store._MISSING:
+                                c.execute(f"DELETE FROM {table} WHERE {cols[0]}=?", (k,))
+                            else:
+                                c.execute(_upsert_sql(table, cols), to_row(k, v))
+                        elif sec != 'version':
+                            if v is state_store._MISSING:
+                                c.execute("DELETE FROM meta WHERE key=?", (f"state.{sec}",))
+                            else:
+                                c.execute(_upsert_sql('meta', ('key', 'value')), (f"state.{sec}", _dumps(v)))
+                    self._touch(c)
+            if isinstance(state, state_store.StateSnapshot):
+                state.baseline = copy.deepcopy(dict(state))
+
+    def prune_executed_keys(self, ttl_days: float) -> int:
+        """Delete executed keys older than ttl_days; returns rows removed."""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=float(ttl_days))).isoformat(timespec='seconds')
+        with self._tx() as c:
+            return c.execute("DELETE FROM executed_keys WHERE at < ?", (cutoff,)).rowcount
+
+    # --- idempotency / daily limits / cooldown ---
+
+    def mark_executed(self, key: str, meta: Dict[str, Any] | None = None):
+        self._upsert('executed_keys', key, {'at': _now_iso(), 'meta': meta or {}})
+
+    def was_executed(self, key: str) -> bool:
+        return self._one("SELECT 1 FROM executed_keys WHERE key=?", (key,)) is not None
+
+    def daily_count(self, day_key: str) -> int:
+        r = self._one("SELECT count FROM daily WHERE day=?", (day_key,))
+        return int(r[0]) if r else 0
+
+    def inc_daily(self, day_key: str):
+        with self._tx() as c:
+            c.execute("INSERT INTO daily (day, count) VALUES (?, 1) "
+                      "ON CONFLICT(day) DO UPDATE SET count=count+1", (day_key,))
+            self._touch(c)
+
+    def set_cooldown(self, symbol: str, until_iso: str, reason: str):
+        self._upsert('cooldowns', symbol, {'until': until_iso, 'reason': reason})
+
+    def cooldown_active(self, symbol: str) -> tuple[bool, str]:
+        r = self._one("SELECT until, reason FROM cooldowns WHERE symbol=?", (symbol,))
+        return _cooldown_check({'until': r[0], 'reason': r[1]} if r else None)
+
+    # --- open positions ---
+
+    def add_open_position(self, symbol: str, qty: float, entry: float, sl: float | None, tp: float | None,
+                          meta: Dict[str, Any] | None = None):
+        self._upsert('open_positions', symbol,
+                     {'qty': qty, 'entry': entry, 'sl': sl, 'tp': tp, 'at': _now_iso(), 'meta': meta or {}})
+
+    def remove_open_position(self, symbol: str):
+        self._delete('open_positions', symbol)
+
+    def total_open_risk_usd(self) -> float:
+        return _open_risk(self._section('open_positions'))
+
+    # --- order tracking ---
+
+    def add_pending_order(self, order_id: str, record: Dict[str, Any]):
+        self._upsert('pending_orders', order_id, {**(record or {}), 'updated_at': _now_iso()})
+
+    def update_pending_order(self, order_id: str, patch: Dict[str, Any]):
+        with self._tx() as c:
+            r = c.execute("SELECT record FROM pending_orders WHERE order_id=?", (order_id,)).fetchone()
+            cur = json.loads(r[0]) if r else {}
+            cur.update(patch or {})
+            cur['updated_at'] = _now_iso()
+            c.execute(_upsert_sql('pending_orders', _TABLES['pending_orders'][1]), _pending_row(order_id, cur))
+            self._touch(c)
+
+    def remove_pending_order(self, order_id: str):
+        self._delete('pending_orders', order_id)
+
+    def list_pending_orders(self) -> Dict[str, Any]:
+        return self._section('pending_orders')
+
+    def has_pending_symbol_side(self, symbol: str, side: str) -> bool:
+        return self._one("SELECT 1 FROM pending_orders WHERE symbol=? AND side=? LIMIT 1",
+                         ((symbol or '').upper(), (side or '').lower())) is not None
+
+    def pending_order_ids(self, symbol: str, side: str | None = None) -> List[str]:
+        sql, args = "SELECT order_id FROM pending_orders WHERE symbol=?", [(symbol or '').upper()]
+        if side is not None:
+            sql += " AND side=?"
+            args.append((side or '').lower())
+        with self._lock:
+            return [r[0] for r in self.conn.execute(sql + " ORDER BY rowid", args).fetchall()]
+
+    # --- exit escalation tracking ---
+
+    def get_exit_escalation_attempt(self, symbol: str) -> int:
+        r = self._one("SELECT attempts FROM exit_escalations WHERE symbol=?", (symbol,))
+        return int(r[0]) if r else 0
+
+    def inc_exit_escalation_attempt(self, symbol: str) -> int:
+        with self._tx() as c:
+            c.execute("INSERT INTO exit_escalations (symbol, attempts) VALUES (?, 1) "
+                      "ON CONFLICT(symbol) DO UPDATE SET attempts=attempts+1", (symbol,))
+            n = c.execute("SELECT attempts FROM exit_escalations WHERE symbol=?", (symbol,)).fetchone()[0]
+            self._touch(c)
+        return int(n)
+
+    def reset_exit_escalation(self, symbol: str):
+        self._delete('exit_escalations', symbol)
@@ -1,81 +1,114 @@
 """Local trading state store (idempotency, daily limits, cooldown).
 
 Stored under data/trades/ (gitignored).
+
+Sessions:
+- TradingState loads trading_state.json once, applies every mutation in memory and
+  commits with one atomic write (temp file + rename) on flush() / at the end of session().
+- Mutations are also kept as an op log: if another process rewrote the file since it
+  was loaded, flush() reloads it and replays the ops instead of overwriting their changes.
+- load_state() returns a StateSnapshot that remembers what was loaded; save_state() writes
+  only the keys the caller changed / removed since then, so rows another process wrote in
+  between (e.g. a pending order added during a broker call) survive.
+- The module functions (was_executed, add_pending_order, ...) are thin wrappers. Inside
+  `with session():` they share the calling thread's open TradingState; outside one, each
+  call is its own load + (atomic) write as before. Sessions never span threads.
+
+Backends (env TRADING_STATE_BACKEND):
+- json (default): TradingState over data/trades/trading_state.json.
+- sqlite: broker.state_sqlite.SqliteTradingState over data/trades/trading_state.db (WAL,
+  row-level upserts, indexed pending-order lookups, executed-key TTL). Same methods; the
+  JSON file is imported once on first open.
+
+Usage:
+  from broker.state_store import session
+  with session() as ts:            # or @session() on a function
+      if not ts.was_executed(key):
+          ts.mark_executed(key)
+      add_pending_order(oid, rec)  # wrappers join the open session
 """
 
 from __future__ import annotations
 
+import copy
 import json
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 STATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'trades', 'trading_state.json')
+BACKEND = os.environ.get('TRADING_STATE_BACKEND', 'json').strip().lower()
 
+SECTIONS = ('executed_keys', 'daily', 'cooldowns', 'open_positions', 'pending_orders', 'exit_escalations')
 
-def _now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat(timespec='seconds')
 
+_MISSING = object()
 
-def load_state() -> Dict[str, Any]:
-    try:
-        with open(STATE_PATH, 'r') as f:
-            return json.load(f)
-    except Exception:
-        return {
-            'version': 1,
-            'updated_at': _now_iso(),
-            'executed_keys': {},
-            'daily': {},
-            'cooldowns': {},
-            'open_positions': {},
-            'pending_orders': {},
-            'exit_escalations': {},
-        }
 
+class StateSnapshot(dict):
+    """load_state() result: the state dict plus `baseline`, a private copy of what was loaded."""
 
-def save_state(state: Dict[str, Any]):
-    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
-    state['updated_at'] = _now_iso()
-    with open(STATE_PATH, 'w') as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    __slots__ = ('baseline',)
 
 
-def mark_executed(key: str, meta: Dict[str, Any] | None = None):
-    st = load_state()
-    st.setdefault('executed_keys', {})[key] = {
-        'at': _now_iso(),
-        'meta': meta or {},
-    }
-    save_state(st)
+def _loaded(state: Dict[str, Any]) -> StateSnapshot:
+    snap = StateSnapshot(state)
+    snap.baseline = copy.deepcopy(state)
+    return snap
 
 
-def was_executed(key: str) -> bool:
-    st = load_state()
-    return key in (st.get('executed_keys') or {})
+def state_changes(base: Dict[str, Any], state: Dict[str, Any]) -> List[tuple]:
+    """What save_state(state) changes relative to base: [(section, key, value)].
+
+    SECTIONS are diffed per key (key=None never appears for them); any other top-level
+    value is compared whole (key=None). value is _MISSING for a removed key / section.
+    """
+    out = []
+    for sec in dict.fromkeys([*base, *state]):
+        if sec == 'updated_at':
+            continue
+        old, new = base.get(sec, _MISSING), state.get(sec, _MISSING)
+        if sec in SECTIONS:
+            old = old if isinstance(old, dict) else {}
+            new = new if isinstance(new, dict) else {}
+            for k in dict.fromkeys([*old, *new]):
+                ov, nv = old.get(k, _MISSING), new.get(k, _MISSING)
+                if nv is _MISSING or ov is _MISSING or ov != nv:
+                    if not (nv is _MISSING and ov is _MISSING):
+                        out.append((sec, k, nv if nv is _MISSING else copy.deepcopy(nv)))
+        elif old is _MISSING or new is _MISSING or old != new:
+            out.append((sec, None, new if new is _MISSING else copy.deepcopy(new)))
+    return out
 
 
-def daily_count(day_key: str) -> int:
-    st = load_state()
-    return int((st.get('daily') or {}).get(day_key, 0) or 0)
+def _patch(d: Dict[str, Any], changes: List[tuple]):
+    for sec, k, v in changes:
+        if k is None:
+            if v is _MISSING:
+                d.pop(sec, None)
+            else:
+                d[sec] = copy.deepcopy(v)
+            continue
+        items = d.get(sec)
+        if not isinstance(items, dict):
+            items = d[sec] = {}
+        if v is _MISSING:
+            items.pop(k, None)
+        else:
+            items[k] = copy.deepcopy(v)
 
 
-def inc_daily(day_key: str):
-    st = load_state()
-    d = st.setdefault('daily', {})
-    d[day_key] = int(d.get(day_key, 0) or 0) + 1
-    save_state(st)
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
 
 
-def set_cooldown(symbol: str, until_iso: str, reason: str):
-    st = load_state()
-    st.setdefault('cooldowns', {})[symbol] = {'until': until_iso, 'reason': reason}
-    save_state(st)
+def _empty_state() -> Dict[str, Any]:
+    return {'version': 1, 'updated_at': _now_iso(), **{k: {} for k in SECTIONS}}
 
 
-def cooldown_active(symbol: str) -> tuple[bool, str]:
-    st = load_state()
-    cd = (st.get('cooldowns') or {}).get(symbol)
+def _cooldown_check(cd: Dict[str, Any] | None) -> tuple[bool, str]:
     if not cd:
         return False, ''
     until = cd.get('until')
@@ -90,30 +123,7 @@ def cooldown_active(symbol: str) -> tuple[bool, str]:
     return False, ''
 
 
-def add_open_position(symbol: str, qty: float, entry: float, sl: float | None, tp: float | None, meta: Dict[str, Any] | None = None):
-    st = load_state()
-    st.setdefault('open_positions', {})[symbol] = {
-        'qty': qty,
-        'entry': entry,
-        'sl': sl,
-        'tp': tp,
-        'at': _now_iso(),
-        'meta': meta or {},
-    }
-    save_state(st)
-
-
-def remove_open_position(symbol: str):
-    st = load_state()
-    ops = st.setdefault('open_positions', {})
-    if symbol in ops:
-        ops.pop(symbol, None)
-        save_state(st)
-
-
-def total_open_risk_usd() -> float:
-    st = load_state()
-    ops = st.get('open_positions') or {}
+def _open_risk(ops: Dict[str, Any]) -> float:
     total = 0.0
     for sym, rec in ops.items():
         try:
@@ -129,84 +139,360 @@ def total_open_risk_usd() -> float:
     return total
 
 
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return _empty_state()
+
+
+def _write_atomic(path: str, state: Dict[str, Any]):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, 'w') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class TradingState:
+    """In-memory trading state session: load once, mutate, commit atomically on flush()."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or STATE_PATH
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[int] = None
+        self._ops: List[Callable[[Dict[str, Any]], None]] = []
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The live state dict (loaded on first use). Mutate through the methods."""
+        with self._lock:
+            if self._data is None:
+                self._mtime = _mtime(self.path)
+                self._data = _read(self.path)
+            return self._data
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._ops)
+
+    def _apply(self, op: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            op(self.data)
+            self._ops.append(op)
+
+    def flush(self) -> bool:
+        """Write pending mutations (atomic replace). Returns True if the file was written."""
+        with self._lock:
+            if not self._ops:
+                return False
+            if _mtime(self.path) != self._mtime:
+                # rewritten by someone else since we loaded: replay our ops on their version
+                data = _read(self.path)
+                for op in self._ops:
+                    op(data)
+                self._data = data
+            self._data['updated_at'] = _now_iso()
+            _write_atomic(self.path, self._data)
+            self._mtime = _mtime(self.path)
+            self._ops.clear()
+            return True
+
+    def close(self):
+        self.flush()
+
+    def reload(self):
+        """Drop the in-memory copy (unflushed mutations included) and re-read on next use."""
+        with self._lock:
+            self._data, self._mtime = None, None
+            self._ops.clear()
+
+    def snapshot(self) -> StateSnapshot:
+        """Deep copy of the current state (what load_state() returns)."""
+        with self._lock:
+            return _loaded(copy.deepcopy(self.data))
+
+    def replace(self, state: Dict[str, Any]):
+        """save_state(): apply what the caller changed since its load_state().
+
+        Diffed per key against state.baseline (a dict not from load_state() is diffed
+        against the current state) and recorded as one op, so keys the caller did not touch
+        (a concurrent writer's pending order, ...) survive, also on replay in flush().
+        """
+        with self._lock:
+            base = getattr(state, 'baseline', None)
+            changes = state_changes(self.data if base is None else base, state)
+            if changes:
+                self._apply(lambda d: _patch(d, changes))
+            if isinstance(state, StateSnapshot):
+                state.baseline = copy.deepcopy(dict(state))
+
+    # --- idempotency / daily limits / cooldown ---
+
+    def mark_executed(self, key: str, meta: Dict[str, Any] | None = None):
+        rec = {'at': _now_iso(), 'meta': meta or {}}
+        self._apply(lambda d: d.setdefault('executed_keys', {}).__setitem__(key, copy.deepcopy(rec)))
+
+    def was_executed(self, key: str) -> bool:
+        return key in (self.data.get('executed_keys') or {})
+
+    def daily_count(self, day_key: str) -> int:
+        return int((self.data.get('daily') or {}).get(day_key, 0) or 0)
+
+    def inc_daily(self, day_key: str):
+        def op(d):
+            m = d.setdefault('daily', {})
+            m[day_key] = int(m.get(day_key, 0) or 0) + 1
+        self._apply(op)
+
+    def set_cooldown(self, symbol: str, until_iso: str, reason: str):
+        rec = {'until': until_iso, 'reason': reason}
+        self._apply(lambda d: d.setdefault('cooldowns', {}).__setitem__(symbol, dict(rec)))
+
+    def cooldown_active(self, symbol: str) -> tuple[bool, str]:
+        return _cooldown_check((self.data.get('cooldowns') or {}).get(symbol))
+
+    # --- open positions ---
+
+    def add_open_position(self, symbol: str, qty: float, entry: float, sl: float | None, tp: float | None,
+                          meta: Dict[str, Any] | None = None):
+        rec = {'qty': qty, 'entry': entry, 'sl': sl, 'tp': tp, 'at': _now_iso(), 'meta': meta or {}}
+        self._apply(lambda d: d.setdefault('open_positions', {}).__setitem__(symbol, copy.deepcopy(rec)))
+
+    def remove_open_position(self, symbol: str):
+        if symbol in (self.data.get('open_positions') or {}):
+            self._apply(lambda d: d.setdefault('open_positions', {}).pop(symbol, None))
+
+    def total_open_risk_usd(self) -> float:
+        return _open_risk(self.data.get('open_positions') or {})
+
+    # --- order tracking ---
+
+    def add_pending_order(self, order_id: str, record: Dict[str, Any]):
+        rec = {**(record or {}), 'updated_at': _now_iso()}
+        self._apply(lambda d: d.setdefault('pending_orders', {}).__setitem__(order_id, copy.deepcopy(rec)))
+
+    def update_pending_order(self, order_id: str, patch: Dict[str, Any]):
+        patch = {**(patch or {}), 'updated_at': _now_iso()}
+
+        def op(d):
+            po = d.setdefault('pending_orders', {})
+            cur = po.get(order_id) or {}
+            cur.update(copy.deepcopy(patch))
+            po[order_id] = cur
+        self._apply(op)
+
+    def remove_pending_order(self, order_id: str):
+        if order_id in (self.data.get('pending_orders') or {}):
+            self._apply(lambda d: d.setdefault('pending_orders', {}).pop(order_id, None))
+
+    def list_pending_orders(self) -> Dict[str, Any]:
+        return copy.deepcopy(self.data.get('pending_orders') or {})
+
+    def has_pending_symbol_side(self, symbol: str, side: str) -> bool:
+        sym = (symbol or '').upper()
+        sd = (side or '').lower()
+        for oid, rec in (self.data.get('pending_orders') or {}).items():
+            if (rec.get('symbol') or '').upper() == sym and (rec.get('side') or '').lower() == sd:
+                return True
+        return False
+
+    def pending_order_ids(self, symbol: str, side: str | None = None):
+        sym = (symbol or '').upper()
+        sd = (side or '').lower() if side is not None else None
+        out = []
+        for oid, rec in (self.data.get('pending_orders') or {}).items():
+            if (rec.get('symbol') or '').upper() != sym:
+                continue
+            if sd is not None and (rec.get('side') or '').lower() != sd:
+                continue
+            out.append(oid)
+        return out
+
+    # --- exit escalation tracking ---
+
+    def get_exit_escalation_attempt(self, symbol: str) -> int:
+        return int((self.data.get('exit_escalations') or {}).get(symbol, 0) or 0)
+
+    def inc_exit_escalation_attempt(self, symbol: str) -> int:
+        def op(d):
+            m = d.setdefault('exit_escalations', {})
+            m[symbol] = int(m.get(symbol, 0) or 0) + 1
+        self._apply(op)
+        return self.get_exit_escalation_attempt(symbol)
+
+    def reset_exit_escalation(self, symbol: str):
+        if symbol in (self.data.get('exit_escalations') or {}):
+            self._apply(lambda d: d.setdefault('exit_escalations', {}).pop(symbol, None))
+
+
+def open_state(path: Optional[str] = None):
+    """A new state object for the configured backend (TRADING_STATE_BACKEND)."""
+    if BACKEND == 'sqlite':
+        from broker.state_sqlite import SqliteTradingState
+        return SqliteTradingState(path)
+    return TradingState(path)
+
+
+_local = threading.local()  # per thread: {resolved path: open session}
+
+
+def _default_path() -> str:
+    if BACKEND == 'sqlite':
+        from broker.state_sqlite import DB_PATH
+        return DB_PATH
+    return STATE_PATH
+
+
+def _open_sessions() -> Dict[str, TradingState]:
+    sessions = getattr(_local, 'sessions', None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    return sessions
+
+
+@contextmanager
+def session(path: Optional[str] = None) -> Iterator[TradingState]:
+    """Batch every state_store call in the block into one load and one atomic write.
+
+    Sessions are per thread and per path: a nested session() on the same path joins the
+    thread's open one and only the outermost flushes (also when the block raises, so
+    recorded orders are not lost). Another thread, e.g. a worker running reconcile, gets
+    its own session and flushes it itself; the backend merges concurrent writers (op
+    replay / row upserts).
+    """
+    key = os.path.abspath(path or _default_path())
+    sessions = _open_sessions()
+    ts = sessions.get(key)
+    outer = ts is None
+    if outer:
+        ts = sessions[key] = open_state(path)
+    try:
+        yield ts
+    finally:
+        if outer:
+            try:
+                ts.close()
+            finally:
+                sessions.pop(key, None)
+
+
+def flush():
+    """Commit the calling thread's open sessions now (no-op outside a session)."""
+    for ts in list(_open_sessions().values()):
+        ts.flush()
+
+
+# --- function API (thin wrappers over the active / a one-shot TradingState) ---
+
+def load_state() -> Dict[str, Any]:
+    with session() as ts:
+        return ts.snapshot()
+
+
+def save_state(state: Dict[str, Any]):
+    with session() as ts:
+        ts.replace(state)
+
+
+def mark_executed(key: str, meta: Dict[str, Any] | None = None):
+    with session() as ts:
+        ts.mark_executed(key, meta)
+
+
+def was_executed(key: str) -> bool:
+    with session() as ts:
+        return ts.was_executed(key)
+
+
+def daily_count(day_key: str) -> int:
+    with session() as ts:
+        return ts.daily_count(day_key)
+
+
+def inc_daily(day_key: str):
+    with session() as ts:
+        ts.inc_daily(day_key)
+
+
+def set_cooldown(symbol: str, until_iso: str, reason: str):
+    with session() as ts:
+        ts.set_cooldown(symbol, until_iso, reason)
+
+
+def cooldown_active(symbol: str) -> tuple[bool, str]:
+    with session() as ts:
+        return ts.cooldown_active(symbol)
+
+
+def add_open_position(symbol: str, qty: float, entry: float, sl: float | None, tp: float | None, meta: Dict[str, Any] | None = None):
+    with session() as ts:
+        ts.add_open_position(symbol, qty, entry, sl, tp, meta)
+
+
+def remove_open_position(symbol: str):
+    with session() as ts:
+        ts.remove_open_position(symbol)
+
+
+def total_open_risk_usd() -> float:
+    with session() as ts:
+        return ts.total_open_risk_usd()
+
+
 # --- order tracking ---
 
 def add_pending_order(order_id: str, record: Dict[str, Any]):
-    st = load_state()
-    st.setdefault('pending_orders', {})[order_id] = {
-        **(record or {}),
-        'updated_at': _now_iso(),
-    }
-    save_state(st)
+    with session() as ts:
+        ts.add_pending_order(order_id, record)
 
 
 def update_pending_order(order_id: str, patch: Dict[str, Any]):
-    st = load_state()
-    po = st.setdefault('pending_orders', {})
-    cur = po.get(order_id) or {}
-    cur.update(patch or {})
-    cur['updated_at'] = _now_iso()
-    po[order_id] = cur
-    save_state(st)
+    with session() as ts:
+        ts.update_pending_order(order_id, patch)
 
 
 def remove_pending_order(order_id: str):
-    st = load_state()
-    po = st.setdefault('pending_orders', {})
-    if order_id in po:
-        po.pop(order_id, None)
-        save_state(st)
+    with session() as ts:
+        ts.remove_pending_order(order_id)
 
 
 def list_pending_orders() -> Dict[str, Any]:
-    st = load_state()
-    return st.get('pending_orders') or {}
+    with session() as ts:
+        return ts.list_pending_orders()
 
 
 # --- exit escalation tracking ---
 
 def get_exit_escalation_attempt(symbol: str) -> int:
-    st = load_state()
-    return int((st.get('exit_escalations') or {}).get(symbol, 0) or 0)
+    with session() as ts:
+        return ts.get_exit_escalation_attempt(symbol)
 
 
 def inc_exit_escalation_attempt(symbol: str) -> int:
-    st = load_state()
-    m = st.setdefault('exit_escalations', {})
-    m[symbol] = int(m.get(symbol, 0) or 0) + 1
-    save_state(st)
-    return int(m[symbol])
+    with session() as ts:
+        return ts.inc_exit_escalation_attempt(symbol)
 
 
 def reset_exit_escalation(symbol: str):
-    st = load_state()
-    m = st.setdefault('exit_escalations', {})
-    if symbol in m:
-        m.pop(symbol, None)
-        save_state(st)
+    with session() as ts:
+        ts.reset_exit_escalation(symbol)
 
 
 def has_pending_symbol_side(symbol: str, side: str) -> bool:
-    sym = (symbol or '').upper()
-    sd = (side or '').lower()
-    st = load_state()
-    po = st.get('pending_orders') or {}
-    for oid, rec in po.items():
-        if (rec.get('symbol') or '').upper() == sym and (rec.get('side') or '').lower() == sd:
-            return True
-    return False
+    with session() as ts:
+        return ts.has_pending_symbol_side(symbol, side)
 
 
 def pending_order_ids(symbol: str, side: str | None = None):
-    sym = (symbol or '').upper()
-    sd = (side or '').lower() if side is not None else None
-    st = load_state()
-    po = st.get('pending_orders') or {}
-    out = []
-    for oid, rec in po.items():
-        if (rec.get('symbol') or '').upper() != sym:
-            continue
-        if sd is not None and (rec.get('side') or '').lower() != sd:
-            continue
-        out.append(oid)
-    return out
+    with session() as ts:
+        return ts.pending_order_ids(symbol, side)
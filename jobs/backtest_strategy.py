@@ -9,6 +9,7 @@ Strategy (entry)
 - rsi14 < rsi_entry
 - ret_5d < ret5_entry
 - ret_1y > ret1y_min  (computed in-bar using lookback bars)
+- RS_1Y > rs_1y_floor  (point-in-time: rs_strength.rs_1y_series, daily closes known before each bar)
 - macd_hist < 0
 
 Exit
@@ -17,12 +18,14 @@ Exit
 - max holding bars (hold_max)
 
 Data
-- yfinance interval=1h, period=730d (max)
-- auto_adjust=True
+- Local parquet store (data_store) read through the mmap cache (ohlcv_cache); --no-sync skips
+  the network so parameter sweeps replay the same history
+- Fallback: yfinance interval=1h, period=730d (max), auto_adjust=True
 
 Usage examples
   python3 jobs/backtest_strategy.py --ticker TSLA
   python3 jobs/backtest_strategy.py --ticker TSLA --period 730d --out data/processed/tsla_trades.csv
+  (whole universe in parallel: jobs/backtest_universe.py; parameter sweeps: jobs/sweep_params.py)
 
 Notes
 - This script is intentionally *self-contained* (no dashboard side effects).
@@ -42,14 +45,22 @@ import numpy as np
 # local imports
 import sys, os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-from analyzer.indicators import add_all_indicators, add_crossover_signals
+from analyzer.indicators import compute_indicators, add_crossover_signals
+from analyzer.incremental import add_all_indicators_incremental
+from strategy.structure import STRUCTURE_NEEDS
+
+# entry_condition + add_crossover_signals + structure entries
+BACKTEST_NEEDS = frozenset({
+    "rsi14", "above_ma200", "above_ma50", "ret_5d", "macd_hist",
+    "ma5", "ma20", "ma50", "ma200", "macd", "macd_signal", "atr14",
+}) | STRUCTURE_NEEDS
 
 # RS module (relative strength vs SPY)
 try:
     sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-    from rs_strength import compute_rs_1y as compute_rs_1y_fn
+    from rs_strength import rs_1y_series as rs_1y_series_fn
 except Exception:
-    compute_rs_1y_fn = None
+    rs_1y_series_fn = None
 
 
 @dataclass
@@ -90,17 +101,17 @@ class Params:
     warmup_bars: int = 300
 
 
-def load_1h_history(ticker: str, period: str = "730d") -> pd.DataFrame:
+def load_1h_history(ticker: str, period: str = "730d", sync_store: bool = True, yf_fallback: bool = True) -> pd.DataFrame:
     """Load 1H history.
 
     Priority:
-    1) Local Parquet store (sync recent window first)
-    2) Fallback to yfinance period fetch
+    1) Local Parquet store via the mmap cache (sync recent window first unless sync_store=False)
+    2) Fallback to yfinance period fetch (skipped when yf_fallback=False)
 
     Note: period kept for CLI compatibility.
     """
     try:
-        from data_store import sync_and_load
+        from ohlcv_cache import load_history
         # Prefer local store for stability. For long periods, request a full backfill window.
         lb = 120
         try:
@@ -109,10 +120,18 @@ def load_1h_history(ticker: str, period: str = "730d") -> pd.DataFrame:
                 lb = 800 if days >= 365 else max(120, days + 10)
         except Exception:
             pass
-        df = sync_and_load(ticker, interval="1h", lookback_days=lb, max_auto_lookback_days=800)
+        df = load_history(ticker, "1h", sync_store=sync_store, lookback_days=lb, max_auto_lookback_days=800)
     except Exception:
-        # fallback to yfinance
-        df = yf.Ticker(ticker).history(period=period, interval="1h", auto_adjust=True)
+        df = None
+    if df is not None and not df.empty:
+        # store frames are already normalized; history is append-only, so reuse cached indicator rows
+        df = add_all_indicators_incremental(df, ticker, interval="1h")
+        return add_crossover_signals(df)
+    if not yf_fallback:
+        return pd.DataFrame()
+
+    # fallback to yfinance
+    df = yf.Ticker(ticker).history(period=period, interval="1h", auto_adjust=True)
 
     if df is None or df.empty:
         return pd.DataFrame()
@@ -128,7 +147,7 @@ def load_1h_history(ticker: str, period: str = "730d") -> pd.DataFrame:
             pass
 
     df.columns = [c.lower() for c in df.columns]
-    df = add_all_indicators(df)
+    df = compute_indicators(df, needs=BACKTEST_NEEDS)
     df = add_crossover_signals(df)
     return df
 
@@ -142,16 +161,74 @@ def compute_ret1y(df: pd.DataFrame, i: int, lookback: int) -> float:
     return (cur_close - start_close) / start_close
 
 
-def entry_condition(df: pd.DataFrame, i: int, p: Params, rs_1y: float) -> Tuple[bool, Dict]:
-    """Mean-reversion style entry (legacy)."""
-    row = df.iloc[i]
+def entry_features(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Per-bar inputs of entry_condition for every bar at once (they do not depend on Params).
+
+    Same values as the per-bar path (row lookups, _ma_slope_pct / _cross_count on the trailing
+    series), so a parameter sweep computes them once per ticker.
+    """
+    n = len(df)
+
+    def col(name, default):
+        if name in df.columns:
+            return df[name].to_numpy(dtype=float)
+        return np.full(n, float(default))
+
+    close = col("close", 0)
+    f = {
+        "rsi14": col("rsi14", 99),
+        "above_ma200": col("above_ma200", 0),
+        "above_ma50": col("above_ma50", 0),
+        "ret_5d": col("ret_5d", 0),
+        "macd_hist": col("macd_hist", 0),
+        "close": close,
+        "ma200": df["ma200"].to_numpy(dtype=float) if "ma200" in df.columns else close,
+        "ma50": df["ma50"].to_numpy(dtype=float) if "ma50" in df.columns else close,
+        "atr14": col("atr14", 0),
+    }
+
+    # _ma_slope_pct(ma200[:i+1], 50): ma[i] / ma[i-49] - 1, 0 before 51 bars or when ma[i-49] == 0
+    slope = np.zeros(n)
+    if "ma200" in df.columns and n > 50:
+        ma = f["ma200"]
+        a, b = ma[1:n - 49], ma[50:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope[50:] = np.where(a == 0, 0.0, (b / a - 1.0) * 100.0)
+    f["ma200_slope_pct"] = slope
+
+    # _cross_count(close[:i+1], ma50[:i+1], 80): sign flips between consecutive non-zero signs,
+    # both inside the trailing 80-bar window
+    crosses = np.zeros(n, dtype=int)
+    if "ma50" in df.columns and "close" in df.columns and n:
+        sign = np.sign(close - f["ma50"])
+        nz = np.flatnonzero(np.nan_to_num(sign) != 0)
+        flip = sign[nz[1:]] != sign[nz[:-1]]
+        q, prev = nz[1:][flip], nz[:-1][flip]  # flip bar, previous non-zero bar
+        i = np.arange(n)
+        upto = np.searchsorted(q, i, side="right")
+        expired = np.searchsorted(prev, i - 79, side="left")
+        crosses = upto - np.minimum(upto, expired)
+    f["ma50_crosses"] = crosses
+    return f
+
+
+def entry_condition(df: pd.DataFrame, i: int, p: Params, rs_1y: float,
+                    features: Optional[Dict[str, np.ndarray]] = None) -> Tuple[bool, Dict]:
+    """Mean-reversion style entry (legacy).
+
+    features: precomputed entry_features(df); otherwise read from the row / trailing series.
+    """
+    if features is not None:
+        row = {k: v[i] for k, v in features.items()}
+    else:
+        row = df.iloc[i]
 
     rsi = float(row.get("rsi14", 99))
     above200 = int(row.get("above_ma200", 0))
     above50 = int(row.get("above_ma50", 0))
     ret5 = float(row.get("ret_5d", 0))
     macd_h = float(row.get("macd_hist", 0))
-    
+
 
     # apply dynamic ret5 downgrade (same thresholds as live scan)
     ret5_entry = p.ret5_entry
@@ -191,8 +268,12 @@ def entry_condition(df: pd.DataFrame, i: int, p: Params, rs_1y: float) -> Tuple[
     atr_pct = (atr14 / close * 100) if close else 0.0
 
     # slope computed on trailing MA series up to i (no look-ahead)
-    ma200_slope_pct = _ma_slope_pct(df["ma200"].iloc[: i + 1], window=50) if "ma200" in df.columns else 0.0
-    ma50_crosses = _cross_count(df["close"].iloc[: i + 1], df["ma50"].iloc[: i + 1], window=80) if ("ma50" in df.columns and "close" in df.columns) else 0
+    if features is not None:
+        ma200_slope_pct = float(row["ma200_slope_pct"])
+        ma50_crosses = int(row["ma50_crosses"])
+    else:
+        ma200_slope_pct = _ma_slope_pct(df["ma200"].iloc[: i + 1], window=50) if "ma200" in df.columns else 0.0
+        ma50_crosses = _cross_count(df["close"].iloc[: i + 1], df["ma50"].iloc[: i + 1], window=80) if ("ma50" in df.columns and "close" in df.columns) else 0
 
     # thresholds (chosen from core-pool distribution; conservative)
     # - ret_5d <= -5% is ~5th percentile of core-pool bars → treat as knife pressure
@@ -356,18 +437,37 @@ def _structure_sl(
         return None
 
 
-def _structure_entry(df: pd.DataFrame, i: int, p: Params) -> Tuple[bool, Dict, Optional[float], Optional[float]]:
+def _structure_series(df: pd.DataFrame, p: Params) -> Optional[pd.DataFrame]:
+    """Structure signals for every bar at once (strategy.structure *_series), or None."""
+    try:
+        from strategy.structure import StructureParams, structure_1buy_series, structure_2buy_series
+
+        sp = StructureParams(rr=p.rr)
+        if p.entry_mode == 'structure_1buy':
+            return structure_1buy_series(df, sp)
+        if p.entry_mode == 'structure_2buy':
+            return structure_2buy_series(df, sp)
+    except Exception:
+        pass
+    return None
+
+
+def _structure_entry(df: pd.DataFrame, i: int, p: Params, series: Optional[pd.DataFrame] = None) -> Tuple[bool, Dict, Optional[float], Optional[float]]:
     """Structure breakout/pullback entry (1buy/2buy).
 
+    series: precomputed _structure_series(df, p); falls back to the per-bar signal functions.
+
     Returns: (ok, meta, entry_sl, entry_tp)
     """
     try:
         import sys as _sys, os as _os
         _sys.path.insert(0, _os.path.join(_os.path.dirname(__file__), '..', 'src'))
-        from strategy.structure import StructureParams, structure_1buy_signal, structure_2buy_signal
+        from strategy.structure import StructureParams, series_signal, structure_1buy_signal, structure_2buy_signal
 
         sp = StructureParams(rr=p.rr)
-        if p.entry_mode == 'structure_1buy':
+        if series is not None:
+            sig = series_signal(series, i, p.entry_mode.replace('structure_', ''))
+        elif p.entry_mode == 'structure_1buy':
             sig = structure_1buy_signal(df, i, sp)
         elif p.entry_mode == 'structure_2buy':
             sig = structure_2buy_signal(df, i, sp)
@@ -392,17 +492,35 @@ def _structure_entry(df: pd.DataFrame, i: int, p: Params) -> Tuple[bool, Dict, O
         return False, {}, None, None
 
 
-def backtest(df: pd.DataFrame, p: Params, ticker: str = "") -> pd.DataFrame:
+def rs_1y_bars(df: pd.DataFrame, ticker: str) -> np.ndarray:
+    """Point-in-time RS_1Y per bar (daily closes known before the bar, no look-ahead); -999 if unavailable."""
+    if rs_1y_series_fn is not None and ticker:
+        try:
+            return rs_1y_series_fn(ticker, df.index).to_numpy(dtype=float)
+        except Exception:
+            pass
+    return np.full(len(df), -999.0)
+
+
+def backtest(
+    df: pd.DataFrame,
+    p: Params,
+    ticker: str = "",
+    rs_1y: Optional[np.ndarray] = None,
+    features: Optional[Dict[str, np.ndarray]] = None,
+) -> pd.DataFrame:
+    """Serial 1H backtest of one ticker.
+
+    rs_1y / features: precomputed rs_1y_bars(df, ticker) / entry_features(df), shared by
+    callers that run many Params over the same frame (jobs/sweep_params.py).
+    """
     if df.empty:
         return pd.DataFrame()
 
-    # Precompute RS_1Y once per backtest (avoid per-bar network calls)
-    rs_1y = -999.0
-    if compute_rs_1y_fn is not None and ticker:
-        try:
-            rs_1y = compute_rs_1y_fn(ticker)
-        except Exception:
-            rs_1y = -999.0
+    if rs_1y is None:
+        rs_1y = rs_1y_bars(df, ticker)
+    if features is None and not p.entry_mode.startswith('structure_'):
+        features = entry_features(df)
 
     trades: List[Dict] = []
     in_trade = False
@@ -415,6 +533,9 @@ def backtest(df: pd.DataFrame, p: Params, ticker: str = "") -> pd.DataFrame:
 
     start_i = max(p.warmup_bars, p.ret1y_lookback_bars)  # deterministic start
 
+    # structure modes: detect 1buy/2buy for all bars in one pass instead of per bar
+    struct_series = _structure_series(df, p) if p.entry_mode.startswith('structure_') else None
+
     for i in range(start_i, len(df)):
         if not in_trade:
             # ── entry ──
@@ -422,9 +543,9 @@ def backtest(df: pd.DataFrame, p: Params, ticker: str = "") -> pd.DataFrame:
             entry_tp = None
 
             if p.entry_mode.startswith('structure_'):
-                ok, meta, entry_sl, entry_tp = _structure_entry(df, i, p)
+                ok, meta, entry_sl, entry_tp = _structure_entry(df, i, p, struct_series)
             else:
-                ok, meta = entry_condition(df, i, p, rs_1y)
+                ok, meta = entry_condition(df, i, p, float(rs_1y[i]), features)
 
             if ok:
                 in_trade = True
@@ -593,12 +714,8 @@ def summarize(trades: pd.DataFrame) -> Dict:
     }
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--ticker", required=True)
-    ap.add_argument("--period", default="730d")
-    ap.add_argument("--out", default="")
-
+def add_params_args(ap: argparse.ArgumentParser) -> None:
+    """Strategy knobs shared by every backtest CLI (single ticker, universe runner)."""
     ap.add_argument("--tp", type=float, default=0.13, help="Fixed TP pct (used when --risk_mode=fixed)")
     ap.add_argument("--sl", type=float, default=-0.08, help="Fixed SL pct (used when --risk_mode=fixed)")
     ap.add_argument("--hold", type=int, default=195)
@@ -619,9 +736,9 @@ def main():
     ap.add_argument("--warmup", type=int, default=300)
     ap.add_argument("--ret1y_lookback", type=int, default=1638)
 
-    args = ap.parse_args()
 
-    p = Params(
+def params_from_args(args: argparse.Namespace) -> Params:
+    return Params(
         entry_mode=args.entry_mode,
         rsi_entry=args.rsi,
         ret5_entry=args.ret5,
@@ -641,7 +758,19 @@ def main():
         ret1y_lookback_bars=args.ret1y_lookback,
     )
 
-    df = load_1h_history(args.ticker, period=args.period)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticker", required=True)
+    ap.add_argument("--period", default="730d")
+    ap.add_argument("--out", default="")
+    ap.add_argument("--no-sync", action="store_true", help="Use the local store as-is (no network; mmap cache)")
+    add_params_args(ap)
+    args = ap.parse_args()
+
+    p = params_from_args(args)
+
+    df = load_1h_history(args.ticker, period=args.period, sync_store=not args.no_sync)
     if df.empty:
         print(f"No data for {args.ticker}")
         return
@@ -0,0 +1,244 @@
+"""Universe backtest runner: backtest_strategy.backtest() over many tickers in a process pool.
+
+Goal
+- jobs/backtest_strategy.py runs one --ticker; a 500-name 730d sweep done serially uses one
+  core for an hour. Fan the same backtest out across a ProcessPoolExecutor instead.
+
+Data
+- Workers read the local parquet store through the mmap cache (no network, no yfinance
+  fallback unless --yf-fallback). --sync runs one data_store.sync_many in the parent first.
+- Tickers without stored 1H history are reported as status=no_data.
+
+Output (--out-dir, default data/processed/backtest_universe)
+- params.json          Params + period of the run (resume refuses a different config)
+- progress.jsonl       one line per finished ticker: status, seconds, summarize() stats
+- trades/{TICKER}.csv  trades of one ticker (written as soon as it finishes)
+- all_trades.csv       every trade with a ticker column, sorted by entry_time
+- summary.csv          per-ticker summary table
+
+Resume
+- --resume skips tickers already in progress.jsonl with status ok / no_data; error and
+  timeout tickers are retried. It refuses to start on a progress.jsonl without params.json;
+  without --resume an existing progress.jsonl is discarded.
+
+Usage
+  python3 jobs/backtest_universe.py --watchlist
+  python3 jobs/backtest_universe.py --full --workers 8 --timeout 300 --resume
+  python3 jobs/backtest_universe.py --file data/tmp/tickers.txt --risk_mode rr_struct --out-dir data/tmp/bt_rr
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import os, sys
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backtest_strategy import Params, add_params_args, backtest, load_1h_history, params_from_args, summarize
+
+DONE_STATUSES = {"ok", "no_data"}
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise TaskTimeout()
+
+
+def run_ticker(ticker: str, p: Params, period: str = "730d", timeout: Optional[float] = None,
+               yf_fallback: bool = False) -> Dict:
+    """Worker: load -> backtest -> summarize one ticker.
+
+    timeout: seconds (SIGALRM inside the worker process); the task ends as status=timeout
+    and the worker stays usable.
+    Returns {ticker, status, seconds, error, stats, trades}.
+    """
+    t0 = time.perf_counter()
+    out = {"ticker": ticker, "status": "ok", "error": "", "stats": summarize(None), "trades": pd.DataFrame()}
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, float(timeout))
+    try:
+        df = load_1h_history(ticker, period=period, sync_store=False, yf_fallback=yf_fallback)
+        if df.empty:
+            out["status"] = "no_data"
+        else:
+            trades = backtest(df, p, ticker=ticker)
+            out["trades"] = trades
+            out["stats"] = summarize(trades)
+    except TaskTimeout:
+        out["status"], out["error"] = "timeout", f"> {timeout}s"
+    except Exception as e:
+        out["status"], out["error"] = "error", f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    out["seconds"] = round(time.perf_counter() - t0, 3)
+    return out
+
+
+def _read_tickers(args) -> List[str]:
+    from monitor.config import WATCHLIST, WATCHLIST_FULL
+
+    tickers: List[str] = []
+    if args.watchlist:
+        tickers += WATCHLIST
+    if args.full:
+        tickers += WATCHLIST_FULL
+    if args.file:
+        with open(args.file) as f:
+            for line in f:
+                line = line.split("#", 1)[0]
+                tickers += [t.strip().upper() for t in line.replace(",", " ").split() if t.strip()]
+    tickers += [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    return list(dict.fromkeys(tickers))
+
+
+def _load_progress(path: str) -> Dict[str, Dict]:
+    done: Dict[str, Dict] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # partial last line of an interrupted run
+            done[rec["ticker"]] = rec
+    return done
+
+
+def _record(res: Dict) -> Dict:
+    return {**{k: res[k] for k in ("ticker", "status", "seconds", "error")}, "stats": res["stats"]}
+
+
+def _aggregate(out_dir: str, tickers: List[str], progress: Dict[str, Dict]):
+    frames = []
+    for t in tickers:
+        p = os.path.join(out_dir, "trades", f"{t}.csv")
+        if progress.get(t, {}).get("status") == "ok" and os.path.exists(p):
+            df = pd.read_csv(p, parse_dates=["entry_time", "exit_time"])
+            if not df.empty:
+                df.insert(0, "ticker", t)
+                frames.append(df)
+    trades = pd.concat(frames, ignore_index=True).sort_values("entry_time", kind="stable") if frames else pd.DataFrame()
+
+    rows = []
+    for t in tickers:
+        rec = progress.get(t)
+        if rec is None:
+            continue
+        s = rec["stats"]
+        rows.append({
+            "ticker": t, "status": rec["status"], "trades": s["trades"], "wins": s["wins"],
+            "win_rate": round(s["win_rate"], 4), "total_return_serial": round(s["total_return_serial"], 4),
+            "avg_ret_pct": round(s["avg_ret_pct"], 3), "avg_bars": round(s["avg_bars"], 1),
+            "exit_breakdown": json.dumps(s["exit_breakdown"], sort_keys=True),
+            "seconds": rec["seconds"], "error": rec["error"],
+        })
+    summary = pd.DataFrame(rows)
+    return trades, summary
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", default="", help="comma separated")
+    ap.add_argument("--watchlist", action="store_true", help="monitor.config.WATCHLIST")
+    ap.add_argument("--full", action="store_true", help="monitor.config.WATCHLIST_FULL")
+    ap.add_argument("--file", default="", help="ticker file (comma / whitespace separated, # comments)")
+    ap.add_argument("--period", default="730d")
+    ap.add_argument("--out-dir", default="data/processed/backtest_universe")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--timeout", type=float, default=600.0, help="per-ticker seconds (0 = none)")
+    ap.add_argument("--resume", action="store_true", help="skip tickers already finished in --out-dir")
+    ap.add_argument("--sync", action="store_true", help="sync the 1H store for all tickers before running")
+    ap.add_argument("--yf-fallback", action="store_true", help="workers fetch from yfinance when the store is empty")
+    add_params_args(ap)
+    args = ap.parse_args()
+
+    tickers = _read_tickers(args)
+    if not tickers:
+        raise SystemExit("No tickers provided. Use --tickers, --watchlist, --full or --file")
+    p = params_from_args(args)
+
+    out_dir = args.out_dir
+    os.makedirs(os.path.join(out_dir, "trades"), exist_ok=True)
+    run_cfg = {"period": args.period, "params": asdict(p)}
+    cfg_path = os.path.join(out_dir, "params.json")
+    progress_path = os.path.join(out_dir, "progress.jsonl")
+    if args.resume:
+        if os.path.exists(cfg_path):
+            with open(cfg_path) as f:
+                if json.load(f) != run_cfg:
+                    raise SystemExit(f"--resume: {cfg_path} was written with different params/period")
+        elif os.path.exists(progress_path):
+            raise SystemExit(f"--resume: {progress_path} has no {cfg_path} to check params/period against")
+    elif os.path.exists(progress_path):
+        os.remove(progress_path)
+    with open(cfg_path, "w") as f:
+        json.dump(run_cfg, f, indent=2)
+
+    progress = _load_progress(progress_path) if args.resume else {}
+    todo = [t for t in tickers if progress.get(t, {}).get("status") not in DONE_STATUSES]
+    print(f"UNIVERSE tickers={len(tickers)} todo={len(todo)} resumed={len(tickers) - len(todo)} "
+          f"workers={args.workers} timeout={args.timeout or None}")
+
+    if args.sync and todo:
+        from data_store import format_sync_stats, sync_many
+
+        sync_many(todo, interval="1h", lookback_days=120, max_auto_lookback_days=800)
+        print(format_sync_stats())
+
+    t0 = time.perf_counter()
+    with open(progress_path, "a") as log, ProcessPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        futs = {ex.submit(run_ticker, t, p, args.period, args.timeout or None, args.yf_fallback): t for t in todo}
+        for n, fut in enumerate(as_completed(futs), 1):
+            t = futs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:  # worker process died
+                res = {"ticker": t, "status": "error", "error": f"{type(e).__name__}: {e}",
+                       "stats": summarize(None), "trades": pd.DataFrame(), "seconds": 0.0}
+            trades_path = os.path.join(out_dir, "trades", f"{t}.csv")
+            if res["status"] == "ok" and not res["trades"].empty:
+                res["trades"].to_csv(trades_path, index=False)
+            elif os.path.exists(trades_path):
+                os.remove(trades_path)  # left over from an earlier run
+            rec = _record(res)
+            progress[t] = rec
+            log.write(json.dumps(rec, default=str) + "\n")
+            log.flush()
+            s = rec["stats"]
+            print(f"[{n}/{len(todo)}] {t:<8} {rec['status']:<7} trades={s['trades']:>3} "
+                  f"win={s['win_rate']*100:5.1f}% serial={s['total_return_serial']*100:+7.2f}% "
+                  f"t={rec['seconds']:.1f}s {rec['error']}".rstrip())
+
+    trades, summary = _aggregate(out_dir, tickers, progress)
+    trades.to_csv(os.path.join(out_dir, "all_trades.csv"), index=False)
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+
+    stats = summarize(trades)
+    counts = summary["status"].value_counts().to_dict() if not summary.empty else {}
+    print(f"\nUniverse 1H backtest ({args.period}) - {len(tickers)} tickers, {time.perf_counter() - t0:.1f}s")
+    print(f"Status: {counts}")
+    print(f"Trades: {stats['trades']}  Wins: {stats['wins']}  Losses: {stats['losses']}  WinRate: {stats['win_rate']*100:.2f}%")
+    print(f"Avg ret: {stats['avg_ret_pct']:.2f}%  Median: {stats['median_ret_pct']:.2f}%  Avg bars held: {stats['avg_bars']:.1f}")
+    print(f"Exit breakdown: {stats['exit_breakdown']}")
+    print(f"Saved: {out_dir}/all_trades.csv, {out_dir}/summary.csv")
+
+
+if __name__ == "__main__":
+    main()
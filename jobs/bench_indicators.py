@@ -0,0 +1,79 @@
+"""Benchmark indicator engines on 1 / 50 / 500 tickers.
+
+Examples
+  python3 jobs/bench_indicators.py
+  python3 jobs/bench_indicators.py --tickers 1,50,500 --bars 3500 --repeat 3
+
+Engines
+- pandas: add_all_indicators(df)                 (reference, per ticker)
+- numpy : add_all_indicators(df, engine='numpy') (per ticker)
+- panel : analyzer.panel.compute_panel(frames)   (all tickers in one (T, N) pass)
+
+Data is synthetic random-walk OHLCV (same generator as verify_parity.py), so the numbers
+measure compute only — no parquet / network I/O.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analyzer.indicators import add_all_indicators
+from analyzer.panel import compute_panel
+from verify_parity import synthetic_ohlcv
+
+
+def _time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench(n_tickers: int, bars: int, repeat: int) -> dict:
+    frames = [synthetic_ohlcv(n=bars, seed=i, start=20.0 + i) for i in range(n_tickers)]
+
+    def run_pandas():
+        for df in frames:
+            add_all_indicators(df)
+
+    def run_numpy():
+        for df in frames:
+            add_all_indicators(df, engine='numpy')
+
+    def run_panel():
+        compute_panel({f'T{i}': df for i, df in enumerate(frames)})
+
+    return {
+        'pandas': _time(run_pandas, repeat),
+        'numpy': _time(run_numpy, repeat),
+        'panel': _time(run_panel, repeat),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--tickers', default='1,50,500', help='comma-separated universe sizes')
+    ap.add_argument('--bars', type=int, default=3500, help='1H bars per ticker (~730d = 3500)')
+    ap.add_argument('--repeat', type=int, default=3, help='best-of-N timing')
+    args = ap.parse_args()
+
+    sizes = [int(x) for x in args.tickers.split(',') if x.strip()]
+    print(f"{'tickers':>8} {'bars':>6} {'engine':<8} {'seconds':>9} {'ms/ticker':>10} {'speedup':>8}")
+    for n in sizes:
+        r = bench(n, args.bars, args.repeat)
+        base = r['pandas']
+        for engine, sec in r.items():
+            speedup = base / sec if sec > 0 else float('inf')
+            print(f"{n:>8} {args.bars:>6} {engine:<8} {sec:>9.3f} {sec / n * 1000:>10.2f} {speedup:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Maintain the parquet store: fold deltas, migrate flat files, rebuild the consolidated dataset.
+
+Examples
+  source venv/bin/activate
+  python3 jobs/compact_store.py                       # compact every partitioned ticker, 1h + 1d
+  python3 jobs/compact_store.py --interval 1h --tickers TSLA,AAPL
+  python3 jobs/compact_store.py --migrate             # convert flat {TICKER}.parquet files, then compact
+  python3 jobs/compact_store.py --consolidate --since 2026-09   # refresh dataset months >= 2026-09
+
+Notes
+- Each sync appends one small delta per ticker; run this daily (e.g. after the close) so
+  reads stay at ~one file per month. sync also compacts on its own after
+  StoreConfig.compact_after deltas.
+- --migrate removes the flat file after conversion unless --keep-flat is given.
+- --consolidate rebuilds the multi-ticker dataset (dataset_store) after compaction; without
+  --since every month is rewritten.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_store import StoreConfig, compact, migrate, stored_tickers
+from dataset_store import consolidate
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--interval", default="all", choices=["1h", "1d", "all"])
+    ap.add_argument("--tickers", default="", help="comma separated; default: everything in the store")
+    ap.add_argument("--migrate", action="store_true", help="convert flat files to the partitioned layout first")
+    ap.add_argument("--keep-flat", action="store_true", help="with --migrate: keep the flat file")
+    ap.add_argument("--consolidate", action="store_true", help="rebuild the multi-ticker dataset afterwards")
+    ap.add_argument("--since", default=None, help="with --consolidate: only rebuild months >= YYYY-MM")
+    args = ap.parse_args()
+
+    cfg = StoreConfig()
+    intervals = ["1h", "1d"] if args.interval == "all" else [args.interval]
+    wanted = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+
+    for interval in intervals:
+        stored = stored_tickers(interval, cfg)
+        tickers = wanted or list(stored)
+        migrated = compacted = folded = 0
+        for t in tickers:
+            if args.migrate and stored.get(t) == "flat":
+                rows = migrate(t, interval, cfg, keep_flat=args.keep_flat)
+                migrated += 1
+                print(f"{t:<8} {interval} migrated rows={rows:>6}")
+            if args.migrate or stored.get(t) == "partitioned":
+                r = compact(t, interval, cfg)
+                if r["deltas"]:
+                    compacted += 1
+                    folded += r["deltas"]
+                    print(f"{t:<8} {interval} compacted deltas={r['deltas']:>3} months={r['months']:>3} bytes={r['bytes']}")
+        print(f"COMPACT_SUMMARY interval={interval} tickers={len(tickers)} migrated={migrated} "
+              f"compacted={compacted} deltas={folded}")
+        if args.consolidate:
+            months = consolidate(interval, cfg, tickers=wanted or None, since=args.since)
+            print(f"CONSOLIDATE_SUMMARY interval={interval} months={len(months)} rows={sum(months.values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,92 @@
 """
 知识库加载模块 - 所有 job 通过此模块读取用户偏好
+
+knowledge_base.json 只解析一次：_KB 缓存解析结果和预建索引（tier1/tier2/重点关注集合、
+板块关键词集合、ticker→加权分），文件 mtime 变化时才重新加载。
+score_bonus / is_in_focus 在回放里按 ticker×bar 调用，都是集合/字典查找。
 """
-import json, os
+import json, os, threading
 
 _KB_PATH = os.path.join(os.path.dirname(__file__), '../data/knowledge_base.json')
 
+TIER1_BONUS = 15
+TIER2_BONUS = 8
+
+
+class _KB:
+    """解析一次的知识库 + 索引（按文件 mtime 失效，线程安全）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.data = {}
+        self.tier1 = frozenset()
+        self.tier2 = frozenset()
+        self.focus_tickers = []
+        self.focus_set = frozenset()
+        self.keywords = frozenset()
+        self.bonus = {}
+
+    def get(self) -> '_KB':
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._build(mtime)
+        return self
+
+    def _build(self, mtime: int):
+        with open(self.path) as f:
+            data = json.load(f)
+        wp = data['watchlist_priority']
+        t1, t2 = wp['tier1_core'], wp['tier2_focus']
+        focus = list(dict.fromkeys(t1 + t2))  # 去重保序
+        kw = [k for s in data['focus_sectors']['priority'] for k in s.get('keywords', [])]
+        bonus = {t: TIER2_BONUS for t in t2}
+        bonus.update({t: TIER1_BONUS for t in t1})  # tier1 优先
+        # 先建好再一次性替换，读者不会看到一半新一半旧
+        self.data, self.tier1, self.tier2 = data, frozenset(t1), frozenset(t2)
+        self.focus_tickers, self.focus_set = focus, frozenset(focus)
+        self.keywords, self.bonus = frozenset(kw), bonus
+        self._mtime = mtime
+
+
+_KB_CACHE = _KB(_KB_PATH)
+
+
+def _kb() -> _KB:
+    return _KB_CACHE.get()
+
+
 def load() -> dict:
-    with open(_KB_PATH) as f:
-        return json.load(f)
+    """整份知识库（缓存的解析结果，调用方不要原地修改）"""
+    return _kb().data
 
 def get_core_holdings() -> list:
     """返回核心重仓股 ticker 列表"""
-    kb = load()
-    return [s['ticker'] for s in kb['core_holdings']['stocks']]
+    return [s['ticker'] for s in load()['core_holdings']['stocks']]
 
 def get_focus_tickers() -> list:
     """返回所有重点关注股票"""
-    kb = load()
-    t1 = kb['watchlist_priority']['tier1_core']
-    t2 = kb['watchlist_priority']['tier2_focus']
-    return list(dict.fromkeys(t1 + t2))  # 去重保序
+    return list(_kb().focus_tickers)
 
 def get_focus_sectors() -> list:
     """返回关注板块名称列表"""
-    kb = load()
-    return [s['name'] for s in kb['focus_sectors']['priority']]
+    return [s['name'] for s in load()['focus_sectors']['priority']]
 
 def get_sector_etfs() -> dict:
     """返回板块→ETF映射"""
-    kb = load()
     # 只取主ETF（第一个）
-    return {k: v[0] for k, v in kb['sector_etf_map'].items()}
+    return {k: v[0] for k, v in load()['sector_etf_map'].items()}
 
 def get_risk_profile() -> dict:
     return load()['risk_profile']
 
 def is_in_focus(ticker: str) -> bool:
     """判断某股是否在重点关注池"""
-    focus = get_focus_tickers()
-    kb = load()
-    all_kw = []
-    for s in kb['focus_sectors']['priority']:
-        all_kw += s.get('keywords', [])
-    return ticker in focus or ticker in all_kw
+    kb = _kb()
+    return ticker in kb.focus_set or ticker in kb.keywords
 
 def score_bonus(ticker: str) -> int:
     """
@@ -51,9 +95,4 @@ def score_bonus(ticker: str) -> int:
     tier2 重点关注: +8分
     其他: 0分
     """
-    kb = load()
-    if ticker in kb['watchlist_priority']['tier1_core']:
-        return 15
-    if ticker in kb['watchlist_priority']['tier2_focus']:
-        return 8
-    return 0
+    return _kb().bonus.get(ticker, 0)
@@ -8,7 +8,8 @@ This script replays an hourly scan over a ticker universe, then applies:
 - Old dedupe: (ticker, date, score_bucket//10)
 - New dedupe: (ticker, date, exec_mode) + upgrade resend rules
 
-Then it simulates a simple capital-constrained executor:
+Then it simulates a simple capital-constrained executor (strategy.portfolio_sim.run_serial,
+over tickers pre-aligned into arrays; data is loaded, scored and routed once for all runs):
 - max_open_pos = 1 (serial trades)
 - max_new_buys_per_day = 1
 - choose Top1 by score among *eligible new* signals each scan
@@ -24,12 +25,14 @@ It is intended to quantify whether the new dedupe creates *incremental trades*
 Usage
   ./venv/bin/python jobs/replay_dedupe_backtest.py --scope full --period 180d
   ./venv/bin/python jobs/replay_dedupe_backtest.py --scope full --period 365d --out reports/dedupe_report_365d.md
+  ./venv/bin/python jobs/replay_dedupe_backtest.py --scope full --period 180d --no-sync   # sweep: store only
+  ./venv/bin/python jobs/replay_dedupe_backtest.py --scope full --period 730d --portfolio --max-open-pos 10 \
+      --equity-out reports/portfolio_equity_730d.csv   # many positions, broker sizing + risk cap
 """
 
 from __future__ import annotations
 
 import argparse
-from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
@@ -40,18 +43,31 @@ import os
 import sys
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
 sys.path.insert(0, os.path.join(ROOT, "monitor"))
 sys.path.insert(0, os.path.join(ROOT, "src"))
 
 from config import WATCHLIST, WATCHLIST_FULL, NOTIFY
-from signal_engine import score_signal, _structure_signals
+from signal_engine import score_signal_vectorized, best_structure_signal, SCORE_SIGNAL_NEEDS
+from strategy.structure import (STRUCTURE_NEEDS, StructureParams, series_signal,
+                                structure_1buy_series, structure_2buy_series)
 
 try:
-    from data_store import sync_and_load
+    from ohlcv_cache import load_history
 except Exception:
-    sync_and_load = None
+    load_history = None
 
-from analyzer.indicators import add_all_indicators
+try:
+    from rs_strength import rs_1y_series
+except Exception:
+    rs_1y_series = None
+
+from analyzer.indicators import compute_indicators
+from strategy.portfolio_sim import (MODES, MR, SKIP, Panel, PortfolioConfig, Trade, build_panel,
+                                    run_portfolio, run_serial)
+
+# score_signal + routing (bb_pct20 / rsi14 / above_ma200 / atr_pct14) + structure
+REPLAY_NEEDS = SCORE_SIGNAL_NEEDS | STRUCTURE_NEEDS
 
 
 def _score_bucket(score: float) -> int:
@@ -116,11 +132,13 @@ def should_send_again(
     return False, "no_change"
 
 
-def load_1h_history(ticker: str, period: str) -> pd.DataFrame:
-    if sync_and_load is None:
-        raise RuntimeError("sync_and_load unavailable; run inside repo venv")
+def load_1h_history(ticker: str, period: str, sync_store: bool = True) -> pd.DataFrame:
+    """1H history from the local store via the mmap cache (sync_store=False: no network)."""
+    if load_history is None:
+        raise RuntimeError("ohlcv_cache unavailable; run inside repo venv")
 
     lb = 120
+    days = None
     if str(period).endswith("d"):
         try:
             days = int(str(period)[:-1])
@@ -128,38 +146,21 @@ def load_1h_history(ticker: str, period: str) -> pd.DataFrame:
         except Exception:
             pass
 
-    df = sync_and_load(
+    # trim to requested period window (the store may hold a longer range)
+    df = load_history(
         ticker,
-        interval="1h",
+        "1h",
+        days=days + 2 if days else None,
+        sync_store=sync_store,
         lookback_days=lb,
         max_auto_lookback_days=800,
     )
-    # trim to requested period window (sync_and_load may return a longer cached range)
-    if str(period).endswith('d') and df is not None and not df.empty:
-        try:
-            days = int(str(period)[:-1])
-            end_ts = df.index[-1]
-            start_ts = end_ts - pd.Timedelta(days=days + 2)
-            df = df[df.index >= start_ts]
-        except Exception:
-            pass
 
     if df is None or df.empty:
         return pd.DataFrame()
 
-    df = df.dropna().copy()
-
-    # normalize index tz
-    try:
-        df.index = df.index.tz_convert(None)
-    except Exception:
-        try:
-            df.index = df.index.tz_localize(None)
-        except Exception:
-            pass
-
-    df.columns = [c.lower() for c in df.columns]
-    df = add_all_indicators(df)
+    # store frames are already normalized (naive index, lowercase OHLCV, no NaN)
+    df = compute_indicators(df, needs=REPLAY_NEEDS)
 
     # harmonize
     if "bb_pct" not in df.columns and "bb_pct20" in df.columns:
@@ -170,11 +171,35 @@ def load_1h_history(ticker: str, period: str) -> pd.DataFrame:
     return df
 
 
-def route_exec_mode(df: pd.DataFrame, i: int, ticker: str, *, use_structure: bool = False) -> Tuple[str, dict]:
+def _rs_1y_bars(ticker: str, index: pd.DatetimeIndex) -> np.ndarray:
+    """Point-in-time RS_1Y per bar (-999 when unavailable, as in score_signal)."""
+    if rs_1y_series is None:
+        return np.full(len(index), -999.0)
+    try:
+        return rs_1y_series(ticker, index).to_numpy(dtype=float)
+    except Exception:
+        return np.full(len(index), -999.0)
+
+
+def structure_series(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """1buy / 2buy detection for every bar of one ticker (used by route_exec_mode)."""
+    p = StructureParams()
+    return structure_1buy_series(df, p), structure_2buy_series(df, p)
+
+
+def route_exec_mode(
+    df: pd.DataFrame,
+    i: int,
+    ticker: str,
+    *,
+    use_structure: bool = False,
+    struct: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None,
+) -> Tuple[str, dict]:
     """Approx routing logic.
 
     NOTE:
-    - Structure pattern detection is expensive in full-universe replay.
+    - Structure pattern detection is evaluated for all bars up front (struct =
+      structure_series(df)); without it, bar i is evaluated on its own.
     - By default we disable STRUCT and only model MR via BB% gate.
     """
     row = df.iloc[i]
@@ -193,8 +218,9 @@ def route_exec_mode(df: pd.DataFrame, i: int, ticker: str, *, use_structure: boo
     st = {"enabled": False, "signals": [], "best": None}
     if use_structure:
         try:
-            start = max(0, i - 260)
-            st = _structure_signals(df.iloc[start : i + 1], ticker)
+            s1, s2 = struct if struct is not None else structure_series(df.iloc[: i + 1])
+            signals = [s for s in (series_signal(s1, i, "1buy"), series_signal(s2, i, "2buy")) if s]
+            st = {"enabled": True, "signals": signals, "best": best_structure_signal(signals)}
         except Exception:
             st = {"enabled": False, "signals": [], "best": None}
 
@@ -208,168 +234,168 @@ def route_exec_mode(df: pd.DataFrame, i: int, ticker: str, *, use_structure: boo
     return "SKIP", {"structure": st, "route_reason": "skip"}
 
 
-@dataclass
-class Trade:
-    entry_time: pd.Timestamp
-    exit_time: pd.Timestamp
-    ticker: str
-    entry: float
-    exit: float
-    ret: float
-    exit_reason: str
-
-
-def simulate(
-    universe: List[str],
-    period: str,
+def route_modes(
+    df: pd.DataFrame,
+    ticker: str,
     *,
-    tp_pct: float,
-    sl_pct: float,
-    hold_max: int,
-    min_score: float,
-    max_new_buys_per_day: int,
-    mode: str,
-    upgrade_min_delta: float,
-    upgrade_min_interval_min: int,
-    upgrade_strong_score: float,
     use_structure: bool = False,
-) -> dict:
+    struct: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None,
+) -> np.ndarray:
+    """route_exec_mode for every bar of one ticker, as portfolio_sim mode codes.
+
+    MR / SKIP is one vectorized BB% gate; bars that could route to STRUCT (a 1buy/2buy
+    signal, above MA200, ATR% <= 3.5) are few and go through route_exec_mode itself.
+    """
+    n = len(df)
+    # float(bb or 0.5): missing / 0 -> 0.5, NaN stays NaN (never < 0.35)
+    bb = df["bb_pct"].to_numpy(dtype=float) if "bb_pct" in df.columns else np.full(n, 0.5)
+    bb = np.where(bb == 0, 0.5, bb)
+    modes = np.where(bb < 0.35, MR, SKIP).astype(np.int8)
+    if not use_structure:
+        return modes
+
+    try:
+        s1, s2 = struct if struct is not None else structure_series(df)
+        maybe = (s1["signal"].to_numpy() != 0) | (s2["signal"].to_numpy() != 0)
+    except Exception:
+        return modes
+    if "above_ma200" in df.columns:
+        maybe &= df["above_ma200"].to_numpy(dtype=float) != 0
+    else:
+        maybe[:] = False
+    if "atr_pct14" in df.columns:
+        maybe &= df["atr_pct14"].to_numpy(dtype=float) <= 3.5
+    else:
+        maybe[:] = False
+    for i in np.flatnonzero(maybe):
+        mode, _ = route_exec_mode(df, int(i), ticker, use_structure=True, struct=(s1, s2))
+        modes[i] = MODES.index(mode)
+    return modes
+
+
+class DedupeGate:
+    """Dedupe / upgrade-resend rules of one replay mode, as a portfolio_sim gate.
+
+    old: (ticker, date, score_bucket//10) sent at most once
+    new: (ticker, date, exec_mode) + should_send_again upgrade rules
+    """
+
+    def __init__(self, mode: str, *, upgrade_min_delta: float, upgrade_min_interval_min: int,
+                 upgrade_strong_score: float):
+        self.mode = mode
+        self.upgrade = dict(
+            upgrade_min_delta=upgrade_min_delta,
+            upgrade_min_interval_min=upgrade_min_interval_min,
+            upgrade_strong_score=upgrade_strong_score,
+        )
+        self.sent: Dict[str, dict] = {}
+
+    def _key(self, ticker: str, ts: pd.Timestamp, score: float, exec_mode: str) -> str:
+        return old_key(ticker, ts, score) if self.mode == "old" else new_key(ticker, ts, exec_mode)
+
+    def check(self, ticker: str, ts: pd.Timestamp, score: float, exec_mode: str) -> Tuple[bool, str]:
+        k = self._key(ticker, ts, score, exec_mode)
+        if self.mode == "old":
+            ok = k not in self.sent
+            return ok, "old:first" if ok else "old:dup"
+        return should_send_again(score, exec_mode, self.sent.get(k), ts, **self.upgrade)
+
+    def mark(self, ticker: str, ts: pd.Timestamp, score: float, exec_mode: str, reason: str) -> None:
+        self.sent[self._key(ticker, ts, score, exec_mode)] = {
+            "ticker": ticker,
+            "score": score,
+            "exec_mode": exec_mode,
+            "time": ts.to_pydatetime().isoformat(),
+            "reason": reason,
+        }
+
+
+def prepare(universe: List[str], period: str, *, use_structure: bool = False, sync_store: bool = True) -> Panel:
+    """Load, score and route every ticker once; the result is shared by all simulate() runs."""
     data: Dict[str, pd.DataFrame] = {}
     total = len(universe)
     for n, t in enumerate(universe, 1):
         if n % 25 == 0 or n == 1 or n == total:
             print(f"[load] {n}/{total} {t}")
         try:
-            df = load_1h_history(t, period)
+            df = load_1h_history(t, period, sync_store=sync_store)
             if df is None or df.empty:
                 continue
             data[t] = df
         except Exception:
             continue
 
-    if not data:
-        return {"trades": [], "equity": 1.0, "notes": "no data"}
-
-    all_idx = sorted(set().union(*[set(df.index) for df in data.values()]))
-
-    sent: Dict[str, dict] = {}
-    trades: List[Trade] = []
-
-    in_pos = False
-    pos_ticker = None
-    entry_i = None
-    entry_price = None
-    entry_time = None
-
-    day_buy_count: Dict[str, int] = {}
-
-    for ts in all_idx:
-        day = ts.strftime("%Y-%m-%d")
-
-        # manage open position
-        if in_pos and pos_ticker in data:
-            dfp = data[pos_ticker]
-            if ts in dfp.index:
-                i = int(dfp.index.get_loc(ts))
-                price = float(dfp["close"].iloc[i])
-                if entry_i is not None and entry_price is not None and entry_time is not None:
-                    if (price - entry_price) / entry_price >= tp_pct:
-                        trades.append(Trade(entry_time, ts, pos_ticker, entry_price, price, (price - entry_price) / entry_price, "TP"))
-                        in_pos = False
-                    elif (price - entry_price) / entry_price <= sl_pct:
-                        trades.append(Trade(entry_time, ts, pos_ticker, entry_price, price, (price - entry_price) / entry_price, "SL"))
-                        in_pos = False
-                    elif (i - entry_i) >= hold_max:
-                        trades.append(Trade(entry_time, ts, pos_ticker, entry_price, price, (price - entry_price) / entry_price, "HOLD_MAX"))
-                        in_pos = False
-
-                if not in_pos:
-                    pos_ticker = None
-                    entry_i = None
-                    entry_price = None
-                    entry_time = None
-
-        if in_pos:
-            continue
-
-        # per-day entry constraint
-        if day_buy_count.get(day, 0) >= max_new_buys_per_day:
-            continue
-
-        candidates = []
-        for t, df in data.items():
-            if ts not in df.index:
-                continue
-            i = int(df.index.get_loc(ts))
-            if i < 300:
-                continue
-
-            row = df.iloc[i]
-            sig = score_signal(row, t)
-            score = float(sig.get("score", 0) or 0)
-            if score < min_score:
-                continue
-
-            exec_mode, _extra = route_exec_mode(df, i, t, use_structure=use_structure)
-            if exec_mode == "SKIP":
-                continue
-
-            if mode == "old":
-                k = old_key(t, ts, score)
-                ok = k not in sent
-                reason = "old:first" if ok else "old:dup"
-            else:
-                k = new_key(t, ts, exec_mode)
-                prev = sent.get(k)
-                ok, reason = should_send_again(
-                    score,
-                    exec_mode,
-                    prev,
-                    ts,
-                    upgrade_min_delta=upgrade_min_delta,
-                    upgrade_min_interval_min=upgrade_min_interval_min,
-                    upgrade_strong_score=upgrade_strong_score,
-                )
-
-            if not ok:
-                continue
-
-            price = float(row.get("close", np.nan))
-            if np.isnan(price):
-                continue
-
-            candidates.append({"ticker": t, "score": score, "exec_mode": exec_mode, "price": price, "idx": i, "time": ts, "reason": reason})
+    # score every bar of every ticker once (same values as score_signal row by row),
+    # with the RS_1Y known at each bar instead of today's value
+    scored = {t: score_signal_vectorized(df, ticker=t, rs_1y=_rs_1y_bars(t, df.index)) for t, df in data.items()}
+    scores: Dict[str, np.ndarray] = {t: sc["score"].to_numpy(dtype=float) for t, sc in scored.items()}
+    modes = {
+        t: route_modes(df, t, use_structure=use_structure, struct=structure_series(df) if use_structure else None)
+        for t, df in data.items()
+    }
+    # signal prices + router filter inputs for the portfolio executor
+    fields = {
+        "sl": {t: sc["sl_price"].to_numpy(dtype=float) for t, sc in scored.items()},
+        "tp": {t: sc["tp_price"].to_numpy(dtype=float) for t, sc in scored.items()},
+        "above_ma50": {t: df["above_ma50"].to_numpy(dtype=float) for t, df in data.items() if "above_ma50" in df.columns},
+        "dollar_vol": {t: _dollar_vol_20d(df) for t, df in data.items()},
+    }
+    return build_panel(data, scores, modes, fields)
 
-        if not candidates:
-            continue
 
-        best = sorted(candidates, key=lambda x: (x["score"], x["exec_mode"] == "STRUCT"), reverse=True)[0]
+def _dollar_vol_20d(df: pd.DataFrame) -> np.ndarray:
+    """Average daily dollar volume of the 20 completed sessions before each bar (fast_scan's liquidity proxy)."""
+    if "volume" not in df.columns:
+        return np.zeros(len(df))
+    day = df.index.normalize()
+    daily = (df["close"] * df["volume"]).groupby(day).sum()
+    avg = daily.rolling(20).mean().shift(1)
+    return avg.reindex(day).to_numpy(dtype=float)
 
-        if mode == "old":
-            k = old_key(best["ticker"], best["time"], best["score"])
-        else:
-            k = new_key(best["ticker"], best["time"], best["exec_mode"])
 
-        sent[k] = {
-            "ticker": best["ticker"],
-            "score": best["score"],
-            "exec_mode": best["exec_mode"],
-            "time": best["time"].to_pydatetime().isoformat(),
-            "reason": best["reason"],
-        }
+def simulate(
+    universe: List[str],
+    period: str,
+    *,
+    tp_pct: float,
+    sl_pct: float,
+    hold_max: int,
+    min_score: float,
+    max_new_buys_per_day: int,
+    mode: str,
+    upgrade_min_delta: float,
+    upgrade_min_interval_min: int,
+    upgrade_strong_score: float,
+    use_structure: bool = False,
+    sync_store: bool = True,
+    panel: Optional[Panel] = None,
+) -> dict:
+    """Replay one dedupe mode over universe with the serial executor (portfolio_sim.run_serial).
 
-        in_pos = True
-        pos_ticker = best["ticker"]
-        entry_i = best["idx"]
-        entry_price = float(best["price"])
-        entry_time = best["time"]
-        day_buy_count[day] = day_buy_count.get(day, 0) + 1
+    panel: a prepare() result covering universe (loaded once, reused across modes);
+    built here when omitted.
+    """
+    if panel is None:
+        panel = prepare(universe, period, use_structure=use_structure, sync_store=sync_store)
+    if not set(universe) & set(panel.tickers):
+        return {"trades": [], "equity": 1.0, "notes": "no data"}
 
-    if in_pos and pos_ticker and pos_ticker in data and entry_time is not None and entry_price is not None:
-        dfp = data[pos_ticker]
-        last_ts = dfp.index[-1]
-        price = float(dfp["close"].iloc[-1])
-        trades.append(Trade(entry_time, last_ts, pos_ticker, entry_price, price, (price - entry_price) / entry_price, "EOD"))
+    gate = DedupeGate(
+        mode,
+        upgrade_min_delta=upgrade_min_delta,
+        upgrade_min_interval_min=upgrade_min_interval_min,
+        upgrade_strong_score=upgrade_strong_score,
+    )
+    trades = run_serial(
+        panel,
+        tp_pct=tp_pct,
+        sl_pct=sl_pct,
+        hold_max=hold_max,
+        min_score=min_score,
+        max_new_buys_per_day=max_new_buys_per_day,
+        gate=gate,
+        tickers=universe,
+    )
 
     eq = 1.0
     for tr in trades:
@@ -450,6 +476,21 @@ def format_report(title: str, old: dict, new: dict) -> str:
     return "\n".join(lines)
 
 
+def format_portfolio_report(title: str, res) -> str:
+    st = res.stats()
+    lines = [f"# {title}", ""]
+    lines.append(f"- Equity: {st['start_equity']:.2f} -> **{st['end_equity']:.2f}** "
+                 f"({st['total_return']*100:+.2f}%), max drawdown {st['max_drawdown']*100:.2f}%")
+    lines.append(f"- Trades: {st['trades']} | win_rate={st['win_rate']*100:.1f}% | avg={st['avg_ret']*100:.2f}% "
+                 f"| pnl={st['pnl']:.2f}")
+    lines.append(f"- Max open positions: {st['max_positions']} | avg exposure {st['avg_exposure']*100:.1f}%")
+    if res.skips:
+        top = sorted(res.skips.items(), key=lambda kv: kv[1], reverse=True)[:8]
+        lines.append("- Skips: " + ", ".join(f"{k}={v}" for k, v in top))
+    lines.append("")
+    return "\n".join(lines)
+
+
 def load_core_and_held() -> Tuple[List[str], List[str]]:
     core = []
     held = []
@@ -472,12 +513,57 @@ def load_core_and_held() -> Tuple[List[str], List[str]]:
     return core, held
 
 
+def run_portfolio_mode(args, universe: List[str]) -> None:
+    from broker.order_router import PaperTradeConfig
+
+    panel = prepare(list(universe), args.period, use_structure=args.use_structure, sync_store=not args.no_sync)
+    cfg = PortfolioConfig(
+        initial_cash=args.cash,
+        max_open_pos=args.max_open_pos,
+        max_new_buys_per_day=args.max_new_buys_per_day,
+        total_risk_cap_pct=args.total_risk_cap,
+        max_price_pct_equity=float(os.environ.get("MAX_PRICE_PCT_EQUITY", "0.35")),
+        min_price_usd=float(os.environ.get("MIN_PRICE_USD", "5")),
+        min_cash_buffer=float(os.environ.get("MIN_CASH_BUFFER_USD", "50")),
+        hold_max=args.hold,
+        paper=PaperTradeConfig(
+            max_sl_pct=float(os.environ.get("MAX_SL_PCT", "0.10")),
+            max_position_pct=float(os.environ.get("MAX_POSITION_PCT", "0.08")),
+            min_price_usd=float(os.environ.get("MIN_PRICE_USD", "5")),
+            min_dollar_vol_20d=float(os.environ.get("MIN_DOLLAR_VOL_20D", "20000000")),
+        ),
+    )
+    gate = DedupeGate(
+        "new",
+        upgrade_min_delta=args.upgrade_min_delta,
+        upgrade_min_interval_min=args.upgrade_min_interval_min,
+        upgrade_strong_score=args.upgrade_strong_score,
+    )
+    res = run_portfolio(panel, cfg, min_score=args.min_score, gate=gate)
+    out = format_portfolio_report(
+        f"Portfolio replay ({args.scope} universe, period={args.period}, max_open_pos={cfg.max_open_pos})", res)
+
+    if args.equity_out:
+        if os.path.dirname(args.equity_out):
+            os.makedirs(os.path.dirname(args.equity_out), exist_ok=True)
+        res.equity.to_csv(args.equity_out, index_label="time")
+        print(f"WROTE:{args.equity_out}")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out)
+        print(f"WROTE:{args.out}")
+    else:
+        print(out)
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--scope", choices=["tier", "full"], default="full")
     ap.add_argument("--period", default="180d")
     ap.add_argument("--out", default="")
     ap.add_argument("--use-structure", action="store_true", help="Enable STRUCT routing (slow).")
+    ap.add_argument("--no-sync", action="store_true", help="Replay the local store as-is (no network; mmap cache).")
 
     ap.add_argument("--tp", type=float, default=0.13)
     ap.add_argument("--sl", type=float, default=-0.08)
@@ -490,72 +576,44 @@ def main():
     ap.add_argument("--upgrade-min-interval-min", type=int, default=int(os.environ.get("UPGRADE_MIN_INTERVAL_MIN", "120")))
     ap.add_argument("--upgrade-strong-score", type=float, default=float(os.environ.get("UPGRADE_STRONG_SCORE", "85")))
 
+    # portfolio mode: many positions, broker sizing / risk functions, new dedupe
+    ap.add_argument("--portfolio", action="store_true", help="Multi-position replay (run_portfolio) instead of old/new dedupe.")
+    ap.add_argument("--cash", type=float, default=float(os.environ.get("PAPER_EQUITY", "100000")))
+    ap.add_argument("--max-open-pos", type=int, default=int(os.environ.get("MAX_OPEN_POS", "10")))
+    ap.add_argument("--total-risk-cap", type=float, default=float(os.environ.get("TOTAL_RISK_CAP", "0.02")))
+    ap.add_argument("--equity-out", default="", help="portfolio mode: write the per-bar equity curve CSV")
+
     args = ap.parse_args()
 
     universe = WATCHLIST_FULL if args.scope == "full" else WATCHLIST
-
-    old = simulate(
-        universe,
-        args.period,
-        tp_pct=args.tp,
-        sl_pct=args.sl,
-        hold_max=args.hold,
-        min_score=args.min_score,
-        max_new_buys_per_day=args.max_new_buys_per_day,
-        mode="old",
-        upgrade_min_delta=args.upgrade_min_delta,
-        upgrade_min_interval_min=args.upgrade_min_interval_min,
-        upgrade_strong_score=args.upgrade_strong_score,
-        use_structure=args.use_structure,
-    )
-
-    new = simulate(
-        universe,
-        args.period,
-        tp_pct=args.tp,
-        sl_pct=args.sl,
-        hold_max=args.hold,
-        min_score=args.min_score,
-        max_new_buys_per_day=args.max_new_buys_per_day,
-        mode="new",
-        upgrade_min_delta=args.upgrade_min_delta,
-        upgrade_min_interval_min=args.upgrade_min_interval_min,
-        upgrade_strong_score=args.upgrade_strong_score,
-        use_structure=args.use_structure,
-    )
-
+    if args.portfolio:
+        return run_portfolio_mode(args, universe)
     core, held = load_core_and_held()
     coreheld = sorted(list(set(core + held)))
 
-    old_ch = simulate(
-        coreheld,
+    # load / score / route once; the four replays run on the same panel
+    panel = prepare(
+        list(dict.fromkeys(list(universe) + coreheld)),
         args.period,
-        tp_pct=args.tp,
-        sl_pct=args.sl,
-        hold_max=args.hold,
-        min_score=args.min_score,
-        max_new_buys_per_day=args.max_new_buys_per_day,
-        mode="old",
-        upgrade_min_delta=args.upgrade_min_delta,
-        upgrade_min_interval_min=args.upgrade_min_interval_min,
-        upgrade_strong_score=args.upgrade_strong_score,
         use_structure=args.use_structure,
+        sync_store=not args.no_sync,
     )
-
-    new_ch = simulate(
-        coreheld,
-        args.period,
+    common = dict(
         tp_pct=args.tp,
         sl_pct=args.sl,
         hold_max=args.hold,
         min_score=args.min_score,
         max_new_buys_per_day=args.max_new_buys_per_day,
-        mode="new",
         upgrade_min_delta=args.upgrade_min_delta,
         upgrade_min_interval_min=args.upgrade_min_interval_min,
         upgrade_strong_score=args.upgrade_strong_score,
         use_structure=args.use_structure,
+        panel=panel,
     )
+    old = simulate(universe, args.period, mode="old", **common)
+    new = simulate(universe, args.period, mode="new", **common)
+    old_ch = simulate(coreheld, args.period, mode="old", **common)
+    new_ch = simulate(coreheld, args.period, mode="new", **common)
 
     text = []
     text.append(format_report(f"Dedupe impact replay ({args.scope} universe, period={args.period})", old, new))
@@ -0,0 +1,261 @@
+"""Parameter sweep for backtest_strategy.Params (grid or random search) over many tickers.
+
+Goal
+- Tuning rsi_entry / ret5_entry / rr / sl_* / tp / hold_max meant rerunning the CLI by hand.
+- Evaluate many Params per ticker while loading data, indicators, RS_1Y and the
+  param-independent entry features (entry_features) once per ticker: only the entry/exit
+  loop runs per config.
+
+Search space (--space, ';' separated, names = Params fields)
+  "rsi_entry=40,45,50; ret5_entry=-0.02,-0.03; risk_mode=fixed,rr_struct"
+  - grid (default): cartesian product of the value lists
+  - --random N: N configs; lists are sampled, "lo:hi" ranges drawn uniformly (ints stay ints)
+- Fields not in --space come from the usual backtest_strategy flags (--rsi, --tp, ...).
+
+Parallelism / early stopping
+- Tickers are split into --waves batches; each ticker is one ProcessPoolExecutor task that
+  runs every still-alive config.
+- After each wave a config is dropped when it is clearly dominated: both it and the best
+  config have >= --min-trades trades and its upper bound (mean trade return + z * stderr)
+  is below the best config's lower bound (mean - z * stderr), z = --prune-z.
+
+Output
+- --out CSV (default data/processed/param_sweep.csv): one row per config, ranked by --rank-by:
+  params, trades, win_rate, avg_ret_pct, median_ret_pct, serial_mean_pct (mean over
+  tickers of the per-ticker serial return), avg_bars, exit_breakdown, tickers, pruned_wave
+
+Usage
+  python3 jobs/sweep_params.py --watchlist --space "rsi_entry=40,45,50;tp_pct=0.10,0.13,0.16"
+  python3 jobs/sweep_params.py --full --random 60 --seed 7 --workers 8 \
+      --space "rr=1.2:2.5;sl_lookback=10:40;sl_atr_buffer=0:1.5" --risk_mode rr_struct
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, fields, replace
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import os, sys
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backtest_strategy import (Params, add_params_args, backtest, entry_features, load_1h_history,
+                               params_from_args, rs_1y_bars)
+from backtest_universe import _read_tickers
+
+RANK_KEYS = ["serial_mean_pct", "avg_ret_pct", "win_rate", "median_ret_pct"]
+
+
+def parse_space(spec: str) -> Dict[str, List[str]]:
+    """'a=1,2;b=0.1:0.3' -> {'a': ['1', '2'], 'b': ['0.1:0.3']} (validated against Params)."""
+    names = {f.name for f in fields(Params)}
+    space: Dict[str, List[str]] = {}
+    for part in spec.split(";"):
+        if not part.strip():
+            continue
+        k, _, v = part.partition("=")
+        k = k.strip()
+        if k not in names:
+            raise SystemExit(f"--space: unknown Params field {k!r}")
+        space[k] = [x.strip() for x in v.split(",") if x.strip()]
+    return space
+
+
+def _coerce(base: Params, name: str, value):
+    kind = type(getattr(base, name))
+    return kind(value) if kind is not bool else str(value).lower() in ("1", "true", "yes")
+
+
+def build_configs(base: Params, space: Dict[str, List[str]], n_random: int = 0, seed: int = 0) -> List[Params]:
+    if not n_random:
+        for vals in space.values():
+            if any(":" in v for v in vals):
+                raise SystemExit("--space: lo:hi ranges need --random N")
+        keys = list(space)
+        return [replace(base, **{k: _coerce(base, k, v) for k, v in zip(keys, combo)})
+                for combo in itertools.product(*(space[k] for k in keys))]
+
+    rng = random.Random(seed)
+    configs, seen = [], set()
+    for _ in range(n_random * 20):
+        if len(configs) >= n_random:
+            break
+        kw = {}
+        for k, vals in space.items():
+            v = rng.choice(vals)
+            if ":" in v:
+                lo, hi = v.split(":", 1)
+                if isinstance(getattr(base, k), int):
+                    v = rng.randint(int(lo), int(hi))
+                else:
+                    v = round(rng.uniform(float(lo), float(hi)), 4)
+            kw[k] = _coerce(base, k, v)
+        key = tuple(sorted(kw.items()))
+        if key not in seen:
+            seen.add(key)
+            configs.append(replace(base, **kw))
+    return configs
+
+
+def sweep_ticker(ticker: str, configs: List[Tuple[int, Params]], period: str = "730d",
+                 yf_fallback: bool = False) -> Dict:
+    """Worker: load one ticker once, run every (config id, Params).
+
+    Returns {ticker, error, results: {cid: (ret_pct array, bars array, reasons list)}}.
+    """
+    out = {"ticker": ticker, "error": "", "results": {}}
+    try:
+        df = load_1h_history(ticker, period=period, sync_store=False, yf_fallback=yf_fallback)
+        if df.empty:
+            out["error"] = "no data"
+            return out
+        rs = rs_1y_bars(df, ticker)
+        feats = entry_features(df)
+        for cid, p in configs:
+            tr = backtest(df, p, ticker=ticker, rs_1y=rs, features=feats)
+            if tr.empty:
+                out["results"][cid] = (np.empty(0), np.empty(0), [])
+            else:
+                out["results"][cid] = (tr["ret_pct"].to_numpy(float), tr["bars"].to_numpy(float), list(tr["reason"]))
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    return out
+
+
+class _Acc:
+    """Running per-config totals across tickers."""
+
+    def __init__(self):
+        self.rets: List[np.ndarray] = []
+        self.bars: List[np.ndarray] = []
+        self.reasons: Dict[str, int] = {}
+        self.serial: List[float] = []
+
+    def add(self, rets: np.ndarray, bars: np.ndarray, reasons: List[str]) -> None:
+        self.rets.append(rets)
+        self.bars.append(bars)
+        for r in reasons:
+            self.reasons[r] = self.reasons.get(r, 0) + 1
+        self.serial.append(float(np.prod(1.0 + rets / 100.0) - 1.0) if len(rets) else 0.0)
+
+    def stats(self) -> Dict:
+        r = np.concatenate(self.rets) if self.rets else np.empty(0)
+        b = np.concatenate(self.bars) if self.bars else np.empty(0)
+        n = len(r)
+        return {
+            "trades": n,
+            "win_rate": float((r > 0).mean()) if n else 0.0,
+            "avg_ret_pct": float(r.mean()) if n else 0.0,
+            "median_ret_pct": float(np.median(r)) if n else 0.0,
+            "stderr_pct": float(r.std(ddof=1) / np.sqrt(n)) if n > 1 else float("inf"),
+            "serial_mean_pct": float(np.mean(self.serial) * 100) if self.serial else 0.0,
+            "avg_bars": float(b.mean()) if n else 0.0,
+            "exit_breakdown": dict(sorted(self.reasons.items())),
+            "tickers": len(self.serial),
+        }
+
+
+def dominated(stats: Dict[int, Dict], min_trades: int, z: float) -> List[int]:
+    """Config ids whose mean-return upper bound is below the best config's lower bound."""
+    ok = {c: s for c, s in stats.items() if s["trades"] >= min_trades}
+    if len(ok) < 2:
+        return []
+    best_lcb = max(s["avg_ret_pct"] - z * s["stderr_pct"] for s in ok.values())
+    return [c for c, s in ok.items() if s["avg_ret_pct"] + z * s["stderr_pct"] < best_lcb]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", default="", help="comma separated")
+    ap.add_argument("--watchlist", action="store_true", help="monitor.config.WATCHLIST")
+    ap.add_argument("--full", action="store_true", help="monitor.config.WATCHLIST_FULL")
+    ap.add_argument("--file", default="", help="ticker file (comma / whitespace separated, # comments)")
+    ap.add_argument("--period", default="730d")
+    ap.add_argument("--space", required=True, help='e.g. "rsi_entry=40,45,50;tp_pct=0.10,0.13"')
+    ap.add_argument("--random", type=int, default=0, help="sample N configs instead of the full grid")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--waves", type=int, default=4, help="ticker batches; pruning runs after each")
+    ap.add_argument("--min-trades", type=int, default=30, help="pruning needs this many trades per config")
+    ap.add_argument("--prune-z", type=float, default=2.0, help="0 disables pruning")
+    ap.add_argument("--rank-by", default="serial_mean_pct", choices=RANK_KEYS)
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--out", default="data/processed/param_sweep.csv")
+    ap.add_argument("--yf-fallback", action="store_true", help="workers fetch from yfinance when the store is empty")
+    add_params_args(ap)
+    args = ap.parse_args()
+
+    tickers = _read_tickers(args)
+    if not tickers:
+        raise SystemExit("No tickers provided. Use --tickers, --watchlist, --full or --file")
+    space = parse_space(args.space)
+    configs = build_configs(params_from_args(args), space, args.random, args.seed)
+    if not configs:
+        raise SystemExit("--space produced no configs")
+
+    waves = [w for w in np.array_split(np.array(tickers, dtype=object), max(1, min(args.waves, len(tickers)))) if len(w)]
+    accs = {cid: _Acc() for cid in range(len(configs))}
+    alive = set(accs)
+    pruned_at: Dict[int, int] = {}
+    errors: Dict[str, str] = {}
+    print(f"SWEEP configs={len(configs)} tickers={len(tickers)} waves={len(waves)} workers={args.workers}")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        for w, wave in enumerate(waves, 1):
+            batch = [(cid, configs[cid]) for cid in sorted(alive)]
+            futs = [ex.submit(sweep_ticker, t, batch, args.period, args.yf_fallback) for t in wave]
+            for fut in as_completed(futs):
+                res = fut.result()
+                if res["error"]:
+                    errors[res["ticker"]] = res["error"]
+                for cid, (rets, bars, reasons) in res["results"].items():
+                    accs[cid].add(rets, bars, reasons)
+            if args.prune_z > 0 and w < len(waves):
+                drop = dominated({c: accs[c].stats() for c in alive}, args.min_trades, args.prune_z)
+                for c in drop:
+                    alive.discard(c)
+                    pruned_at[c] = w
+            print(f"wave {w}/{len(waves)} tickers={len(wave)} alive={len(alive)} "
+                  f"pruned={len(pruned_at)} t={time.perf_counter() - t0:.1f}s")
+
+    rows = []
+    for cid, p in enumerate(configs):
+        s = accs[cid].stats()
+        rows.append({
+            **{k: getattr(p, k) for k in space},
+            "trades": s["trades"], "win_rate": round(s["win_rate"], 4),
+            "avg_ret_pct": round(s["avg_ret_pct"], 3), "median_ret_pct": round(s["median_ret_pct"], 3),
+            "serial_mean_pct": round(s["serial_mean_pct"], 3), "avg_bars": round(s["avg_bars"], 1),
+            "exit_breakdown": json.dumps(s["exit_breakdown"]), "tickers": s["tickers"],
+            "pruned_wave": pruned_at.get(cid, 0), "params": json.dumps(asdict(p)),
+        })
+    table = pd.DataFrame(rows)
+    # configs that saw the whole universe rank ahead of pruned ones
+    table = table.assign(_full=table["pruned_wave"].eq(0)).sort_values(
+        ["_full", args.rank_by, "trades"], ascending=False, kind="stable").drop(columns="_full")
+    table.insert(0, "rank", range(1, len(table) + 1))
+
+    if os.path.dirname(args.out):
+        os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    table.to_csv(args.out, index=False)
+
+    if errors:
+        print(f"Skipped {len(errors)} tickers: " + ", ".join(f"{t} ({e})" for t, e in list(errors.items())[:10]))
+    with pd.option_context("display.width", 200, "display.max_columns", 30):
+        print(table.drop(columns=["params"]).head(args.top).to_string(index=False))
+    print(f"\nSaved {len(table)} configs to: {args.out}  ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,10 @@ Examples
 
 Notes
 - For 1H, running daily will accumulate >730d over time.
-- For RS calculations, also sync 1D for SPY + tickers.
+- For RS calculations, also sync 1D for SPY + tickers; a 1D sync rebuilds the RS_1Y table
+  (rs_strength.build_rs_table) for every 1D ticker in the store unless --no-rs.
+- Tickers whose latest closed bar is already stored are not fetched (see SYNC_STATS line).
+- Each sync writes only a small delta per ticker; fold them with jobs/compact_store.py.
 """
 
 from __future__ import annotations
@@ -19,7 +22,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from monitor.config import WATCHLIST
-from data_store import sync_and_load
+from data_store import sync_many, format_sync_report, format_sync_stats
+from rs_strength import build_rs_table
 
 
 def main():
@@ -30,6 +34,11 @@ def main():
     ap.add_argument("--days", type=int, default=120)
     ap.add_argument("--gap-threshold", type=int, default=7, help="auto-backfill if local gap exceeds N days")
     ap.add_argument("--max-auto-days", type=int, default=730, help="cap for auto-backfill lookback days")
+    ap.add_argument("--workers", type=int, default=8, help="concurrent fetch threads")
+    ap.add_argument("--rate", type=float, default=4.0, help="max yfinance requests per second (all threads)")
+    ap.add_argument("--no-batch", action="store_true", help="disable batched yf.download for shared windows")
+    ap.add_argument("--no-freshness", action="store_true", help="always refetch the full --days window")
+    ap.add_argument("--no-rs", action="store_true", help="1d: skip rebuilding the RS_1Y table")
     args = ap.parse_args()
 
     if args.watchlist:
@@ -44,16 +53,31 @@ def main():
     if args.interval == "1d" and "SPY" not in tickers:
         tickers = ["SPY"] + tickers
 
-    for t in tickers:
-        df = sync_and_load(
-            t,
-            interval=args.interval,
-            lookback_days=args.days,
-            # auto-backfill settings
-            gap_days_threshold=args.gap_threshold,
-            max_auto_lookback_days=args.max_auto_days,
-        )
+    results = sync_many(
+        tickers,
+        interval=args.interval,
+        lookback_days=args.days,
+        # auto-backfill settings
+        gap_days_threshold=args.gap_threshold,
+        max_auto_lookback_days=args.max_auto_days,
+        max_workers=args.workers,
+        rate_per_sec=args.rate,
+        batch_fetcher=False if args.no_batch else None,
+        freshness=not args.no_freshness,
+    )
+    for t, r in results.items():
+        df = r.df
+        if df is None or df.empty:
+            print(f"{t:<8} {args.interval} rows={0:>6}  {r.error or 'no data'}")
+            continue
         print(f"{t:<8} {args.interval} rows={len(df):>6}  range={df.index.min()} -> {df.index.max()}")
+    print(format_sync_report(results))
+    print(format_sync_stats())
+
+    if args.interval == "1d" and not args.no_rs:
+        rs = build_rs_table()
+        last = rs.index.max() if not rs.empty else None
+        print(f"RS_TABLE tickers={rs.shape[1]} days={rs.shape[0]} last={last}")
 
 
 if __name__ == "__main__":
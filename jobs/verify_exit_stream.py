@@ -0,0 +1,163 @@
+"""Offline checks for the streaming exit monitor (broker.quote_stream + exit_only --stream).
+
+Examples
+  python3 jobs/verify_exit_stream.py
+
+Checks
+- subscribe: the first refresh subscribes every open position, nothing else.
+- coalesce: several queued pushes for one symbol are evaluated once at the latest price; a push
+  at an unchanged price and a push for an unsubscribed symbol are not evaluated.
+- events: a push crossing SL / TP raises an event for that symbol only.
+- retrigger: a symbol that raised an event is not re-evaluated within retrigger_sec, and is
+  again after it.
+- positions: a position closed by the exit path is unsubscribed after the event; a new
+  position is subscribed on the next refresh.
+- run_stream: monitor/exit_only.run_stream with a FakeQuotePublisher and injected positions /
+  event handler (no QuoteContext, no orders) handles a push and unsubscribes all on exit.
+
+Exit code is 1 if any check fails (usable from cron / CI).
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'monitor'))
+
+from broker.quote_stream import ExitQuoteStream, FakeQuotePublisher
+
+RETRIGGER_SEC = 0.2
+
+
+def positions() -> dict:
+    return {
+        'AAPL.US': {'entry': 100.0, 'sl': 95.0, 'tp': 120.0},
+        'MSFT.US': {'entry': 300.0, 'sl': 280.0, 'tp': 330.0},
+    }
+
+
+class Harness:
+    """ExitQuoteStream over a FakeQuotePublisher; handled events close the position if asked."""
+
+    def __init__(self, close_on_event: bool = False):
+        self.pos = positions()
+        self.close_on_event = close_on_event
+        self.handled = []
+        self.pub = FakeQuotePublisher()
+        self.stream = ExitQuoteStream(self.pub, lambda: dict(self.pos), self.on_events,
+                                      refresh_sec=3600, retrigger_sec=RETRIGGER_SEC)
+        self.stream.refresh()
+
+    def on_events(self, open_pos, events):
+        self.handled.append([(e.symbol, e.kind) for e in events])
+        if self.close_on_event:
+            for e in events:
+                self.pos.pop(e.symbol, None)
+
+
+def _report(name: str, ok: bool, detail: str) -> bool:
+    print(f"{name:<10} {'OK' if ok else 'FAIL'}  {detail}")
+    return ok
+
+
+def check_subscribe() -> bool:
+    h = Harness()
+    ok = h.pub.calls == [('subscribe', ['AAPL.US', 'MSFT.US'])] and h.pub.subscribed == {'AAPL.US', 'MSFT.US'}
+    return _report('subscribe', ok, f"calls={h.pub.calls}")
+
+
+def check_coalesce() -> bool:
+    h = Harness()
+    for px in (99.0, 98.0, 97.0):
+        h.pub.publish('AAPL.US', px)
+    h.pub.publish('MSFT.US', 301.0)
+    h.stream.pump()
+    first = (h.stream.ticks, h.stream.evaluated)
+    h.pub.publish('MSFT.US', 301.0)           # unchanged price
+    unsub = h.pub.publish('NVDA.US', 1.0)     # not subscribed: never delivered
+    h.stream.pump()
+    ok = (first == (4, 2) and h.stream.evaluated == 2 and h.stream.ticks == 5
+          and h.stream.last == {'AAPL.US': 97.0, 'MSFT.US': 301.0} and not unsub and not h.handled)
+    return _report('coalesce', ok, f"ticks/evaluated {first} -> {(h.stream.ticks, h.stream.evaluated)} last={h.stream.last}")
+
+
+def check_events() -> bool:
+    h = Harness()
+    h.pub.publish('AAPL.US', 94.0)            # below SL 95
+    h.pub.publish('MSFT.US', 310.0)           # inside the band
+    ev = h.stream.pump()
+    h.pub.publish('MSFT.US', 331.0)           # above TP 330
+    ev2 = h.stream.pump()
+    ok = ([(e.symbol, e.kind) for e in ev] == [('AAPL.US', 'STOP_LOSS')]
+          and [(e.symbol, e.kind) for e in ev2] == [('MSFT.US', 'TAKE_PROFIT')]
+          and h.handled == [[('AAPL.US', 'STOP_LOSS')], [('MSFT.US', 'TAKE_PROFIT')]])
+    return _report('events', ok, f"handled={h.handled}")
+
+
+def check_retrigger() -> bool:
+    h = Harness()
+    h.pub.publish('AAPL.US', 94.0)
+    a = len(h.stream.pump())
+    h.pub.publish('AAPL.US', 93.0)            # still open, inside the retrigger window
+    b = len(h.stream.pump())
+    time.sleep(RETRIGGER_SEC * 1.5)
+    h.pub.publish('AAPL.US', 92.0)            # window over
+    c = len(h.stream.pump())
+    ok = (a, b, c) == (1, 0, 1)
+    return _report('retrigger', ok, f"events per push={(a, b, c)} window={RETRIGGER_SEC}s")
+
+
+def check_positions() -> bool:
+    h = Harness(close_on_event=True)
+    h.pub.publish('AAPL.US', 94.0)
+    h.stream.pump()                           # exit path closes AAPL -> refresh unsubscribes it
+    after_exit = sorted(h.pub.subscribed)
+    h.pos['NVDA.US'] = {'entry': 10.0, 'sl': 9.0, 'tp': 12.0}
+    h.stream.refresh()
+    ok = (after_exit == ['MSFT.US'] and h.pub.subscribed == {'MSFT.US', 'NVDA.US'}
+          and h.pub.calls[1:] == [('unsubscribe', ['AAPL.US']), ('subscribe', ['NVDA.US'])])
+    return _report('positions', ok, f"calls={h.pub.calls}")
+
+
+def check_run_stream() -> bool:
+    import exit_only
+
+    pub = FakeQuotePublisher()
+    pos = positions()
+    handled = []
+    out = {}
+
+    def handle(open_pos, events):
+        handled.extend((e.symbol, e.kind) for e in events)
+        for e in events:
+            pos.pop(e.symbol, None)
+
+    t = threading.Thread(target=lambda: out.update(stream=exit_only.run_stream(
+        source=pub, max_minutes=1.0 / 60, load_positions=lambda: dict(pos), handle_events=handle)))
+    t.start()
+    deadline = time.monotonic() + 2.0
+    while pub.subscribed != {'AAPL.US', 'MSFT.US'} and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pub.publish('MSFT.US', 275.0)             # below SL 280
+    t.join(timeout=5.0)
+    stream = out.get('stream')
+    ok = (not t.is_alive() and stream is not None and handled == [('MSFT.US', 'STOP_LOSS')]
+          and not pub.subscribed and pub.calls[-1] == ('unsubscribe', ['AAPL.US']))
+    return _report('run_stream', ok, f"handled={handled} calls={pub.calls}")
+
+
+def main():
+    ok = True
+    for check in (check_subscribe, check_coalesce, check_events, check_retrigger, check_positions,
+                  check_run_stream):
+        ok &= check()
+    print('EXIT_STREAM_OK' if ok else 'EXIT_STREAM_FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Parity checks for the optimized indicator paths vs the reference implementation.
+
+Examples
+  python3 jobs/verify_parity.py --tickers TSLA,AAPL
+  python3 jobs/verify_parity.py --synthetic 5
+
+Checks
+- incremental: add_all_indicators_incremental (cache df[:split], extend to df) vs full recompute,
+  across every column of add_all_indicators, within analyzer.incremental.TOLERANCE.
+- numpy: add_all_indicators(engine='numpy') vs engine='pandas', within
+  analyzer.indicators_np.TOLERANCE (bb_pct20 on zero-width bands is skipped, see that module).
+- selective: compute_indicators(needs=...) for the scan / backtest need sets vs the same
+  columns of add_all_indicators (pandas: identical; numpy: within its TOLERANCE).
+- score: monitor/signal_engine.score_signal_vectorized vs score_signal row by row (score,
+  risk_mode, suggest/tp/sl prices, rr), with RS_1Y / KB bonus cycled through every band.
+- structure: strategy.structure.structure_{1,2}buy_series vs the per-bar
+  structure_{1,2}buy_signal at every bar (same hits, same entry/sl/tp/box/breakout_i).
+- panel: analyzer.panel over all loaded tickers at once (right-aligned, unequal lengths) vs
+  per-ticker add_all_indicators, within indicators_np.TOLERANCE.
+
+Data
+- Local parquet store (data/store/1h) by default; --synthetic N uses random-walk OHLCV instead
+  so the check can run without network or a populated store.
+
+Exit code is 1 if any check fails (usable from cron / CI).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'monitor'))
+
+from analyzer.incremental import verify_incremental
+from analyzer.indicators import add_all_indicators, compute_indicators
+from analyzer import indicators_np
+from analyzer.panel import compute_panel
+
+
+def synthetic_ohlcv(n: int = 3000, seed: int = 0, start: float = 100.0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range('2024-01-02 14:30', periods=n, freq='h')
+    close = start * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * np.exp(rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n)))
+    volume = rng.integers(100_000, 1_000_000, n).astype(float)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=idx)
+
+
+def load_frames(args) -> dict:
+    if args.synthetic:
+        # unequal lengths so the panel check exercises right-alignment
+        return {f'SYN{i}': synthetic_ohlcv(n=3000 - 250 * i, seed=i, start=20.0 + 50 * i)
+                for i in range(args.synthetic)}
+
+    from data_store import load_local
+    tickers = [t.strip().upper() for t in args.tickers.split(',') if t.strip()]
+    frames = {}
+    for t in tickers:
+        df = load_local(t, interval=args.interval)
+        if df is None or df.empty:
+            print(f'{t:<8} SKIP no local data')
+            continue
+        df.columns = [c.lower() for c in df.columns]
+        frames[t] = df
+    return frames
+
+
+def check_incremental(name: str, df: pd.DataFrame) -> bool:
+    ok = True
+    n = len(df)
+    for split in sorted({max(1, n // 2), max(1, n - 10), max(1, n - 1)}):
+        r = verify_incremental(df, split)
+        status = 'OK' if not r['bad_columns'] else 'FAIL'
+        ok &= not r['bad_columns']
+        print(f"{name:<8} incremental split={split:<6} rows={r['rows_computed']:<6} "
+              f"max_abs_err={r['max_abs_err']:.2e} {status} {','.join(r['bad_columns'])}")
+    return ok
+
+
+def compare_columns(ref: pd.DataFrame, got: pd.DataFrame, tol: float, skip: dict | None = None) -> tuple[float, list]:
+    """Return (max_abs_err, bad_columns) comparing every column of `ref` with `got`.
+
+    skip: {column: bool mask of rows to ignore}
+    """
+    bad = []
+    max_err = 0.0
+    if list(got.columns) != list(ref.columns) or not got.index.equals(ref.index):
+        bad.append('__shape__')
+        return max_err, bad
+    for c in ref.columns:
+        a = pd.to_numeric(ref[c], errors='coerce').to_numpy(dtype=float)
+        b = pd.to_numeric(got[c], errors='coerce').to_numpy(dtype=float)
+        keep = ~skip[c] if skip and c in skip else np.ones(len(a), dtype=bool)
+        a, b = a[keep], b[keep]
+        both_nan = np.isnan(a) & np.isnan(b)
+        err = np.where(both_nan, 0.0, np.abs(a - b))
+        if np.any(np.isnan(err)) or np.any(err > tol * np.maximum(1.0, np.abs(a))):
+            bad.append(c)
+        finite = err[np.isfinite(err)]
+        if len(finite):
+            max_err = max(max_err, float(finite.max()))
+    return max_err, bad
+
+
+def check_numpy(name: str, df: pd.DataFrame) -> bool:
+    ref = add_all_indicators(df)
+    got = add_all_indicators(df, engine='numpy')
+    flat = (got['bb_upper20'] - got['bb_lower20']).to_numpy() == 0
+    err, bad = compare_columns(ref, got, indicators_np.TOLERANCE, skip={'bb_pct20': flat})
+    status = 'OK' if not bad else 'FAIL'
+    print(f"{name:<8} numpy       rows={len(df):<6} max_abs_err={err:.2e} {status} {','.join(bad)}")
+    return not bad
+
+
+SELECTIVE_NEEDS = {
+    'score': {'rsi14', 'bb_pct20', 'macd_hist', 'vol_ratio', 'above_ma200', 'above_ma50', 'above_ma20',
+              'ret_5d', 'kdj_k', 'kdj_j', 'atr14', 'atr_pct14', 'ma20', 'ma50', 'ma200'},
+    'phase1': {'rsi14', 'bb_pct20'},
+    'slope': {'ma20_slope', 'body_ratio', 'pct_from_52w_high'},
+}
+
+
+def check_selective(name: str, df: pd.DataFrame) -> bool:
+    ok = True
+    full = add_all_indicators(df)
+    for label, needs in SELECTIVE_NEEDS.items():
+        for engine, tol in (('pandas', 0.0), ('numpy', indicators_np.TOLERANCE)):
+            got = compute_indicators(df, needs=needs, engine=engine)
+            missing = sorted(needs - set(got.columns))
+            ref = full[list(got.columns)]
+            skip = None
+            if engine == 'numpy' and 'bb_pct20' in got.columns:
+                skip = {'bb_pct20': (got['bb_upper20'] - got['bb_lower20']).to_numpy() == 0}
+            err, bad = compare_columns(ref, got, tol, skip=skip)
+            bad += missing
+            ok &= not bad
+            print(f"{name:<8} selective   {label:<7}{engine:<7} cols={got.shape[1]:<3} "
+                  f"max_abs_err={err:.2e} {'OK' if not bad else 'FAIL'} {','.join(bad)}")
+    return ok
+
+
+SCORE_FIELDS = ['score', 'risk_mode', 'price', 'suggest_price', 'tp_price', 'sl_price', 'rr_ratio']
+
+
+def check_score(name: str, df: pd.DataFrame, rows: int = 1500) -> bool:
+    from signal_engine import score_signal, score_signal_vectorized
+
+    ind = add_all_indicators(df).iloc[-rows:]
+    n = len(ind)
+    rs = np.resize([-999.0, -5.0, 5.0, 20.0, np.nan], n)
+    kb = np.resize([0, 8, 15], n)
+    vec = score_signal_vectorized(ind, ticker=name, rs_1y=rs, kb_bonus=kb)
+
+    bad = set()
+    for i in range(n):
+        ref = score_signal(ind.iloc[i], name, rs_1y=float(rs[i]), kb_bonus=int(kb[i]))
+        got = vec.iloc[i]
+        for f in SCORE_FIELDS:
+            a, b = ref[f], got[f]
+            if not (a == b or (isinstance(a, float) and a != a and b != b)):
+                bad.add(f)
+    ok = not bad
+    print(f"{name:<8} score       rows={n:<6} fields={len(SCORE_FIELDS)} {'OK' if ok else 'FAIL'} {','.join(sorted(bad))}")
+    return ok
+
+
+def check_structure(name: str, df: pd.DataFrame) -> bool:
+    from strategy.structure import (StructureParams, series_signal, structure_1buy_series, structure_1buy_signal,
+                                    structure_2buy_series, structure_2buy_signal)
+
+    ind = add_all_indicators(df)
+    p = StructureParams()
+    ok = True
+    for typ, scalar, series in (('1buy', structure_1buy_signal, structure_1buy_series),
+                                ('2buy', structure_2buy_signal, structure_2buy_series)):
+        frame = series(ind, p)
+        hits, bad = 0, []
+        for i in range(len(ind)):
+            a = scalar(ind, i, p)
+            b = series_signal(frame, i, typ)
+            hits += a is not None
+            if (a is None) != (b is None) or (a and a != b):
+                bad.append(i)
+        ok &= not bad
+        print(f"{name:<8} structure   {typ} hits={hits:<5} {'OK' if not bad else 'FAIL'} "
+              f"{','.join(map(str, bad[:10]))}")
+    return ok
+
+
+def check_panel(frames: dict) -> bool:
+    ok = True
+    panel = compute_panel(frames)
+    for name, df in frames.items():
+        ref = add_all_indicators(df)
+        got = panel.frame(name)
+        got = got[[c for c in ref.columns if c in got.columns]]
+        ref = ref[got.columns]
+        flat = (got['bb_upper20'] - got['bb_lower20']).to_numpy() == 0
+        err, bad = compare_columns(ref, got, indicators_np.TOLERANCE, skip={'bb_pct20': flat})
+        if panel.latest_row(name).name != df.index[-1]:
+            bad.append('__latest__')
+        ok &= not bad
+        print(f"{name:<8} panel       rows={len(df):<6} max_abs_err={err:.2e} {'OK' if not bad else 'FAIL'} {','.join(bad)}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--tickers', default='TSLA,AAPL,NVDA')
+    ap.add_argument('--interval', default='1h', choices=['1h', '1d'])
+    ap.add_argument('--synthetic', type=int, default=0, help='use N synthetic tickers instead of the store')
+    args = ap.parse_args()
+
+    frames = load_frames(args)
+    if not frames:
+        raise SystemExit('No data to check. Sync the store first or pass --synthetic N')
+
+    ok = True
+    for name, df in frames.items():
+        ok &= check_incremental(name, df)
+        ok &= check_numpy(name, df)
+        ok &= check_selective(name, df)
+        ok &= check_score(name, df)
+        ok &= check_structure(name, df)
+    ok &= check_panel(frames)
+
+    print('PARITY_OK' if ok else 'PARITY_FAIL')
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
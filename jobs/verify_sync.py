@@ -0,0 +1,143 @@
+"""Offline checks for data_store.sync_many (stub fetchers, temporary store).
+
+Examples
+  python3 jobs/verify_sync.py
+
+Checks
+- rate: per-ticker fetches share one token bucket; N fetches at rate r with burst b take at
+  least (N - b) / r seconds, whatever max_workers is.
+- retry: a fetcher failing twice succeeds on attempt 3 (attempts=3, ok); one that always fails
+  gives up after `retries` attempts with error set and the local history kept.
+- batch: tickers sharing a window go through one batch_fetcher call; tickers missing from the
+  batch result fall back to a single fetch (batched=False) and still end up ok.
+- merge: a second sync merges the new bars into the stored history (union of both fetches,
+  no duplicate timestamps, stored rows kept) and load_local returns the merged frame.
+
+Data
+- Stub bars are hourly, with close a function of the timestamp only (so overlapping fetches
+  agree and no re-adjust refetch is triggered). Nothing touches the network or data/store.
+
+Exit code is 1 if any check fails (usable from cron / CI).
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_store import StoreConfig, load_local, sync_many
+
+
+def stub_bars(start, end) -> pd.DataFrame:
+    idx = pd.date_range(pd.Timestamp(start.date()), pd.Timestamp(end.date()), freq='h', inclusive='left')
+    close = 100.0 + (idx.asi8 // 3_600_000_000_000 % 97) / 10.0
+    return pd.DataFrame({'open': close, 'high': close + 0.5, 'low': close - 0.5, 'close': close,
+                         'volume': np.full(len(idx), 1000.0)}, index=idx)
+
+
+class StubFetcher:
+    """fetcher(ticker, interval, start, end) with per-ticker failure counts and a call log."""
+
+    def __init__(self, fail: dict | None = None, cut: float | None = None):
+        self.fail = dict(fail or {})  # ticker -> failures before success (-1: always)
+        self.cut = cut                # keep only this fraction of the window (oldest part)
+        self.calls = []               # (ticker, monotonic time)
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker, interval, start, end):
+        with self._lock:
+            self.calls.append((ticker, time.monotonic()))
+            n = self.fail.get(ticker, 0)
+            if n:
+                self.fail[ticker] = n - 1 if n > 0 else n
+                raise ConnectionError(f'stub failure for {ticker}')
+        df = stub_bars(start, end)
+        return df.iloc[:int(len(df) * self.cut)] if self.cut else df
+
+
+def _report(name: str, ok: bool, detail: str) -> bool:
+    print(f"{name:<8} {'OK' if ok else 'FAIL'}  {detail}")
+    return ok
+
+
+def check_rate(cfg: StoreConfig) -> bool:
+    n, rate, burst = 12, 40.0, 2
+    f = StubFetcher()
+    t0 = time.perf_counter()
+    res = sync_many([f'R{i}' for i in range(n)], interval='1h', lookback_days=5, cfg=cfg, max_workers=8,
+                    rate_per_sec=rate, burst=burst, fetcher=f, batch_fetcher=False, freshness=False)
+    took = time.perf_counter() - t0
+    floor = (n - burst) / rate
+    ok = all(r.ok for r in res.values()) and len(f.calls) == n and took >= 0.9 * floor
+    return _report('rate', ok, f"calls={len(f.calls)} took={took:.3f}s floor={floor:.3f}s")
+
+
+def check_retry(cfg: StoreConfig) -> bool:
+    f = StubFetcher(fail={'FLAKY': 2, 'DEAD': -1})
+    res = sync_many(['FLAKY', 'DEAD'], interval='1h', lookback_days=5, cfg=cfg, retries=3, backoff=0.01,
+                    rate_per_sec=0, fetcher=f, batch_fetcher=False, freshness=False)
+    fl, dead = res['FLAKY'], res['DEAD']
+    ok = (fl.ok and fl.attempts == 3 and fl.rows > 0 and not fl.error
+          and not dead.ok and dead.attempts == 3 and 'ConnectionError' in dead.error and dead.rows == 0)
+    return _report('retry', ok, f"FLAKY attempts={fl.attempts} ok={fl.ok}; DEAD attempts={dead.attempts} error={dead.error!r}")
+
+
+def check_batch(cfg: StoreConfig) -> bool:
+    single = StubFetcher()
+    batch_calls = []
+
+    def batch(tickers, interval, start, end):
+        batch_calls.append(list(tickers))
+        # the batch "loses" B2, as yf.download does for some symbols
+        return {t: stub_bars(start, end) for t in tickers if t != 'B2'}
+
+    res = sync_many(['B1', 'B2', 'B3'], interval='1h', lookback_days=5, cfg=cfg, rate_per_sec=0,
+                    fetcher=single, batch_fetcher=batch, freshness=False)
+    ok = (len(batch_calls) == 1 and sorted(batch_calls[0]) == ['B1', 'B2', 'B3']
+          and res['B1'].batched and res['B3'].batched and not res['B2'].batched
+          and [t for t, _ in single.calls] == ['B2']
+          and all(r.ok and r.rows > 0 for r in res.values()))
+    return _report('batch', ok, f"batch_calls={batch_calls} single={[t for t, _ in single.calls]} "
+                                f"batched={[t for t, r in res.items() if r.batched]}")
+
+
+def check_merge(cfg: StoreConfig) -> bool:
+    first = sync_many(['M1'], interval='1h', lookback_days=5, cfg=cfg, rate_per_sec=0,
+                      fetcher=StubFetcher(cut=0.5), batch_fetcher=False, freshness=False)['M1']
+    second = sync_many(['M1'], interval='1h', lookback_days=5, cfg=cfg, rate_per_sec=0,
+                       fetcher=StubFetcher(), batch_fetcher=False, freshness=False)['M1']
+    stored = load_local('M1', '1h', cfg)
+    ok = (first.ok and second.ok and first.rows > 0 and second.rows > first.rows
+          and stored.index.is_unique and stored.index.is_monotonic_increasing
+          and len(stored) == second.rows
+          and first.df.index.isin(stored.index).all()
+          and second.fetched_rows == second.rows)
+    return _report('merge', ok, f"rows {first.rows} -> {second.rows} stored={len(stored)} "
+                                f"unique={stored.index.is_unique}")
+
+
+def main():
+    base = tempfile.mkdtemp(prefix='verify_sync_')
+    try:
+        cfg = StoreConfig(base_dir=base)
+        ok = True
+        for check in (check_rate, check_retry, check_batch, check_merge):
+            ok &= check(cfg)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+    print('SYNC_OK' if ok else 'SYNC_FAIL')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
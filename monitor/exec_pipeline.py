@@ -0,0 +1,527 @@
+"""Asyncio execution pipeline for full_scan strong buy signals.
+
+Before: full_scan ran the whole execution block once per strong signal, every step blocking
+on the network: reconcile -> cash / positions -> per-symbol double quote -> intent -> submit.
+
+Pipeline:
+1) account (start_account_prefetch): broker reconcile, live position count and available cash
+   run concurrently on a worker thread; without a prefetch they run inline (still concurrent).
+   Live full_scan starts it once phase1 has candidates, so it overlaps phase2 scoring. That
+   costs those broker calls (positions x2 incl. reconcile, cash) on every such scan, also
+   when no strong signal comes out; the result is then consumed by finish_account_prefetch
+   (reconcile report). EXEC_PREFETCH=0: only inside execution, as before.
+   The reconcile runs on its own thread with its own trading-state session (sessions are
+   per thread), which it flushes itself.
+2) gates (event loop thread, trading-state reads): idempotency key, pending buy, cooldown.
+3) quotes + intents: one task per remaining signal. get_quote_twice runs in a thread
+   (at most EXEC_QUOTE_CONCURRENCY=8 at once) and the symbol is evaluated as soon as its
+   quotes land: staleness, double-quote drift, high/low price, signal drift,
+   try_build_order_intent, compute_metrics.
+4) submit: Top-1 by execution score, as the old block (and strategy.portfolio_sim's
+   max_buys_per_bar=1). Nothing is bought at MAX_NEW_BUYS_PER_DAY or MAX_OPEN_POS, or if
+   the best intent would break TOTAL_RISK_CAP or MIN_CASH_BUFFER_USD (the next candidate
+   is not tried). paper ledger -> pre-submit requote -> submit_live_order -> add_pending_order ->
+   mark_executed / add_open_position / inc_daily.
+
+Latency (per run):
+- bar close = bar_time + EXEC_BAR_MINUTES (default 60). bar_time is read in EXEC_BAR_TZ
+  (default UTC: data_store indexes are naive UTC).
+- each submission records latency_s = submit time - bar close. A negative value means the
+  signal bar was still forming.
+- printed as an EXEC_LATENCY line and added to the full_scan scan_timing.jsonl record.
+
+Usage:
+  prefetch = start_account_prefetch()          # before scoring
+  ...
+  if strong_buy:
+      execute_strong_signals(strong_buy, account=prefetch)
+  else:
+      finish_account_prefetch(prefetch)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from broker.trading_env import is_live, live_trading_enabled
+from scan_timing import SCAN_TIMER, stage
+
+
+@dataclass
+class ExecLimits:
+    max_open_pos: int = 1
+    max_price_pct_equity: float = 0.35
+    total_risk_cap_pct: float = 0.02
+    max_new_buys_per_day: int = 1
+    price_drift_max_pct: float = 0.015
+    max_spread_pct: float = 0.008
+    double_quote_drift_pct: float = 0.006
+    quote_stale_sec: float = 60.0
+    min_price_usd: float = 5.0
+    min_cash_buffer_usd: float = 50.0
+    quote_concurrency: int = 8
+
+    @classmethod
+    def from_env(cls) -> "ExecLimits":
+        e = os.environ.get
+        return cls(
+            max_open_pos=int(e('MAX_OPEN_POS', '1')),
+            max_price_pct_equity=float(e('MAX_PRICE_PCT_EQUITY', '0.35')),
+            total_risk_cap_pct=float(e('TOTAL_RISK_CAP', '0.02')),
+            max_new_buys_per_day=int(e('MAX_NEW_BUYS_PER_DAY', '1')),
+            price_drift_max_pct=float(e('PRICE_DRIFT_MAX_PCT', '0.015')),
+            max_spread_pct=float(e('MAX_SPREAD_PCT', '0.008')),
+            double_quote_drift_pct=float(e('DOUBLE_QUOTE_DRIFT_PCT', '0.006')),
+            quote_stale_sec=float(e('QUOTE_STALE_SEC', '60')),
+            min_price_usd=float(e('MIN_PRICE_USD', '5')),
+            min_cash_buffer_usd=float(e('MIN_CASH_BUFFER_USD', '50')),
+            quote_concurrency=max(1, int(e('EXEC_QUOTE_CONCURRENCY', '8'))),
+        )
+
+
+@dataclass
+class AccountSnapshot:
+    equity: float
+    open_pos_count: int
+    reconcile: Optional[Dict[str, Any]] = None
+    reconcile_error: Optional[str] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class Candidate:
+    score: float
+    intent: Any  # broker.paper_executor.OrderIntent
+    key: str
+    sig: dict
+
+
+@dataclass
+class ExecReport:
+    signals: int = 0
+    quoted: int = 0
+    intents: int = 0
+    skipped: List[Tuple[str, str, str]] = field(default_factory=list)  # (symbol, reason, key)
+    submissions: List[Dict[str, Any]] = field(default_factory=list)
+    account_wait_s: float = 0.0
+    quotes_s: float = 0.0
+    total_s: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'signals': self.signals,
+            'quoted': self.quoted,
+            'intents': self.intents,
+            'skipped': len(self.skipped),
+            'submitted': len(self.submissions),
+            'account_wait_s': round(self.account_wait_s, 3),
+            'quotes_s': round(self.quotes_s, 3),
+            'total_s': round(self.total_s, 3),
+            'submissions': self.submissions,
+        }
+
+
+# ── 1) account: reconcile / positions / cash ──
+
+def _available_cash() -> Optional[float]:
+    try:
+        from broker.account import get_available_cash
+        return get_available_cash('USD')
+    except Exception:
+        return None
+
+
+def _open_position_count() -> int:
+    if not is_live():
+        return 0
+    try:
+        from broker.positions import fetch_stock_positions
+        return len(fetch_stock_positions())
+    except Exception:
+        return 0
+
+
+def _reconcile() -> Tuple[Optional[dict], Optional[str]]:
+    # reconcile local open_positions with broker positions (prevents drift)
+    try:
+        from broker.reconcile import reconcile_open_positions
+        return reconcile_open_positions(), None
+    except Exception as e:
+        return None, str(e)
+
+
+async def prefetch_account() -> AccountSnapshot:
+    t0 = time.perf_counter()
+    equity, n_open, (rrec, rerr) = await asyncio.gather(
+        asyncio.to_thread(_available_cash),
+        asyncio.to_thread(_open_position_count),
+        asyncio.to_thread(_reconcile),
+    )
+    if equity is None:
+        equity = float(os.environ.get('PAPER_EQUITY', '100000'))
+    return AccountSnapshot(equity=float(equity), open_pos_count=int(n_open), reconcile=rrec,
+                           reconcile_error=rerr, seconds=time.perf_counter() - t0)
+
+
+def _run_prefetch() -> AccountSnapshot:
+    with stage('execution.prefetch'):
+        return asyncio.run(prefetch_account())
+
+
+def start_account_prefetch() -> "Future[AccountSnapshot]":
+    """Run prefetch_account() on a worker thread. Every started prefetch must be consumed:
+    execute_strong_signals(account=...) or finish_account_prefetch()."""
+    ex = ThreadPoolExecutor(max_workers=1, thread_name_prefix='exec-prefetch')
+    try:
+        return ex.submit(_run_prefetch)
+    finally:
+        ex.shutdown(wait=False)
+
+
+def _report_account(acct: AccountSnapshot) -> None:
+    if acct.reconcile_error is not None:
+        print(f"  [reconcile failed] {acct.reconcile_error}")
+    elif acct.reconcile and (acct.reconcile.get('removed') or acct.reconcile.get('added')):
+        rrec = acct.reconcile
+        print(f"\n[RECONCILE] added={len(rrec.get('added', []))} removed={len(rrec.get('removed', []))}")
+
+
+def finish_account_prefetch(account: "Future[AccountSnapshot]") -> Optional[AccountSnapshot]:
+    """Wait for a prefetch that no execution will use (no strong signal) and report it."""
+    try:
+        acct = account.result()
+    except Exception as e:
+        print(f"  [exec-prefetch failed] {e}")
+        return None
+    _report_account(acct)
+    return acct
+
+
+# ── latency ──
+
+def bar_close_utc(sig: dict) -> Optional[datetime]:
+    """Close time (UTC) of the signal bar: bar_time + EXEC_BAR_MINUTES."""
+    raw = sig.get('bar_time') or sig.get('bar_ts')
+    if not raw:
+        return None
+    try:
+        ts = datetime.fromisoformat(str(raw))
+    except Exception:
+        return None
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=ZoneInfo(os.environ.get('EXEC_BAR_TZ', 'UTC')))
+    return ts.astimezone(timezone.utc) + timedelta(minutes=float(os.environ.get('EXEC_BAR_MINUTES', '60')))
+
+
+def format_exec_latency(rep: ExecReport) -> str:
+    parts = [f"EXEC_LATENCY signals={rep.signals} intents={rep.intents} submitted={len(rep.submissions)}"]
+    for s in rep.submissions:
+        lat = s.get('latency_s')
+        parts.append(f"{s['symbol']}={lat:.1f}s" if lat is not None else f"{s['symbol']}=-")
+    parts.append(f"account_wait={rep.account_wait_s:.2f}s quotes={rep.quotes_s:.2f}s total={rep.total_s:.2f}s")
+    return " ".join(parts)
+
+
+# ── 2) + 3) gates, quotes, intents ──
+
+def _quote_twice(qctx, lp_symbol: str, ticker: Optional[str], max_drift_pct: float):
+    from broker.longport_client import get_quote_twice
+    with stage('execution.quotes', ticker=ticker, net_calls=2):
+        return get_quote_twice(qctx, lp_symbol, max_drift_pct=max_drift_pct)
+
+
+def _gate(s: dict) -> Tuple[str, str, Optional[str]]:
+    """(lp_symbol, idempotency key, skip reason or None); trading-state reads only."""
+    from broker.symbol_map import to_longport_symbol
+    from broker.state_store import was_executed, cooldown_active, has_pending_symbol_side
+
+    exec_mode = (s.get('exec_mode') or '').upper()
+    bar_time = s.get('bar_time') or s.get('bar_ts') or ''
+    key = f"{s.get('ticker')}|{exec_mode}|{bar_time}"
+    lp_symbol = to_longport_symbol(s.get('ticker'))
+    if was_executed(key):
+        return lp_symbol, key, 'SKIP_IDEMPOTENT'
+    # prevent duplicate buys while a buy is pending
+    try:
+        if has_pending_symbol_side(lp_symbol, 'Buy'):
+            return lp_symbol, key, 'SKIP_PENDING_BUY'
+    except Exception:
+        pass
+    cd_on, cd_reason = cooldown_active(lp_symbol)
+    if cd_on:
+        return lp_symbol, key, f"SKIP_COOLDOWN:{cd_reason}"
+    return lp_symbol, key, None
+
+
+async def _evaluate(s: dict, lp_symbol: str, key: str, qctx, lim: ExecLimits, equity: float,
+                    sem: asyncio.Semaphore, rep: ExecReport) -> Tuple[Optional[Candidate], Optional[str]]:
+    """Quote one symbol and build its intent: (candidate, None) or (None, skip reason)."""
+    from broker.order_router import try_build_order_intent, PaperTradeConfig
+    from broker.intent_eval import compute_metrics
+
+    async with sem:
+        try:
+            q1, q2, dq_drift = await asyncio.to_thread(
+                _quote_twice, qctx, lp_symbol, s.get('ticker'), lim.double_quote_drift_pct)
+        except Exception as e:
+            return None, f"SKIP_QUOTE_ERROR:{type(e).__name__}"
+    rep.quoted += 1
+    q = q2
+    # quote staleness guard (best-effort): ts is local fetch time; if None skip
+    try:
+        if q.ts is not None:
+            age = (datetime.now(timezone.utc) - q.ts).total_seconds()
+            if age > lim.quote_stale_sec:
+                return None, f'SKIP_QUOTE_STALE:{age:.0f}s'
+    except Exception:
+        pass
+    # double-quote drift guard
+    if dq_drift > lim.double_quote_drift_pct:
+        return None, f'SKIP_DOUBLE_QUOTE_DRIFT:{dq_drift:.3f}'
+    # attach spread threshold for router
+    s['max_spread_pct'] = lim.max_spread_pct
+    # High-price filter for small capital: 1 share cannot exceed a fraction of equity
+    try:
+        last = float(q.last or 0)
+        if last > 0 and last > (equity * lim.max_price_pct_equity):
+            return None, f"SKIP_HIGH_PRICE:{last:.2f}"
+        if last > 0 and last < lim.min_price_usd:
+            return None, f"SKIP_LOW_PRICE:{last:.2f}"
+    except Exception:
+        pass
+    # execution price drift check (signal price vs quote last)
+    try:
+        sig_px = float(s.get('price') or s.get('bar_close') or 0)
+        last = float(q.last or 0)
+        if sig_px > 0 and last > 0:
+            drift = abs(last - sig_px) / sig_px
+            if drift > lim.price_drift_max_pct:
+                return None, f"SKIP_PRICE_DRIFT:{drift:.3f}"
+    except Exception:
+        pass
+
+    intent, reason = try_build_order_intent(
+        s,
+        quote={'last': q.last, 'bid': q.bid, 'ask': q.ask},
+        cfg=PaperTradeConfig(
+            equity=equity,
+            max_sl_pct=float(os.environ.get('MAX_SL_PCT', '0.10')),
+            max_position_pct=float(os.environ.get('MAX_POSITION_PCT', '0.08')),
+            min_price_usd=lim.min_price_usd,
+            min_dollar_vol_20d=float(os.environ.get('MIN_DOLLAR_VOL_20D', '20000000')),
+        ),
+    )
+    if not intent:
+        return None, f"{reason}"
+    metrics = compute_metrics(intent, signal_score=float(s.get('score') or 0))
+    return Candidate(metrics.score, intent, key, s), None
+
+
+def _report_skips(skip_reasons: List[Tuple[str, str, str]]):
+    """EXEC_SKIP summary (debug for dry-run verification) + last_exec_skip in trading state."""
+    try:
+        if not skip_reasons:
+            return
+        cnt = Counter([r[1] for r in skip_reasons])
+        print(f"\n[EXEC_SKIP] skipped={len(skip_reasons)} reasons={len(cnt)}")
+        # persist last skip summary for post-close review
+        try:
+            from broker.state_store import load_state as _lst, save_state as _sst
+            stt = _lst()
+            reasons_list = []
+            for reason, n in cnt.most_common(8):
+                samples = [sym for sym, rs, _k in skip_reasons if rs == reason][:2]
+                reasons_list.append({"reason": reason, "count": int(n), "samples": samples})
+            stt['last_exec_skip'] = {
+                'ts': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'skipped': int(len(skip_reasons)),
+                'reasons': reasons_list,
+            }
+            _sst(stt)
+        except Exception:
+            pass
+        # show top 8 reasons, up to 2 sample symbols each
+        for reason, n in cnt.most_common(8):
+            samples = [sym for sym, rs, _k in skip_reasons if rs == reason][:2]
+            sample_str = ','.join(samples) if samples else '-'
+            print(f"  - {reason}: {n}  (e.g. {sample_str})")
+    except Exception:
+        pass
+
+
+# ── 4) serialized submit ──
+
+def _submit(c: Candidate, qctx, t_exec0: float) -> Dict[str, Any]:
+    from broker.paper_executor import append_ledger
+    from broker.state_store import add_pending_order
+
+    intent = c.intent
+    # Record paper ledger (always) for audit
+    if os.environ.get('PAPER_TRADING', 'on') == 'on':
+        append_ledger(intent, fill_price=intent.limit_price, status='FILLED')
+        print(f"\nPAPER_ORDER:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
+
+    order_id = None
+    # Live submit path (hard-gated). Default is dry-run.
+    if is_live() and live_trading_enabled():
+        from broker.live_executor import submit_live_order
+        dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
+        # PRE_SUBMIT_REQUOTE: refresh quote right before submit and adjust limit
+        try:
+            from broker.longport_client import get_quote
+            with stage('execution.requote', ticker=c.sig.get('ticker'), net_calls=1):
+                qx = get_quote(qctx, intent.symbol)
+            if qx.last is not None:
+                # for Buy, use last*1.002 as aggressive limit when ask unavailable
+                intent.limit_price = round(float(qx.last) * 1.002, 2)
+        except Exception:
+            pass
+
+        with stage('execution.submit', ticker=c.sig.get('ticker'), net_calls=0 if dry_run else 1):
+            r = submit_live_order(intent, dry_run=dry_run)
+        order_id = r.order_id
+        if r.ok and r.dry_run:
+            print(f"\nLIVE_ORDER_DRYRUN:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
+        elif r.ok:
+            print(f"\nLIVE_ORDER_OK:{intent.symbol}:order_id={r.order_id}")
+        else:
+            print(f"\nLIVE_ORDER_FAIL:{intent.symbol}:{r.error}")
+        try:
+            if r.order_id:
+                add_pending_order(r.order_id, {
+                    "symbol": intent.symbol,
+                    "side": intent.side,
+                    "qty": intent.qty,
+                    "limit_price": intent.limit_price,
+                    "sl": intent.sl_price,
+                    "tp": intent.tp_price,
+                    "reason": (c.sig.get('exec_mode') or 'BUY').upper(),
+                    "status": "PENDING",
+                })
+        except Exception:
+            pass
+
+    submitted_at = datetime.now(timezone.utc)
+    bar_close = bar_close_utc(c.sig)
+    return {
+        'symbol': intent.symbol,
+        'ticker': c.sig.get('ticker'),
+        'exec_mode': c.sig.get('exec_mode'),
+        'bar_time': c.sig.get('bar_time') or c.sig.get('bar_ts'),
+        'bar_close': bar_close.isoformat(timespec='seconds') if bar_close else None,
+        'submitted_at': submitted_at.isoformat(timespec='seconds'),
+        'latency_s': round((submitted_at - bar_close).total_seconds(), 3) if bar_close else None,
+        'pipeline_s': round(time.perf_counter() - t_exec0, 3),
+        'order_id': order_id,
+    }
+
+
+async def run_execution(strong_buy: List[dict], *, account: "Future[AccountSnapshot] | None" = None,
+                        limits: Optional[ExecLimits] = None) -> ExecReport:
+    from broker.longport_client import load_config, make_quote_ctx
+    from broker.state_store import (
+        daily_count, inc_daily, total_open_risk_usd, mark_executed, add_open_position,
+        session as state_session,
+    )
+
+    t_exec0 = time.perf_counter()
+    lim = limits or ExecLimits.from_env()
+    rep = ExecReport(signals=len(strong_buy))
+
+    # account data first (the reconcile may have changed open_positions)
+    t0 = time.perf_counter()
+    acct = await (asyncio.wrap_future(account) if account is not None else prefetch_account())
+    rep.account_wait_s = time.perf_counter() - t0
+    _report_account(acct)
+
+    with state_session():
+        equity = acct.equity
+        open_pos_count = acct.open_pos_count
+        # portfolio risk cap (USD)
+        total_risk_cap_usd = equity * lim.total_risk_cap_pct
+        try:
+            cur_risk = float(total_open_risk_usd())
+        except Exception:
+            cur_risk = 0.0
+
+        # daily limits key (UTC date)
+        day_key = datetime.utcnow().strftime('%Y-%m-%d')
+        if daily_count(day_key) >= lim.max_new_buys_per_day:
+            # Already hit daily buy limit
+            rep.total_s = time.perf_counter() - t_exec0
+            return rep
+
+        jobs = []
+        for s in strong_buy:
+            lp_symbol, key, reason = _gate(s)
+            if reason is not None:
+                rep.skipped.append((lp_symbol, reason, key))
+            else:
+                jobs.append((s, lp_symbol, key))
+
+        candidates: List[Candidate] = []
+        if jobs:
+            qctx = make_quote_ctx(load_config())
+            sem = asyncio.Semaphore(lim.quote_concurrency)
+            t0 = time.perf_counter()
+            results = await asyncio.gather(
+                *(_evaluate(s, sym, key, qctx, lim, equity, sem, rep) for s, sym, key in jobs))
+            rep.quotes_s = time.perf_counter() - t0
+            for (s, sym, key), (cand, reason) in zip(jobs, results):
+                if cand is None:
+                    rep.skipped.append((sym, reason, key))
+                else:
+                    candidates.append(cand)
+        candidates.sort(key=lambda c: c.score, reverse=True)
+        rep.intents = len(candidates)
+
+        for c in candidates[:1]:
+            if daily_count(day_key) >= lim.max_new_buys_per_day or open_pos_count >= lim.max_open_pos:
+                break
+            intent = c.intent
+            # portfolio risk cap check (based on known open positions from state)
+            try:
+                new_risk = max(0.0, (float(intent.limit_price) - float(intent.sl_price)) * float(intent.qty))
+            except Exception:
+                new_risk = 0.0
+            if (cur_risk + new_risk) > total_risk_cap_usd:
+                rep.skipped.append((intent.symbol, f"SKIP_RISK_CAP:{total_risk_cap_usd:.0f}", c.key))
+                break
+            # cash buffer guard
+            try:
+                notional = float(intent.limit_price or 0) * float(intent.qty or 0)
+            except Exception:
+                notional = 0.0
+            if (equity - notional) < lim.min_cash_buffer_usd:
+                rep.skipped.append((intent.symbol, f"SKIP_CASH_BUFFER:{lim.min_cash_buffer_usd}", c.key))
+                break
+
+            rep.submissions.append(_submit(c, qctx, t_exec0))
+            mark_executed(c.key, meta={'symbol': intent.symbol, 'qty': intent.qty})
+            try:
+                add_open_position(intent.symbol, intent.qty, float(intent.limit_price or 0), intent.sl_price, intent.tp_price, meta={'key': c.key})
+            except Exception:
+                pass
+            inc_daily(day_key)
+        _report_skips(rep.skipped)
+
+    rep.total_s = time.perf_counter() - t_exec0
+    return rep
+
+
+def execute_strong_signals(strong_buy: List[dict], *, account: "Future[AccountSnapshot] | None" = None,
+                           limits: Optional[ExecLimits] = None) -> ExecReport:
+    """Run the pipeline for full_scan's strong signals; prints EXEC_LATENCY and notes the
+    run summary on SCAN_TIMER (execution=...)."""
+    rep = asyncio.run(run_execution(strong_buy, account=account, limits=limits))
+    print(f"\n{format_exec_latency(rep)}")
+    SCAN_TIMER.note(execution=rep.as_dict())
+    return rep
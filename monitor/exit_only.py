@@ -7,6 +7,14 @@ Purpose:
 - Uses hard live guards; defaults to dry-run unless LIVE_SUBMIT=1
 
 This avoids the cost/noise of full market scans.
+
+Modes:
+- default: one pass (reconcile -> batched quotes -> exit events -> exits), for cron
+- --stream: long-running; subscribes to real-time quotes for every open_positions symbol
+  (broker.quote_stream) and runs the same exit path as soon as a push crosses SL/TP.
+  Positions are reloaded / resubscribed every EXIT_STREAM_REFRESH_SEC (default 60) and
+  after each exit; a symbol is not re-triggered for EXIT_STREAM_RETRIGGER_SEC (default 60);
+  EXIT_STREAM_MAX_MIN > 0 ends the run after that many minutes.
 """
 
 from __future__ import annotations
@@ -19,6 +27,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from broker.trading_env import is_live, live_trading_enabled
+from broker.state_store import session as trading_state_session
 
 
 from datetime import datetime
@@ -76,15 +85,9 @@ def _send_manual_alert(msg: str):
         pass
 
 
-def main():
-    if not (is_live() and live_trading_enabled()):
-        # Avoid cron spam: emit at most once per N minutes (default 360 = 6h).
-        every = int(os.environ.get('EXIT_ONLY_DISABLED_NOTICE_EVERY_MIN', '360'))
-        if _rate_limited_notice('disabled_notice', every):
-            print('EXIT_ONLY_DISABLED: live trading not enabled (need TRADING_ENV=live & LIVE_TRADING=YES_I_KNOW).')
-        return
-
-    # 0) reconcile pending orders (dry-run fills / broker updates)
+def _reconcile():
+    """Pending orders (dry-run fills / broker updates), then open_positions vs broker positions."""
+    # reconcile pending orders (dry-run fills / broker updates)
     try:
         from broker.order_tracker import reconcile_pending_orders
         hours = float(os.environ.get('COOLDOWN_HOURS', '24'))
@@ -94,7 +97,7 @@ def main():
     except Exception as e:
         print(f"  [order-reconcile failed] {e}")
 
-    # 1) reconcile open_positions with broker positions
+    # reconcile open_positions with broker positions
     try:
         from broker.reconcile import reconcile_open_positions
         rrec = reconcile_open_positions()
@@ -103,62 +106,100 @@ def main():
     except Exception as e:
         print(f"  [reconcile failed] {e}")
 
-    # 2) state-based exit monitor
-    try:
-        from broker.state_store import load_state as load_trading_state, set_cooldown, remove_open_position, add_pending_order
-        from broker.exit_monitor import check_open_positions
-        from broker.longport_client import load_config, make_quote_ctx, get_quote
-        from broker.exit_router import build_exit_intent
-        from broker.positions import fetch_stock_positions
-        from broker.live_executor import submit_live_order
-        from broker.paper_executor import append_ledger
-        from broker.cooldown import iso_after_hours
-
-        tstate = load_trading_state()
-        open_pos = (tstate.get('open_positions') or {})
-        if not open_pos:
-            print('EXIT_ONLY: no open_positions in local state.')
-            return
-
-        qctx = make_quote_ctx(load_config())
-
-        quotes = {}
-        for sym in list(open_pos.keys()):
-            q = get_quote(qctx, sym)
-            if q.last is not None:
-                quotes[sym] = q.last
-
-        events = check_open_positions(open_pos, quotes)
-        if not events:
-            print('EXIT_ONLY: no exit events.')
-            return
-
-        qty_map = {}
-        for pos in fetch_stock_positions():
-            try:
-                qty_map[pos.symbol.upper()] = int(float(pos.quantity or 0))
-            except Exception:
-                pass
 
-        for ev in events:
-            # EXIT_ESCALATE: if STOP_LOSS and we already have a pending SELL, cancel/replace more aggressively
-            try:
-                from broker.state_store import list_pending_orders, get_exit_escalation_attempt, inc_exit_escalation_attempt
-                pending = list_pending_orders()
-                has_pending_sell = False
-                pending_ids = []
-                for oid, rec in pending.items():
-                    if (rec.get('symbol') or '').upper() == ev.symbol.upper() and (rec.get('side') or '').lower() == 'sell':
-                        has_pending_sell = True
-                        pending_ids.append(oid)
-                if ev.kind == 'STOP_LOSS' and has_pending_sell:
-                    attempt = get_exit_escalation_attempt(ev.symbol)
-                    max_attempts = int(os.environ.get('EXIT_ESCALATE_MAX_ATTEMPTS', '3'))
-                    # EXIT_MANUAL_ALERT
-                    if attempt >= max_attempts:
-                        # enrich context
+def _handle_exit_events(qctx, open_pos: dict, events: list):
+    """Submit exits for exit_monitor events (STOP_LOSS with a pending sell escalates)."""
+    from broker.state_store import set_cooldown, remove_open_position, add_pending_order
+    from broker.longport_client import get_quotes
+    from broker.exit_router import build_exit_intent
+    from broker.positions import fetch_stock_positions
+    from broker.live_executor import submit_live_order
+    from broker.paper_executor import append_ledger
+    from broker.cooldown import iso_after_hours
+
+    qty_map = {}
+    for pos in fetch_stock_positions():
+        try:
+            qty_map[pos.symbol.upper()] = int(float(pos.quantity or 0))
+        except Exception:
+            pass
+
+    for ev in events:
+        qty = qty_map.get(ev.symbol.upper(), 0)
+        if qty <= 0:
+            continue
+
+        # EXIT_ESCALATE: if STOP_LOSS and we already have a pending SELL, cancel/replace more aggressively
+        try:
+            from broker.state_store import list_pending_orders, get_exit_escalation_attempt, inc_exit_escalation_attempt
+            pending = list_pending_orders()
+            has_pending_sell = False
+            pending_ids = []
+            for oid, rec in pending.items():
+                if (rec.get('symbol') or '').upper() == ev.symbol.upper() and (rec.get('side') or '').lower() == 'sell':
+                    has_pending_sell = True
+                    pending_ids.append(oid)
+            if ev.kind == 'STOP_LOSS' and has_pending_sell:
+                attempt = get_exit_escalation_attempt(ev.symbol)
+                max_attempts = int(os.environ.get('EXIT_ESCALATE_MAX_ATTEMPTS', '3'))
+                # EXIT_MANUAL_ALERT
+                if attempt >= max_attempts:
+                    # enrich context
+                    try:
+                        q_now = get_quotes(qctx, [ev.symbol])[ev.symbol]
+                        last_now = q_now.last
+                    except Exception:
+                        last_now = None
+                    try:
+                        sl_now = open_pos.get(ev.symbol, {}).get('sl')
+                    except Exception:
+                        sl_now = None
+                    _send_manual_alert(
+                        f"🚨 STOP_LOSS 未成功退出（需手动处理）\n"
+                        f"标的: {ev.symbol}\n"
+                        f"数量: {qty}\n"
+                        f"现价(last): {last_now}\n"
+                        f"止损(SL): {sl_now}\n"
+                        f"升级次数: {attempt}\n"
+                        f"挂单: {', '.join(pending_ids) if pending_ids else '-'}"
+                    )
+                    print(f"\nLIVE_EXIT_MANUAL_REQUIRED:{ev.symbol}:attempt={attempt}")
+                    continue
+                if attempt < max_attempts:
+                    # cancel all pending sell orders for this symbol
+                    try:
+                        from broker.exit_escalator import cancel_order, escalate_stop_loss_sell
+                        for oid in pending_ids:
+                            cancel_order(oid)
+                    except Exception:
+                        pass
+
+                    dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
+                    ok, msg, new_oid = (False, 'skip', None)
+                    try:
+                        ok, msg, new_oid = escalate_stop_loss_sell(ev.symbol, qty, attempt=attempt, dry_run=dry_run)
+                    except Exception as e:
+                        ok, msg, new_oid = (False, str(e), None)
+
+                    inc_exit_escalation_attempt(ev.symbol)
+                    if ok:
+                        if new_oid:
+                            try:
+                                add_pending_order(new_oid, {
+                                    'symbol': ev.symbol,
+                                    'side': 'Sell',
+                                    'qty': qty,
+                                    'limit_price': None,
+                                    'reason': 'STOP_LOSS_ESCALATE',
+                                    'status': 'PENDING',
+                                })
+                            except Exception:
+                                pass
+                        print(f"\nLIVE_EXIT_ESCALATE_{'DRYRUN' if dry_run else 'SUBMIT'}:{ev.symbol}:attempt={attempt}")
+                    else:
+                        print(f"\nLIVE_EXIT_ESCALATE_FAIL:{ev.symbol}:{msg}")
                         try:
-                            q_now = get_quote(qctx, ev.symbol)
+                            q_now = get_quotes(qctx, [ev.symbol])[ev.symbol]
                             last_now = q_now.last
                         except Exception:
                             last_now = None
@@ -167,122 +208,172 @@ def main():
                         except Exception:
                             sl_now = None
                         _send_manual_alert(
-                            f"🚨 STOP_LOSS 未成功退出（需手动处理）\n"
+                            f"🚨 STOP_LOSS 卖出升级失败（需手动处理）\n"
                             f"标的: {ev.symbol}\n"
                             f"数量: {qty}\n"
                             f"现价(last): {last_now}\n"
                             f"止损(SL): {sl_now}\n"
-                            f"升级次数: {attempt}\n"
+                            f"原因: {msg}\n"
                             f"挂单: {', '.join(pending_ids) if pending_ids else '-'}"
                         )
-                        print(f"\nLIVE_EXIT_MANUAL_REQUIRED:{ev.symbol}:attempt={attempt}")
-                        continue
-                    if attempt < max_attempts:
-                        # cancel all pending sell orders for this symbol
-                        try:
-                            from broker.exit_escalator import cancel_order, escalate_stop_loss_sell
-                            for oid in pending_ids:
-                                cancel_order(oid)
-                        except Exception:
-                            pass
-
-                        dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
-                        ok, msg, new_oid = (False, 'skip', None)
-                        try:
-                            ok, msg, new_oid = escalate_stop_loss_sell(ev.symbol, qty, attempt=attempt, dry_run=dry_run)
-                        except Exception as e:
-                            ok, msg, new_oid = (False, str(e), None)
-
-                        inc_exit_escalation_attempt(ev.symbol)
-                        if ok:
-                            if new_oid:
-                                try:
-                                    add_pending_order(new_oid, {
-                                        'symbol': ev.symbol,
-                                        'side': 'Sell',
-                                        'qty': qty,
-                                        'limit_price': None,
-                                        'reason': 'STOP_LOSS_ESCALATE',
-                                        'status': 'PENDING',
-                                    })
-                                except Exception:
-                                    pass
-                            print(f"\nLIVE_EXIT_ESCALATE_{'DRYRUN' if dry_run else 'SUBMIT'}:{ev.symbol}:attempt={attempt}")
-                        else:
-                            print(f"\nLIVE_EXIT_ESCALATE_FAIL:{ev.symbol}:{msg}")
-                            try:
-                                q_now = get_quote(qctx, ev.symbol)
-                                last_now = q_now.last
-                            except Exception:
-                                last_now = None
-                            try:
-                                sl_now = open_pos.get(ev.symbol, {}).get('sl')
-                            except Exception:
-                                sl_now = None
-                            _send_manual_alert(
-                                f"🚨 STOP_LOSS 卖出升级失败（需手动处理）\n"
-                                f"标的: {ev.symbol}\n"
-                                f"数量: {qty}\n"
-                                f"现价(last): {last_now}\n"
-                                f"止损(SL): {sl_now}\n"
-                                f"原因: {msg}\n"
-                                f"挂单: {', '.join(pending_ids) if pending_ids else '-'}"
-                            )
-                        continue  # do not place the normal exit order in same tick
-            except Exception as e:
-                # escalation is best-effort; fall back to normal exit intent
-                pass
-
-            qty = qty_map.get(ev.symbol.upper(), 0)
-            if qty <= 0:
+                    continue  # do not place the normal exit order in same tick
+        except Exception as e:
+            # escalation is best-effort; fall back to normal exit intent
+            pass
+
+        # prevent duplicate sells while a sell is pending
+        try:
+            from broker.state_store import has_pending_symbol_side
+            if has_pending_symbol_side(ev.symbol, 'Sell') and ev.kind != 'STOP_LOSS':
                 continue
+        except Exception:
+            pass
+        q = get_quotes(qctx, [ev.symbol])[ev.symbol]
+        intent = build_exit_intent(ev.symbol, qty, quote={'last': q.last, 'bid': q.bid, 'ask': q.ask}, reason=ev.kind)
+        if not intent:
+            continue
+
+        append_ledger(intent, fill_price=intent.limit_price, status='PENDING')
+        dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
+        r = submit_live_order(intent, dry_run=dry_run)
+
+        if r.order_id:
+            try:
+                add_pending_order(r.order_id, {
+                    'symbol': intent.symbol,
+                    'side': intent.side,
+                    'qty': intent.qty,
+                    'limit_price': intent.limit_price,
+                    'reason': ev.kind,
+                    'status': 'PENDING',
+                })
+            except Exception:
+                pass
 
-            # prevent duplicate sells while a sell is pending
+        if r.ok and r.dry_run:
+            print(f"\nLIVE_EXIT_DRYRUN:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
+        elif r.ok:
+            print(f"\nLIVE_EXIT_OK:{intent.symbol}:order_id={r.order_id}")
             try:
-                from broker.state_store import has_pending_symbol_side
-                if has_pending_symbol_side(ev.symbol, 'Sell') and ev.kind != 'STOP_LOSS':
-                    continue
+                remove_open_position(intent.symbol)
             except Exception:
                 pass
-            q = get_quote(qctx, ev.symbol)
-            intent = build_exit_intent(ev.symbol, qty, quote={'last': q.last, 'bid': q.bid, 'ask': q.ask}, reason=ev.kind)
-            if not intent:
-                continue
+            if ev.kind == 'STOP_LOSS':
+                hours = float(os.environ.get('COOLDOWN_HOURS', '24'))
+                set_cooldown(intent.symbol, until_iso=iso_after_hours(hours), reason='stopout')
+        else:
+            print(f"\nLIVE_EXIT_FAIL:{intent.symbol}:{r.error}")
+
+
+def _live_enabled() -> bool:
+    if is_live() and live_trading_enabled():
+        return True
+    # Avoid cron spam: emit at most once per N minutes (default 360 = 6h).
+    every = int(os.environ.get('EXIT_ONLY_DISABLED_NOTICE_EVERY_MIN', '360'))
+    if _rate_limited_notice('disabled_notice', every):
+        print('EXIT_ONLY_DISABLED: live trading not enabled (need TRADING_ENV=live & LIVE_TRADING=YES_I_KNOW).')
+    return False
+
+
+@trading_state_session()  # one trading_state.json load + one atomic write per run
+def main():
+    if not _live_enabled():
+        return
+
+    _reconcile()
+
+    # 2) state-based exit monitor
+    try:
+        from broker.state_store import load_state as load_trading_state
+        from broker.exit_monitor import check_open_positions
+        from broker.longport_client import load_config, make_quote_ctx, get_quotes
+
+        tstate = load_trading_state()
+        open_pos = (tstate.get('open_positions') or {})
+        if not open_pos:
+            print('EXIT_ONLY: no open_positions in local state.')
+            return
+
+        qctx = make_quote_ctx(load_config())
+
+        # one batched request; per-event reads below hit the snapshot cache
+        snaps = get_quotes(qctx, list(open_pos.keys()))
+        quotes = {sym: q.last for sym, q in snaps.items() if q.last is not None}
 
-            append_ledger(intent, fill_price=intent.limit_price, status='PENDING')
-            dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
-            r = submit_live_order(intent, dry_run=dry_run)
-
-            if r.order_id:
-                try:
-                    add_pending_order(r.order_id, {
-                        'symbol': intent.symbol,
-                        'side': intent.side,
-                        'qty': intent.qty,
-                        'limit_price': intent.limit_price,
-                        'reason': ev.kind,
-                        'status': 'PENDING',
-                    })
-                except Exception:
-                    pass
-
-            if r.ok and r.dry_run:
-                print(f"\nLIVE_EXIT_DRYRUN:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
-            elif r.ok:
-                print(f"\nLIVE_EXIT_OK:{intent.symbol}:order_id={r.order_id}")
-                try:
-                    remove_open_position(intent.symbol)
-                except Exception:
-                    pass
-                if ev.kind == 'STOP_LOSS':
-                    hours = float(os.environ.get('COOLDOWN_HOURS', '24'))
-                    set_cooldown(intent.symbol, until_iso=iso_after_hours(hours), reason='stopout')
-            else:
-                print(f"\nLIVE_EXIT_FAIL:{intent.symbol}:{r.error}")
+        events = check_open_positions(open_pos, quotes)
+        if not events:
+            print('EXIT_ONLY: no exit events.')
+            return
+
+        _handle_exit_events(qctx, open_pos, events)
 
     except Exception as e:
         print(f"  [exit-only failed] {e}")
 
 
+def run_stream(source=None, max_minutes: float | None = None, *, qctx=None,
+               load_positions=None, handle_events=None, on_refresh=None):
+    """Long-running exit monitor driven by quote pushes instead of polling.
+
+    Defaults are the live path: LongPortQuoteSource on a new QuoteContext, positions from
+    trading state, the exit_only order path (each handled batch is its own trading-state
+    session, so state written by other processes is seen on reload) and _reconcile on
+    every refresh; the live guards apply.
+
+    Injectable for offline runs (jobs/verify_exit_stream.py): source (e.g.
+    broker.quote_stream.FakeQuotePublisher), qctx, load_positions() -> {symbol: rec},
+    handle_events(open_pos, events), on_refresh(). With handle_events given no order is
+    sent by this function, so the live guards and QuoteContext are skipped (unless needed
+    for source=None).
+    """
+    if handle_events is None and not _live_enabled():
+        return None
+    from broker.quote_stream import ExitQuoteStream, LongPortQuoteSource
+
+    if qctx is None and (source is None or handle_events is None):
+        from broker.longport_client import load_config, make_quote_ctx
+        qctx = make_quote_ctx(load_config())
+    if source is None:
+        source = LongPortQuoteSource(qctx)
+
+    if load_positions is None:
+        from broker.state_store import load_state as load_trading_state
+
+        def load_positions():
+            return load_trading_state().get('open_positions') or {}
+
+    if handle_events is None:
+        on_refresh = _reconcile if on_refresh is None else on_refresh
+
+        def handle_events(open_pos, events):
+            with trading_state_session():
+                _handle_exit_events(qctx, open_pos, events)
+
+    def on_events(open_pos, events):
+        for ev in events:
+            print(f"\nEXIT_STREAM_EVENT:{ev.symbol}:{ev.kind}:{ev.last}")
+        handle_events(open_pos, events)
+
+    if max_minutes is None:
+        max_minutes = float(os.environ.get('EXIT_STREAM_MAX_MIN', '0'))
+    stream = ExitQuoteStream(
+        source, load_positions, on_events,
+        refresh_sec=float(os.environ.get('EXIT_STREAM_REFRESH_SEC', '60')),
+        retrigger_sec=float(os.environ.get('EXIT_STREAM_RETRIGGER_SEC', '60')),
+        on_refresh=on_refresh,
+    )
+    print(f"EXIT_STREAM_START: max_minutes={max_minutes or '-'}")
+    try:
+        stream.run(max_seconds=max_minutes * 60 if max_minutes else None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"EXIT_STREAM_STOP: ticks={stream.ticks} evaluated={stream.evaluated}")
+    return stream
+
+
 if __name__ == '__main__':
-    main()
+    if '--stream' in sys.argv:
+        run_stream()
+    else:
+        main()
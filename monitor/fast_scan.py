@@ -23,13 +23,27 @@ logging.getLogger('yfinance').setLevel(logging.CRITICAL)
 
 # local parquet store
 try:
-    from data_store import sync_and_load
+    from data_store import sync_and_load, sync_many, format_sync_stats
 except Exception:
     sync_and_load = None
-from analyzer.indicators import add_all_indicators
-from signal_engine import score_signal, check_stabilization, format_signal_message
+    sync_many = None
+    format_sync_stats = None
+try:
+    from frame_cache import format_frame_cache_stats
+except Exception:
+    format_frame_cache_stats = None
+from scan_timing import SCAN_TIMER, stage, timed, report_scan_timing
+from analyzer.indicators import compute_indicators
+from analyzer.incremental import add_all_indicators_incremental
+from analyzer.panel import compute_panel
+from strategy.structure import STRUCTURE_NEEDS
+from signal_engine import score_signal, check_stabilization, format_signal_message, SCORE_SIGNAL_NEEDS
 from config import WATCHLIST, NOTIFY
 
+# 各阶段实际读取的指标列
+PHASE1_NEEDS = frozenset({'rsi14', 'bb_pct20'})
+PHASE2_NEEDS = SCORE_SIGNAL_NEEDS | STRUCTURE_NEEDS
+
 STATE_FILE = os.path.join(os.path.dirname(__file__), '.monitor_state.json')
 
 def load_state():
@@ -47,6 +61,7 @@ def signal_key(sig):
     return f"{sig['ticker']}_{date_str}_{sig['score']//10*10}"
 
 # ── 第一阶段：批量拉日线快速过滤 ──
+@timed('phase1')
 def phase1_filter(tickers: list, batch_size: int = 100) -> list:
     """
     批量下载日线，过滤出可能触发买入信号的候选股
@@ -61,20 +76,26 @@ def phase1_filter(tickers: list, batch_size: int = 100) -> list:
         raw = None
         try:
             # yfinance sometimes prints noisy errors; silence stdout/stderr here
-            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            with stage('phase1.download', net_calls=1) as tm, \
+                    contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
                 raw = yf.download(
                     batch, period='3mo', interval='1d',
                     auto_adjust=True, group_by='ticker',
                     progress=False, threads=True
                 )
+                if raw is not None:
+                    tm.add(rows=len(raw), bytes=raw.memory_usage(deep=True).sum())
         except Exception as e:
             print(f"    批次 {i//batch_size+1} 批量下载失败: {e}（将逐只重试）")
 
         def _download_one(tk: str) -> pd.DataFrame:
             """Per-ticker fallback download to avoid batch-level failures and reduce spam."""
             try:
-                with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                with stage('phase1.download', ticker=tk, net_calls=1) as tm, \
+                        contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
                     df1 = yf.Ticker(tk).history(period='3mo', interval='1d', auto_adjust=True)
+                    if df1 is not None:
+                        tm.add(rows=len(df1), bytes=df1.memory_usage(deep=True).sum())
                 if df1 is None:
                     return pd.DataFrame()
                 return df1
@@ -82,6 +103,7 @@ def phase1_filter(tickers: list, batch_size: int = 100) -> list:
                 return pd.DataFrame()
 
         for ticker in batch:
+            tm = stage('phase1.filter', ticker=ticker)
             try:
                 if raw is None:
                     df = _download_one(ticker)
@@ -102,17 +124,14 @@ def phase1_filter(tickers: list, batch_size: int = 100) -> list:
                 df.columns = [c.lower() for c in df.columns]
                 df = df.dropna(subset=['close'])
 
-                # 简单指标
+                # 简单指标（只算 RSI14 / BB%）
+                ind = compute_indicators(df, needs=PHASE1_NEEDS)
                 close = df['close']
-                rsi_gain = close.diff().clip(lower=0).rolling(14).mean()
-                rsi_loss = (-close.diff()).clip(lower=0).rolling(14).mean()
-                rsi = 100 - 100 / (1 + rsi_gain / rsi_loss.replace(0, 1e-9))
-                latest_rsi = rsi.iloc[-1]
-
-                ma20 = close.rolling(20).mean().iloc[-1]
-                std20 = close.rolling(20).std().iloc[-1]
+                latest_rsi = ind['rsi14'].iloc[-1]  # 无下跌时为 NaN → 不入选
                 latest_close = close.iloc[-1]
-                bb_pct = (latest_close - (ma20 - 2*std20)) / (4*std20) if std20 > 0 else 0.5
+                bb_pct = ind['bb_pct20'].iloc[-1]
+                if bb_pct != bb_pct:
+                    bb_pct = 0.5  # 布林带宽度为 0
 
                 ret_5d = (latest_close / close.iloc[-5] - 1) * 100 if len(close) >= 5 else 0
 
@@ -138,6 +157,8 @@ def phase1_filter(tickers: list, batch_size: int = 100) -> list:
                     })
             except Exception:
                 continue
+            finally:
+                tm.stop()
 
         done = min(i+batch_size, total)
         print(f"    进度: {done}/{total}  候选: {len(candidates)}只")
@@ -147,76 +168,158 @@ def phase1_filter(tickers: list, batch_size: int = 100) -> list:
 
 
 # ── 第二阶段：1h精细评分 ──
-def phase2_score(candidates: list) -> list:
-    """对候选标的拉1h数据，精细评分"""
-    signals = []
+def _sync_1h(tickers: list) -> dict:
+    """并发同步候选标的 1h 数据（data_store.sync_many），返回 {ticker: df}"""
+    if sync_many is None or not tickers:
+        return {}
+    out = {}
+    for t, r in sync_many(tickers, interval='1h', lookback_days=120).items():
+        if not r.ok:
+            print(f"    {t}: ✗ sync: {r.error}")
+            print(f"ERROR_SIGNAL:phase2_score:sync:{t}")
+        out[t] = r.df
+    return out
+
+
+def _load_1h(ticker: str, synced: dict = None) -> pd.DataFrame:
+    """候选标的 1h K线（本地 store 优先，否则 yfinance 59 天）
+
+    synced: _sync_1h 的结果（已并发同步），有则直接用
+    """
+    end = datetime.now()
+    start = end - timedelta(days=59)
+    # 注意：yfinance 的 end 是“非包含”，用 +1 天避免漏掉当天盘中数据
+    if synced is not None and ticker in synced:
+        df = synced[ticker].copy()
+    elif sync_and_load is not None:
+        df = sync_and_load(ticker, interval='1h', lookback_days=120)
+    else:
+        df = yf.Ticker(ticker).history(
+            start=start.strftime('%Y-%m-%d'),
+            end=(end + timedelta(days=1)).strftime('%Y-%m-%d'),
+            interval='1h', auto_adjust=True
+        )
+    df.index = df.index.tz_localize(None) if df.index.tzinfo else df.index
+    df.columns = [c2.lower() for c2 in df.columns]
+    return df
+
+
+def _score_candidate(c: dict, df: pd.DataFrame):
+    """对已算好指标的 1h df 评分；达到 min_score 返回 sig，否则 None"""
+    ticker = c['ticker']
+    # 用“信号触发那根 1H K线的收盘价”作为价格口径（可复现）
+    row = df.iloc[-1]
+    with stage('phase2.score', ticker=ticker):
+        sig = score_signal(row, ticker)
+    try:
+        sig.update(c)
+    except Exception:
+        pass
+
+    # Structure signals (1buy/2buy) — grey mode: compute & attach only
+    try:
+        from signal_engine import _structure_signals
+        with stage('phase2.structure', ticker=ticker):
+            ss = _structure_signals(df, ticker)
+        sig['structure'] = ss
+    except Exception:
+        sig['structure'] = {'enabled': False, 'signals': [], 'best': None}
+    sig['bar_time']  = df.index[-1].strftime('%Y-%m-%d %H:%M')
+    sig['bar_close'] = round(float(row.get('close')), 2) if 'close' in row else sig.get('price')
+    sig['price'] = sig['bar_close']  # 统一口径：当前价=触发bar的收盘价
+
+    # ── P0: 企稳确认（有完整 df，做全量检查）────────────
+    with stage('phase2.score', ticker=ticker):
+        stab = check_stabilization(df)
+    sig['score'] = min(100, sig['score'] + stab['score_bonus'])
+    sig['stabilization'] = stab
+    # 把企稳信号插入 details 最前面
+    sig['details'] = stab['signals'] + sig.get('details', [])
+
+    status = f"    {ticker:<6} 评分={sig['score']:>3}  RSI={sig['rsi14']:>5.1f}  BB%={sig['bb_pct']:>6.3f}  MA200={'✅' if sig['above_ma200'] else '❌'}  企稳={'✅' if stab['confirmed'] else '⚠️'}"
+    if sig['score'] >= NOTIFY['min_score']:
+        status += f"  ← 🔔 信号触发!"
+    print(status)
+
+    return sig if sig['score'] >= NOTIFY['min_score'] else None
+
+
+def _report_error(ticker: str, e: Exception):
+    et = type(e).__name__
+    print(f"    {ticker}: ✗ {et}: {e}")
+    # Make failures visible to cron/alerts while keeping scan resilient
+    print(f"ERROR_SIGNAL:phase2_score:{et}:{ticker}")
+
+
+@timed('phase2')
+def phase2_score(candidates: list, panel: bool = False) -> list:
+    """对候选标的拉1h数据，精细评分
+
+    panel=True：先加载全部候选，再用 analyzer.panel 一次性算完所有标的的指标
+    （而不是逐只 pandas 计算 / 增量缓存）。
+    """
     print(f"\n  第二阶段：精细评分 {len(candidates)} 只候选标的（1h数据）")
+    with stage('phase2.sync'):
+        synced = _sync_1h([c['ticker'] for c in candidates])
+    if panel:
+        return _phase2_score_panel(candidates, synced)
+
+    signals = []
 
     for c in candidates:
         ticker = c['ticker']
         try:
-            end = datetime.now()
-            start = end - timedelta(days=59)
-            # 注意：yfinance 的 end 是“非包含”，用 +1 天避免漏掉当天盘中数据
-            if sync_and_load is not None:
-                df = sync_and_load(ticker, interval='1h', lookback_days=120)
-            else:
-                df = yf.Ticker(ticker).history(
-                    start=start.strftime('%Y-%m-%d'),
-                    end=(end + timedelta(days=1)).strftime('%Y-%m-%d'),
-                    interval='1h', auto_adjust=True
-                )
+            with stage('phase2.load', ticker=ticker):
+                df = _load_1h(ticker, synced)
             if len(df) < 30:
                 continue
+            # store-backed history is append-only → only compute the new bars
+            with stage('phase2.indicators', ticker=ticker, rows=len(df)):
+                if sync_and_load is not None:
+                    df = add_all_indicators_incremental(df, ticker, interval='1h')
+                else:
+                    df = compute_indicators(df, needs=PHASE2_NEEDS)
 
-            df.index = df.index.tz_localize(None) if df.index.tzinfo else df.index
-            df.columns = [c2.lower() for c2 in df.columns]
-            df = add_all_indicators(df)
+            sig = _score_candidate(c, df)
+            if sig is not None:
+                signals.append(sig)
 
-            # 用“信号触发那根 1H K线的收盘价”作为价格口径（可复现）
-            row = df.iloc[-1]
-            sig = score_signal(row, ticker)
-            try:
-                sig.update(c)
-            except Exception:
-                pass
+        except Exception as e:
+            _report_error(ticker, e)
 
-            # Structure signals (1buy/2buy) — grey mode: compute & attach only
-            try:
-                from signal_engine import _structure_signals
-                ss = _structure_signals(df, ticker)
-                sig['structure'] = ss
-            except Exception:
-                sig['structure'] = {'enabled': False, 'signals': [], 'best': None}
-            sig['bar_time']  = df.index[-1].strftime('%Y-%m-%d %H:%M')
-            sig['bar_close'] = round(float(row.get('close')), 2) if 'close' in row else sig.get('price')
-            sig['price'] = sig['bar_close']  # 统一口径：当前价=触发bar的收盘价
-
-            # ── P0: 企稳确认（有完整 df，做全量检查）────────────
-            stab = check_stabilization(df)
-            sig['score'] = min(100, sig['score'] + stab['score_bonus'])
-            sig['stabilization'] = stab
-            # 把企稳信号插入 details 最前面
-            sig['details'] = stab['signals'] + sig.get('details', [])
-
-            status = f"    {ticker:<6} 评分={sig['score']:>3}  RSI={sig['rsi14']:>5.1f}  BB%={sig['bb_pct']:>6.3f}  MA200={'✅' if sig['above_ma200'] else '❌'}  企稳={'✅' if stab['confirmed'] else '⚠️'}"
-            if sig['score'] >= NOTIFY['min_score']:
-                status += f"  ← 🔔 信号触发!"
-            print(status)
-
-            if sig['score'] >= NOTIFY['min_score']:
-                signals.append(sig)
+    return signals
 
+
+def _phase2_score_panel(candidates: list, synced: dict = None) -> list:
+    frames = {}
+    for c in candidates:
+        ticker = c['ticker']
+        try:
+            with stage('phase2.load', ticker=ticker):
+                df = _load_1h(ticker, synced)
+            if len(df) >= 30:
+                frames[ticker] = df
         except Exception as e:
-            et = type(e).__name__
-            print(f"    {ticker}: ✗ {et}: {e}")
-            # Make failures visible to cron/alerts while keeping scan resilient
-            print(f"ERROR_SIGNAL:phase2_score:{et}:{ticker}")
+            _report_error(ticker, e)
 
+    with stage('phase2.indicators', rows=sum(len(df) for df in frames.values())):
+        panel = compute_panel(frames, needs=PHASE2_NEEDS)
+
+    signals = []
+    for c in candidates:
+        ticker = c['ticker']
+        if ticker not in frames:
+            continue
+        try:
+            sig = _score_candidate(c, panel.frame(ticker))
+            if sig is not None:
+                signals.append(sig)
+        except Exception as e:
+            _report_error(ticker, e)
     return signals
 
 
-def run_fast_scan(watchlist=None):
+def run_fast_scan(watchlist=None, panel: bool = False):
     if watchlist is None:
         watchlist = WATCHLIST
 
@@ -226,26 +329,33 @@ def run_fast_scan(watchlist=None):
     print(f"{'='*60}")
 
     t0 = datetime.now()
+    SCAN_TIMER.reset()
 
     # 第一阶段快速过滤
     candidates = phase1_filter(watchlist)
 
     if not candidates:
         print("\n❌ 无候选标的，跳过第二阶段")
+        report_scan_timing('fast_scan', watchlist=len(watchlist), candidates=0, signals=0)
         return []
 
     # 第二阶段精细评分
-    signals = phase2_score(candidates)
+    signals = phase2_score(candidates, panel=panel)
 
     elapsed = (datetime.now() - t0).seconds
     print(f"\n  ⏱️ 总耗时: {elapsed}秒  |  触发信号: {len(signals)} 只")
+    if format_sync_stats is not None:
+        print(f"  {format_sync_stats()}")
+    if format_frame_cache_stats is not None:
+        print(f"  {format_frame_cache_stats()}")
+    report_scan_timing('fast_scan', watchlist=len(watchlist), candidates=len(candidates), signals=len(signals))
 
     return signals
 
 
 if __name__ == '__main__':
     state = load_state()
-    signals = run_fast_scan()
+    signals = run_fast_scan(panel='--panel' in sys.argv)
 
     new_signals = []
     for sig in signals:
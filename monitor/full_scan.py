@@ -14,10 +14,16 @@ from datetime import datetime, timedelta
 
 # local store (parquet) for faster/reproducible data
 try:
-    from data_store import sync_and_load
+    from data_store import sync_many
 except Exception:
-    sync_and_load = None
+    sync_many = None
+try:
+    from frame_cache import format_frame_cache_stats
+except Exception:
+    format_frame_cache_stats = None
+from scan_timing import SCAN_TIMER, stage, report_scan_timing
 from fast_scan import phase1_filter, phase2_score
+from exec_pipeline import start_account_prefetch, finish_account_prefetch, execute_strong_signals
 from portfolio import load_portfolio, check_positions, format_exit_alert
 from signal_engine import format_signal_message
 from config import WATCHLIST, NOTIFY
@@ -164,11 +170,11 @@ def get_current_prices(tickers: list) -> dict:
     if not tickers:
         return prices
 
-    # 1) local store
-    if sync_and_load is not None:
+    # 1) local store (all held tickers synced concurrently)
+    if sync_many is not None:
         try:
-            for t in tickers:
-                df = sync_and_load(t, interval='1h', lookback_days=7)
+            for t, r in sync_many(tickers, interval='1h', lookback_days=7).items():
+                df = r.df
                 if df is not None and not df.empty and 'close' in df.columns:
                     prices[t] = float(df['close'].iloc[-1])
         except Exception:
@@ -180,8 +186,9 @@ def get_current_prices(tickers: list) -> dict:
         return prices
 
     try:
-        data = yf.download(missing, period='1d', interval='1m',
-                           auto_adjust=True, progress=False, threads=True)
+        with stage('held_prices.download', net_calls=1):
+            data = yf.download(missing, period='1d', interval='1m',
+                               auto_adjust=True, progress=False, threads=True)
         if len(missing) == 1:
             prices[missing[0]] = float(data['Close'].iloc[-1])
         else:
@@ -198,8 +205,10 @@ def get_current_prices(tickers: list) -> dict:
 def main():
     state = load_state()
     output_lines = []
+    SCAN_TIMER.reset()
 
     # Live order tracking reconciliation (dry-run fills / broker status)
+    tm = stage('order_reconcile')
     try:
         from broker.trading_env import is_live, live_trading_enabled
         if is_live() and live_trading_enabled():
@@ -210,86 +219,89 @@ def main():
                 print(f"\n[ORDER_RECONCILE] updated={rr.get('updated')} removed={rr.get('removed')}")
     except Exception as _oe:
         print(f"  [order-reconcile failed] {_oe}")
+    finally:
+        tm.stop()
 
     # Live state-based exit monitor (preferred for automation)
+    tm = stage('live_exit')
     try:
         from broker.trading_env import is_live, live_trading_enabled
         if is_live() and live_trading_enabled():
             from broker.state_store import load_state as _load_trading_state
             from broker.exit_monitor import check_open_positions
-            from broker.longport_client import load_config, make_quote_ctx, get_quote
+            from broker.longport_client import load_config, make_quote_ctx, get_quotes
             from broker.exit_router import build_exit_intent
             from broker.live_executor import submit_live_order
             from broker.paper_executor import append_ledger
             from broker.positions import fetch_stock_positions
-            from broker.state_store import remove_open_position, set_cooldown
+            from broker.state_store import remove_open_position, set_cooldown, session as state_session
             from broker.cooldown import iso_after_hours
 
-            tstate = _load_trading_state()
-            open_pos = (tstate.get('open_positions') or {})
-
-            if open_pos:
-                qctx = make_quote_ctx(load_config())
-                # fetch last quotes
-                quotes = {}
-                for sym in list(open_pos.keys()):
-                    q = get_quote(qctx, sym)
-                    if q.last is not None:
-                        quotes[sym] = q.last
-
-                events = check_open_positions(open_pos, quotes)
-
-                # map quantities from live positions
-                qty_map = {}
-                for pos in fetch_stock_positions():
-                    try:
-                        qty_map[pos.symbol.upper()] = int(float(pos.quantity or 0))
-                    except Exception:
-                        pass
-
-                for ev in events:
-                    qty = qty_map.get(ev.symbol.upper(), 0)
-                    if qty <= 0:
-                        continue
-
-                    # build & submit exit intent
-                    q = get_quote(qctx, ev.symbol)
-                    intent = build_exit_intent(ev.symbol, qty, quote={'last': q.last, 'bid': q.bid, 'ask': q.ask}, reason=ev.kind)
-                    if not intent:
-                        skip_reasons.append((lp_symbol, f"{reason}", key))
-                        continue
-
-                    append_ledger(intent, fill_price=intent.limit_price, status='PENDING')
-                    dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
-                    r = submit_live_order(intent, dry_run=dry_run)
-                    try:
-                        from broker.state_store import add_pending_order
-                        if r.order_id:
-                            add_pending_order(r.order_id, {
-                                "symbol": intent.symbol,
-                                "side": intent.side,
-                                "qty": intent.qty,
-                                "limit_price": intent.limit_price,
-                                "reason": ev.kind,
-                                "status": "PENDING",
-                            })
-                    except Exception:
-                        pass
-                    if r.ok and r.dry_run:
-                        print(f"\nLIVE_EXIT_DRYRUN:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
-                    elif r.ok:
-                        print(f"\nLIVE_EXIT_OK:{intent.symbol}:order_id={r.order_id}")
+            with state_session():
+                tstate = _load_trading_state()
+                open_pos = (tstate.get('open_positions') or {})
+
+                if open_pos:
+                    qctx = make_quote_ctx(load_config())
+                    # fetch last quotes (one batched request; exit intents below reuse the snapshots)
+                    with stage('live_exit.quotes', net_calls=1):
+                        snaps = get_quotes(qctx, list(open_pos.keys()))
+                    quotes = {sym: q.last for sym, q in snaps.items() if q.last is not None}
+
+                    events = check_open_positions(open_pos, quotes)
+
+                    # map quantities from live positions
+                    qty_map = {}
+                    for pos in fetch_stock_positions():
+                        try:
+                            qty_map[pos.symbol.upper()] = int(float(pos.quantity or 0))
+                        except Exception:
+                            pass
+
+                    for ev in events:
+                        qty = qty_map.get(ev.symbol.upper(), 0)
+                        if qty <= 0:
+                            continue
+
+                        # build & submit exit intent
+                        q = get_quotes(qctx, [ev.symbol])[ev.symbol]
+                        intent = build_exit_intent(ev.symbol, qty, quote={'last': q.last, 'bid': q.bid, 'ask': q.ask}, reason=ev.kind)
+                        if not intent:
+                            continue
+
+                        append_ledger(intent, fill_price=intent.limit_price, status='PENDING')
+                        dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
+                        r = submit_live_order(intent, dry_run=dry_run)
                         try:
-                            remove_open_position(intent.symbol)
+                            from broker.state_store import add_pending_order
+                            if r.order_id:
+                                add_pending_order(r.order_id, {
+                                    "symbol": intent.symbol,
+                                    "side": intent.side,
+                                    "qty": intent.qty,
+                                    "limit_price": intent.limit_price,
+                                    "reason": ev.kind,
+                                    "status": "PENDING",
+                                })
                         except Exception:
                             pass
-                        if ev.kind == 'STOP_LOSS':
-                            hours = float(os.environ.get('COOLDOWN_HOURS', '24'))
-                            set_cooldown(intent.symbol, until_iso=iso_after_hours(hours), reason='stopout')
-                    else:
-                        print(f"\nLIVE_EXIT_FAIL:{intent.symbol}:{r.error}")
+                        if r.ok and r.dry_run:
+                            print(f"\nLIVE_EXIT_DRYRUN:{intent.symbol}:{intent.side}:{intent.qty}@{intent.limit_price}")
+                        elif r.ok:
+                            print(f"\nLIVE_EXIT_OK:{intent.symbol}:order_id={r.order_id}")
+                            try:
+                                remove_open_position(intent.symbol)
+                            except Exception:
+                                pass
+                            if ev.kind == 'STOP_LOSS':
+                                hours = float(os.environ.get('COOLDOWN_HOURS', '24'))
+                                set_cooldown(intent.symbol, until_iso=iso_after_hours(hours), reason='stopout')
+                        else:
+                            print(f"\nLIVE_EXIT_FAIL:{intent.symbol}:{r.error}")
     except Exception as _e:
         print(f"  [live-exit-monitor failed] {_e}")
+    finally:
+        tm.stop()
 
     # ════════════════════════════════════
     # 第一部分：检查持仓止盈止损
@@ -307,7 +319,8 @@ def main():
     if portfolio:
         print(f"\n[持仓检查] {len(portfolio)} 只持仓...")
         held_tickers = list(portfolio.keys())
-        current_prices = get_current_prices(held_tickers)
+        with stage('held_prices'):
+            current_prices = get_current_prices(held_tickers)
 
         exit_alerts = check_positions(current_prices)
         for alert in exit_alerts:
@@ -386,7 +399,8 @@ def main():
     # ════════════════════════════════════
     # 第二部分：市场环境识别
     # ════════════════════════════════════
-    regime = get_market_regime()
+    with stage('regime'):
+        regime = get_market_regime()
     effective_min_score = regime['min_score']
     print(f"\n[市场环境] {regime['detail']}")
     print(f"[信号阈值] score≥{effective_min_score}（{'正常' if regime['regime']=='bull' else '已上调'}）")
@@ -415,6 +429,16 @@ def main():
     print(f"[ret5 门槛] {ret5_level}: ret_5d ≤ {ret5_entry_pct:.1f}%（无信号连续 {streak} 次）")
     print(f"\n[买入扫描] 开始扫描 {len(WATCHLIST)} 只股票...")
     candidates = phase1_filter(WATCHLIST)
+    # broker reconcile / positions / cash for execution run while phase2 scores (live only).
+    # Extra broker calls on every live scan with candidates, also without a strong signal;
+    # EXEC_PREFETCH=0 keeps them inside the execution block.
+    exec_prefetch = None
+    try:
+        from broker.trading_env import is_live, live_trading_enabled
+        if candidates and is_live() and live_trading_enabled() and os.environ.get('EXEC_PREFETCH', '1') != '0':
+            exec_prefetch = start_account_prefetch()
+    except Exception as _pe:
+        print(f"  [exec-prefetch failed] {_pe}")
     # phase2_score 后按动态阈值过滤（P3：按股票类型细化阈值）
     buy_signals_raw = phase2_score(candidates) if candidates else []
 
@@ -602,249 +626,20 @@ def main():
         output_lines.append(msg)
         output_lines.append("---END---")
 
-        # Paper/Live execution selection (capital constrained)
-        # - Build intents for all strong signals
-        # - Apply idempotency, cooldown, daily limits, max open positions
-        # - Select Top1 intent by execution score
+    # Paper/Live execution selection (capital constrained), once for all strong signals:
+    # concurrent quotes + intents, Top-1 submit under daily / open-position / risk limits
+    # (monitor/exec_pipeline.py; prints EXEC_LATENCY bar close -> submit)
+    if strong_buy:
+        tm = stage('execution')
         try:
-            from broker.longport_client import load_config, make_quote_ctx, get_quote
-            from broker.symbol_map import to_longport_symbol
-            from broker.order_router import try_build_order_intent, PaperTradeConfig
-            from broker.paper_executor import append_ledger
-            from broker.intent_eval import compute_metrics
-            from broker.trading_env import is_paper, is_live, live_trading_enabled
-            from broker.state_store import was_executed, mark_executed, daily_count, inc_daily, cooldown_active, total_open_risk_usd, add_open_position
-
-            # Switches / limits
-            max_open_pos = int(os.environ.get('MAX_OPEN_POS', '1'))
-            max_price_pct_equity = float(os.environ.get('MAX_PRICE_PCT_EQUITY', '0.35'))
-            total_risk_cap_pct = float(os.environ.get('TOTAL_RISK_CAP', '0.02'))
-            max_new_buys_per_day = int(os.environ.get('MAX_NEW_BUYS_PER_DAY', '1'))
-            price_drift_max_pct = float(os.environ.get('PRICE_DRIFT_MAX_PCT', '0.015'))  # 1.5%
-            max_spread_pct = float(os.environ.get('MAX_SPREAD_PCT', '0.008'))
-            double_quote_drift_pct = float(os.environ.get('DOUBLE_QUOTE_DRIFT_PCT', '0.006'))
-            quote_stale_sec = float(os.environ.get('QUOTE_STALE_SEC', '60'))
-
-            # equity sizing base (USD) from broker
-            equity = None
-            try:
-                from broker.account import get_available_cash
-                equity = get_available_cash('USD')
-            except Exception:
-                equity = None
-            if equity is None:
-                equity = float(os.environ.get('PAPER_EQUITY', '100000'))
-
-            # current open positions count (live)
-            open_pos_count = 0
-            if is_live():
-                try:
-                    from broker.positions import fetch_stock_positions
-                    open_pos_count = len(fetch_stock_positions())
-                except Exception:
-                    open_pos_count = 0
-
-                        # portfolio risk cap (USD)
-            total_risk_cap_usd = equity * total_risk_cap_pct
-            cur_risk = 0.0
-            try:
-                cur_risk = float(total_open_risk_usd())
-            except Exception:
-                cur_risk = 0.0
-
-            # reconcile local open_positions with broker positions (prevents drift)
-            try:
-                from broker.reconcile import reconcile_open_positions
-                rrec = reconcile_open_positions()
-                if rrec.get('removed') or rrec.get('added'):
-                    print(f"\n[RECONCILE] added={len(rrec.get('added',[]))} removed={len(rrec.get('removed',[]))}")
-            except Exception as _re:
-                print(f"  [reconcile failed] {_re}")
-
-            # daily limits key (UTC date)
-            day_key = datetime.utcnow().strftime('%Y-%m-%d')
-            if daily_count(day_key) >= max_new_buys_per_day:
-                # Already hit daily buy limit
-                pass
-            else:
-                qctx = make_quote_ctx(load_config())
-                candidates = []
-                skip_reasons = []
-                for s in strong_buy:
-                    # cooldown / idempotency key
-                    exec_mode = (s.get('exec_mode') or '').upper()
-                    bar_time = s.get('bar_time') or s.get('bar_ts') or ''
-                    key = f"{s.get('ticker')}|{exec_mode}|{bar_time}"
-                    if was_executed(key):
-                        skip_reasons.append((lp_symbol, "SKIP_IDEMPOTENT", key))
-                        continue
-                    lp_symbol = to_longport_symbol(s.get('ticker'))
-                    # prevent duplicate buys while a buy is pending
-                    try:
-                        from broker.state_store import has_pending_symbol_side
-                        if has_pending_symbol_side(lp_symbol, 'Buy'):
-                            skip_reasons.append((lp_symbol, 'SKIP_PENDING_BUY', key))
-                            continue
-                    except Exception:
-                        pass
-                    cd_on, cd_reason = cooldown_active(lp_symbol)
-                    if cd_on:
-                        skip_reasons.append((lp_symbol, f"SKIP_COOLDOWN:{cd_reason}", key))
-                        continue
-
-                    from broker.longport_client import get_quote_twice
-                    q1, q2, dq_drift = get_quote_twice(qctx, lp_symbol, max_drift_pct=double_quote_drift_pct)
-                    q = q2
-                    # quote staleness guard (best-effort): ts is local fetch time; if None skip
-                    try:
-                        from datetime import timezone
-                        if q.ts is not None:
-                            age = (datetime.now(timezone.utc) - q.ts).total_seconds()
-                            if age > quote_stale_sec:
-                                skip_reasons.append((lp_symbol, f'SKIP_QUOTE_STALE:{age:.0f}s', key))
-                                continue
-                    except Exception:
-                        pass
-                    # double-quote drift guard
-                    if dq_drift > double_quote_drift_pct:
-                        skip_reasons.append((lp_symbol, f'SKIP_DOUBLE_QUOTE_DRIFT:{dq_drift:.3f}', key))
-                        continue
-                    # attach spread threshold for router
-                    s['max_spread_pct'] = max_spread_pct
-                    # High-price filter for small capital: 1 share cannot exceed a fraction of equity
-                    try:
-                        last = float(q.last or 0)
-                        if last > 0 and last > (equity * max_price_pct_equity):
-                            skip_reasons.append((lp_symbol, f"SKIP_HIGH_PRICE:{last:.2f}", key))
-                            continue
-                        min_price = float(os.environ.get('MIN_PRICE_USD', '5'))
-                        if last > 0 and last < min_price:
-                            skip_reasons.append((lp_symbol, f"SKIP_LOW_PRICE:{last:.2f}", key))
-                            continue
-                    except Exception:
-                        pass
-                    # execution price drift check (signal price vs quote last)
-                    try:
-                        sig_px = float(s.get('price') or s.get('bar_close') or 0)
-                        last = float(q.last or 0)
-                        if sig_px > 0 and last > 0:
-                            drift = abs(last - sig_px) / sig_px
-                            if drift > price_drift_max_pct:
-                                skip_reasons.append((lp_symbol, f"SKIP_PRICE_DRIFT:{drift:.3f}", key))
-                                continue
-                    except Exception:
-                        pass
-
-                    intent, reason = try_build_order_intent(
-                        s,
-                        quote={'last': q.last, 'bid': q.bid, 'ask': q.ask},
-                        cfg=PaperTradeConfig(
-                        equity=equity,
-                        max_sl_pct=float(os.environ.get('MAX_SL_PCT','0.10')),
-                        max_position_pct=float(os.environ.get('MAX_POSITION_PCT','0.08')),
-                        min_price_usd=float(os.environ.get('MIN_PRICE_USD','5')),
-                        min_dollar_vol_20d=float(os.environ.get('MIN_DOLLAR_VOL_20D','20000000')),
-                    ),
-                    )
-                    if not intent:
-                        skip_reasons.append((lp_symbol, f"{reason}", key))
-                        continue
-
-                    metrics = compute_metrics(intent, signal_score=float(s.get('score') or 0))
-                    candidates.append((metrics.score, intent, key))
-
-                candidates.sort(key=lambda x: x[0], reverse=True)
-
-                # SKIP_SUMMARY (debug for dry-run verification)
-                try:
-                    if skip_reasons:
-                        from collections import Counter, defaultdict
-                        cnt = Counter([r[1] for r in skip_reasons])
-                        print(f"\n[EXEC_SKIP] skipped={len(skip_reasons)} reasons={len(cnt)}")
-                        # persist last skip summary for post-close review
-                        try:
-                            from broker.state_store import load_state as _lst, save_state as _sst
-                            from datetime import timezone
-                            stt = _lst()
-                            reasons_list = []
-                            for reason, n in cnt.most_common(8):
-                                samples = [sym for sym, rs, _k in skip_reasons if rs == reason][:2]
-                                reasons_list.append({"reason": reason, "count": int(n), "samples": samples})
-                            stt['last_exec_skip'] = {
-                                'ts': datetime.now(timezone.utc).isoformat(timespec='seconds'),
-                                'skipped': int(len(skip_reasons)),
-                                'reasons': reasons_list,
-                            }
-                            _sst(stt)
-                        except Exception:
-                            pass
-                        # show top 8 reasons
-                        for reason, n in cnt.most_common(8):
-                            # show up to 2 sample symbols for this reason
-                            samples = [sym for sym, rs, _k in skip_reasons if rs == reason][:2]
-                            sample_str = ','.join(samples) if samples else '-'
-                            print(f"  - {reason}: {n}  (e.g. {sample_str})")
-                except Exception:
-                    pass
-
-
-                if candidates and open_pos_count < max_open_pos:
-                    best_score, best_intent, best_key = candidates[0]
-
-                    # portfolio risk cap check (based on known open positions from state)
-                    try:
-                        new_risk = max(0.0, (float(best_intent.limit_price) - float(best_intent.sl_price)) * float(best_intent.qty))
-                    except Exception:
-                        new_risk = 0.0
-                    if (cur_risk + new_risk) > total_risk_cap_usd:
-                        candidates = []
-
-                    # cash buffer guard
-                    try:
-                        min_cash_buf = float(os.environ.get('MIN_CASH_BUFFER_USD','50'))
-                        notional = float(best_intent.limit_price or 0) * float(best_intent.qty or 0)
-                        if (equity - notional) < min_cash_buf:
-                            candidates = []
-                            skip_reasons.append((best_intent.symbol, f"SKIP_CASH_BUFFER:{min_cash_buf}", best_key))
-                    except Exception:
-                        pass
-
-                    # Record paper ledger (always) for audit
-                    if os.environ.get('PAPER_TRADING', 'on') == 'on':
-                        append_ledger(best_intent, fill_price=best_intent.limit_price, status='FILLED')
-                        print(f"\nPAPER_ORDER:{best_intent.symbol}:{best_intent.side}:{best_intent.qty}@{best_intent.limit_price}")
-
-                    # Live submit path (hard-gated). Default is dry-run.
-                    if is_live() and live_trading_enabled():
-                        from broker.live_executor import submit_live_order
-                        dry_run = (os.environ.get('LIVE_SUBMIT', '0') != '1')
-                                                # PRE_SUBMIT_REQUOTE: refresh quote right before submit and adjust limit
-                        try:
-                            from broker.longport_client import get_quote
-                            qx = get_quote(qctx, best_intent.symbol)
-                            if qx.last is not None:
-                                # for Buy, use last*1.002 as aggressive limit when ask unavailable
-                                best_intent.limit_price = round(float(qx.last) * 1.002, 2)
-                        except Exception:
-                            pass
-
-                        r = submit_live_order(best_intent, dry_run=dry_run)
-                        if r.ok and r.dry_run:
-                            print(f"\nLIVE_ORDER_DRYRUN:{best_intent.symbol}:{best_intent.side}:{best_intent.qty}@{best_intent.limit_price}")
-                        elif r.ok:
-                            print(f"\nLIVE_ORDER_OK:{best_intent.symbol}:order_id={r.order_id}")
-                        else:
-                            print(f"\nLIVE_ORDER_FAIL:{best_intent.symbol}:{r.error}")
-
-                    mark_executed(best_key, meta={'symbol': best_intent.symbol, 'qty': best_intent.qty})
-                    try:
-                        add_open_position(best_intent.symbol, best_intent.qty, float(best_intent.limit_price or 0), best_intent.sl_price, best_intent.tp_price, meta={'key': best_key})
-                    except Exception:
-                        pass
-                    inc_daily(day_key)
-
+            execute_strong_signals(strong_buy, account=exec_prefetch)
         except Exception as _e:
             print(f"  [execution-select failed] {_e}")
+        finally:
+            tm.stop()
+    elif exec_prefetch is not None:
+        # no strong signal: still wait for the prefetch (its reconcile updates trading state)
+        finish_account_prefetch(exec_prefetch)
 
     # --- 2) Send normal as one batch (top list)
     if normal_buy:
@@ -898,6 +693,7 @@ def main():
     # --- 3) Always save signals to Dashboard for all new buys
     for sig in new_buy:
         # 自动保存到 Dashboard signals.json
+        tm = stage('dashboard', ticker=sig.get('ticker'))
         try:
             import sys as _sys
             _sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dashboard'))
@@ -905,9 +701,12 @@ def main():
             add_buy_signal(sig)
         except Exception as _e:
             print(f"  [Dashboard 同步失败] {_e}")
+        finally:
+            tm.stop()
 
     # --- 4) push_history: strong singles + one batch record
     for sig in strong_buy:
+        tm = stage('push_history', ticker=sig.get('ticker'))
         try:
             import sys as _sys
             _sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dashboard'))
@@ -935,8 +734,11 @@ def main():
             )
         except Exception as _e:
             print(f"  [push_history 单条同步失败] {_e}")
+        finally:
+            tm.stop()
 
     if new_buy:
+        tm = stage('push_history')
         try:
             import sys as _sys
             _sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../dashboard'))
@@ -952,6 +754,8 @@ def main():
             )
         except Exception as _e:
             print(f"  [推送历史同步失败] {_e}")
+        finally:
+            tm.stop()
 
     save_state(state)
 
@@ -1025,6 +829,7 @@ def main():
     # ════════════════════════════════════
     # 盘中：每次扫描后更新持仓诊断 + 自动 push
     # ════════════════════════════════════
+    tm = stage('diagnosis')
     try:
         import sys as _sys
         _sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../jobs'))
@@ -1033,12 +838,18 @@ def main():
         run_diagnosis()
     except Exception as _e:
         print(f"  [持仓诊断更新失败] {_e}")
+    finally:
+        tm.stop()
 
 
 if __name__ == '__main__':
+    status = 'ok'
     try:
         main()
+        if format_frame_cache_stats is not None:
+            print(f"\n{format_frame_cache_stats()}")
     except Exception as e:
+        status = type(e).__name__
         # Ensure cron parser can see a segment even when crashed.
         # In cron mode we prefer *soft fail* (exit 0) so the scheduler doesn't accumulate consecutive errors,
         # while still emitting a parsable ERROR_SIGNAL segment for alerting.
@@ -1051,3 +862,6 @@ if __name__ == '__main__':
         if strict:
             raise
         sys.exit(0)
+    finally:
+        # per-stage wall time / network calls / rows → SCAN_TIMING line + data/metrics/scan_timing.jsonl
+        report_scan_timing('full_scan', status=status)
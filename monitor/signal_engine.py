@@ -1,7 +1,7 @@
 """
 信号引擎：扫描股票池，计算买入信号评分
 """
-import sys, warnings
+import os, sys, warnings
 warnings.filterwarnings('ignore')
 sys.path.insert(0, '..')
 sys.path.insert(0, '../src')
@@ -9,7 +9,7 @@ sys.path.insert(0, '../src')
 import yfinance as yf
 import pandas as pd
 import numpy as np
-from analyzer.indicators import add_all_indicators, add_crossover_signals
+from analyzer.indicators import compute_indicators, add_crossover_signals
 from datetime import datetime
 from config import WATCHLIST, STRATEGY
 
@@ -19,9 +19,51 @@ try:
 except Exception:
     compute_rs_1y = None
 
+# 扫描分阶段计时（src/scan_timing.py，RS_1Y 单独记一段）
+try:
+    from scan_timing import stage as _timing_stage
+except Exception:
+    _timing_stage = None
+
+# 知识库（jobs/kb.py，解析一次、按 mtime 重载）
+try:
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../jobs'))
+    import kb as knowledge_base
+except Exception:
+    knowledge_base = None
+
+# 进程内 frame 缓存（同一轮扫描重复加载/算指标命中缓存）
+try:
+    import frame_cache
+except Exception:
+    frame_cache = None
+
+# score_signal + check_stabilization 读取的指标列（compute_indicators 只算这些）
+SCORE_SIGNAL_NEEDS = frozenset({
+    'rsi14', 'bb_pct20', 'macd_hist', 'vol_ratio',
+    'above_ma200', 'above_ma50', 'above_ma20', 'ret_5d',
+    'kdj_k', 'kdj_j', 'atr14', 'atr_pct14', 'ma20', 'ma50',
+})
+
+
+def get_1h_data(ticker: str, days: int = 59, needs=SCORE_SIGNAL_NEEDS) -> pd.DataFrame:
+    """拉取1小时K线（只计算 needs 指标列）
 
-def get_1h_data(ticker: str, days: int = 59) -> pd.DataFrame:
-    """拉取1小时K线"""
+    指标结果按 (ticker, 最后一根K线) 进进程内缓存（frame_cache），同一轮扫描重复调用不再重算。
+    """
+    df = get_1h_ohlcv(ticker, days)
+    if df.empty:
+        return df
+    if frame_cache is None:
+        return compute_indicators(df, needs=needs)
+    last = df.iloc[-1]
+    # 最后一根可能是未收盘的K线：收盘价/成交量变了也算新版本
+    version = ('yf', days, len(df), df.index[-1], float(last.get('close', np.nan)), float(last.get('volume', np.nan)))
+    return frame_cache.cached(ticker, '1h', version, frozenset(needs), lambda: compute_indicators(df, needs=needs))
+
+
+def get_1h_ohlcv(ticker: str, days: int = 59) -> pd.DataFrame:
+    """拉取1小时K线（原始 OHLCV，不算指标）"""
     from datetime import timedelta
     end = datetime.now()
     start = end - timedelta(days=days)
@@ -35,7 +77,7 @@ def get_1h_data(ticker: str, days: int = 59) -> pd.DataFrame:
         return df
     df.index = df.index.tz_localize(None) if df.index.tzinfo else df.index
     df.columns = [c.lower() for c in df.columns]
-    return add_all_indicators(df)
+    return df
 
 
 def check_stabilization(df: pd.DataFrame) -> dict:
@@ -143,10 +185,14 @@ def _structure_signals(df: pd.DataFrame, ticker: str) -> dict:
         # compute RS_1Y once and attach (do NOT call it RPS)
         rs_1y = None
         if compute_rs_1y is not None:
+            tm = _timing_stage('phase2.rs', ticker=ticker) if _timing_stage is not None else None
             try:
                 rs_1y = float(compute_rs_1y(ticker))
             except Exception:
                 rs_1y = None
+            finally:
+                if tm is not None:
+                    tm.stop()
 
         signals = []
         if s1:
@@ -158,24 +204,49 @@ def _structure_signals(df: pd.DataFrame, ticker: str) -> dict:
                 s2['rs_1y'] = rs_1y
             signals.append(s2)
 
-        # pick best by rr *and* risk distance sanity (prefer reasonable risk)
-        best = None
-        if signals:
-            def key(s):
-                risk = max(1e-9, float(s['entry'] - s['sl']))
-                risk_pct = risk / float(s['entry'])
-                return (1 if risk_pct <= 0.08 else 0, -risk_pct, s.get('type',''))
-            best = sorted(signals, key=key, reverse=True)[0]
-
-        return {"enabled": True, "signals": signals, "best": best}
+        return {"enabled": True, "signals": signals, "best": best_structure_signal(signals)}
     except Exception:
         return {"enabled": False, "signals": [], "best": None}
 
 
-def score_signal(row: pd.Series, ticker: str) -> dict:
+def best_structure_signal(signals: list):
+    """pick best by rr *and* risk distance sanity (prefer reasonable risk)"""
+    if not signals:
+        return None
+
+    def key(s):
+        risk = max(1e-9, float(s['entry'] - s['sl']))
+        risk_pct = risk / float(s['entry'])
+        return (1 if risk_pct <= 0.08 else 0, -risk_pct, s.get('type',''))
+    return sorted(signals, key=key, reverse=True)[0]
+
+
+def _kb_bonus(ticker: str) -> int:
+    """知识库加权分（核心持仓 +15 / 重点关注 +8），读取失败为 0"""
+    if knowledge_base is None:
+        return 0
+    try:
+        return knowledge_base.score_bonus(ticker)
+    except Exception:
+        return 0
+
+
+def _rs_1y(ticker: str) -> float:
+    """RS_1Y（vs SPY），不可用时为 -999"""
+    if compute_rs_1y is None:
+        return -999.0
+    try:
+        return compute_rs_1y(ticker)
+    except Exception:
+        return -999.0
+
+
+def score_signal(row: pd.Series, ticker: str, rs_1y: float = None, kb_bonus: int = None) -> dict:
     """
     对单根K线打分，返回信号评分和详情
     满分100分，≥70分发通知
+
+    rs_1y / kb_bonus: 已算好的值（score_signal_vectorized 展开时传入），None 则现算
     """
     score = 0
     details = []
@@ -266,30 +337,20 @@ def score_signal(row: pd.Series, ticker: str) -> dict:
         details.append('⚠️ 初步企稳信号')
 
     # ── 8. 知识库加权（最多+15分）──
-    kb_bonus = 0
     kb_tag = ''
-    try:
-        import sys, os
-        sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../jobs'))
-        import kb as knowledge_base
-        kb_bonus = knowledge_base.score_bonus(ticker)
-        if kb_bonus >= 15:
-            kb_tag = '⭐ 核心持仓'
-            details.append(f'⭐ 核心持仓加权 +{kb_bonus}分')
-        elif kb_bonus > 0:
-            kb_tag = '🎯 重点关注'
-            details.append(f'🎯 重点关注加权 +{kb_bonus}分')
-    except Exception:
-        pass
+    if kb_bonus is None:
+        kb_bonus = _kb_bonus(ticker)
+    if kb_bonus >= 15:
+        kb_tag = '⭐ 核心持仓'
+        details.append(f'⭐ 核心持仓加权 +{kb_bonus}分')
+    elif kb_bonus > 0:
+        kb_tag = '🎯 重点关注'
+        details.append(f'🎯 重点关注加权 +{kb_bonus}分')
     score += kb_bonus
 
     # ── 9. 相对强度 RS_1Y（vs SPY，新趋势过滤器）──
-    rs_1y = -999.0
-    if compute_rs_1y is not None:
-        try:
-            rs_1y = compute_rs_1y(ticker)
-        except Exception:
-            rs_1y = -999.0
+    if rs_1y is None:
+        rs_1y = _rs_1y(ticker)
 
     # RS_1Y 打分：跑赢大盘才有额外分
     if rs_1y > 10:
@@ -389,6 +450,100 @@ def score_signal(row: pd.Series, ticker: str) -> dict:
     }
 
 
+def _col(df: pd.DataFrame, name: str, default: float) -> np.ndarray:
+    """df[name] as float array (row.get(name, default) semantics for a missing column)"""
+    if name in df.columns:
+        return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+    return np.full(len(df), float(default))
+
+
+def _per_row(value, tickers: np.ndarray, fn, dtype) -> np.ndarray:
+    """标量 / 数组 / None（按 ticker 现算，每个 ticker 只算一次）→ 与行对齐的数组"""
+    if value is None:
+        cache = {t: fn(t) for t in dict.fromkeys(tickers)}
+        return np.array([cache[t] for t in tickers], dtype=dtype)
+    return np.broadcast_to(np.asarray(value, dtype=dtype), tickers.shape).copy()
+
+
+def score_signal_vectorized(df: pd.DataFrame, ticker: str = None, rs_1y=None, kb_bonus=None) -> pd.DataFrame:
+    """
+    score_signal 的向量化版本：一次给 df 的每一行打分（与逐行调用 score_signal 结果一致）
+
+    - ticker: 单只股票的 df 传 ticker；不传则以 df.index 为 ticker（如 IndicatorPanel.latest()）
+    - rs_1y / kb_bonus: 标量或与 df 等长的数组；None 时按 ticker 现算（每个 ticker 一次）
+    - 只算数值字段：score / risk_mode / 建议价 / 止盈止损 / RS / KB；
+      details / warnings 等文字用 expand_signals() 只对过线的行生成
+
+    返回 DataFrame（index 同 df）
+    """
+    n = len(df)
+    tickers = np.full(n, ticker, dtype=object) if ticker is not None else df.index.astype(str).to_numpy(dtype=object)
+
+    rsi      = _col(df, 'rsi14', 99)
+    bb       = _col(df, 'bb_pct20', 0.5)
+    macd_h   = _col(df, 'macd_hist', 0)
+    vol_r    = _col(df, 'vol_ratio', 1)
+    above200 = _col(df, 'above_ma200', 0)
+    above50  = _col(df, 'above_ma50', 0)
+    ret5d    = _col(df, 'ret_5d', 0) * 100
+    price    = _col(df, 'close', 0)
+    ma20     = _col(df, 'ma20', 0) if 'ma20' in df.columns else price
+    ma50     = _col(df, 'ma50', 0) if 'ma50' in df.columns else price
+
+    kb = _per_row(kb_bonus, tickers, _kb_bonus, np.int64)
+    rs = _per_row(rs_1y, tickers, _rs_1y, float)
+
+    # 与 score_signal 同一套分段（NaN 比较为 False → 落到默认档；NaN 的 above_* 视为真，同 Python bool）
+    with np.errstate(invalid='ignore'):
+        score = (
+            np.select([above200 != 0, above50 != 0], [30, 15], 0)                      # 1. MA趋势
+            + np.select([rsi < 25, rsi < 32, rsi < 40, rsi < 50], [30, 25, 15, 5], 0)   # 2. RSI超卖
+            + np.select([bb < 0.10, bb < 0.20, bb < 0.35], [20, 15, 8], 0)              # 3. 布林带位置
+            + np.where(macd_h < 0, 10, 0)                                               # 4. MACD负区
+            + np.select([(0.5 < vol_r) & (vol_r < 1.5), vol_r > 2], [5, 3], 0)          # 5. 量比
+            + np.select([ret5d < -10, ret5d < -5], [5, 3], 0)                           # 6. 回调幅度
+            + np.where((rsi < 30) & (macd_h > macd_h * 0.95), 3, 0)                     # 7. 初步企稳
+            + kb                                                                        # 8. 知识库
+            + np.select([rs > 10, rs > 0], [10, 5], 0)                                  # 9. RS_1Y
+        )
+        score = np.minimum(score, 100).astype(np.int64)
+
+        is_strong = score >= STRATEGY.get('strong_trend_min_score', 85)
+        tp_pct = np.where(is_strong, STRATEGY['take_profit_strong'], STRATEGY['take_profit'])
+        sl_pct = np.where(is_strong, STRATEGY['stop_loss_strong'], STRATEGY['stop_loss'])
+        rr_strong = round(STRATEGY['take_profit_strong'] / abs(STRATEGY['stop_loss_strong']), 2)
+        rr_normal = round(STRATEGY['take_profit'] / abs(STRATEGY['stop_loss']), 2)
+
+        # 建议买入价（同 score_signal 的优先级）
+        rules = [rsi < 25, (rsi < 35) & (bb < 0.2), price < ma20 * 0.98, price < ma50 * 0.98]
+        suggest_rule = np.select(rules, [0, 1, 2, 3], 4)
+        suggest_raw = np.select(rules, [price * 1.005, price * 0.995, ma20 * 0.995, ma50 * 0.995], price * 0.99)
+        suggest_price = np.round(suggest_raw, 2)
+
+    return pd.DataFrame({
+        'ticker':        tickers,
+        'score':         score,
+        'risk_mode':     np.where(is_strong, 'strong', 'normal'),
+        'price':         np.round(price, 2),
+        'suggest_price': suggest_price,
+        'suggest_rule':  suggest_rule,
+        'tp_price':      np.round(suggest_price * (1 + tp_pct), 2),
+        'sl_price':      np.round(suggest_price * (1 + sl_pct), 2),
+        'rr_ratio':      np.where(is_strong, rr_strong, rr_normal),
+        'kb_bonus':      kb,
+        'rs_1y':         rs,
+    }, index=df.index)
+
+
+def expand_signals(df: pd.DataFrame, scored: pd.DataFrame, min_score: float) -> list:
+    """对 score >= min_score 的行生成完整信号 dict（与 score_signal 相同，含 details / warnings）"""
+    out = []
+    for i in np.flatnonzero(scored['score'].to_numpy() >= min_score):
+        v = scored.iloc[i]
+        out.append(score_signal(df.iloc[i], v['ticker'], rs_1y=float(v['rs_1y']), kb_bonus=int(v['kb_bonus'])))
+    return out
+
+
 def format_structure_signal_message(ticker: str, sig: dict, timeframe: str = "60") -> str:
     """Format structure (1buy/2buy) signal message in the user's case style."""
     typ = sig.get('type', '').strip()
@@ -522,8 +677,11 @@ def format_signal_message(sig: dict) -> str:
     return msg
 
 
-def run_scan(watchlist: list = None) -> list:
-    """执行一次完整扫描，返回所有触发信号"""
+def run_scan(watchlist: list = None, panel: bool = False) -> list:
+    """执行一次完整扫描，返回所有触发信号
+
+    panel=True：先拉全部 K 线，再用 analyzer.panel 一次性计算所有标的的指标。
+    """
     if watchlist is None:
         watchlist = WATCHLIST
 
@@ -535,14 +693,34 @@ def run_scan(watchlist: list = None) -> list:
     signals = []
     errors  = []
 
+    latest = None
+    if panel:
+        from analyzer.panel import compute_panel
+        frames = {}
+        for ticker in watchlist:
+            try:
+                frames[ticker] = get_1h_ohlcv(ticker)
+            except Exception as e:
+                errors.append(f"{ticker}: {e}")
+        p = compute_panel(frames, needs=SCORE_SIGNAL_NEEDS)
+        latest = {t: (int(n), p.latest_row(t)) for t, n in zip(p.tickers, p.lengths)}
+        latest.update({t: None for t in watchlist if t not in frames})  # 已记录拉取错误
+
     for ticker in watchlist:
         try:
-            df = get_1h_data(ticker)
-            if len(df) < 30:
+            if latest is None:
+                df = get_1h_data(ticker)
+                n, row = len(df), (df.iloc[-1] if len(df) else None)
+            elif ticker in latest:
+                if latest[ticker] is None:
+                    continue
+                n, row = latest[ticker]
+            else:
+                n, row = 0, None
+            if n < 30:
                 errors.append(f"{ticker}: 数据不足")
                 continue
 
-            row = df.iloc[-1]
             sig = score_signal(row, ticker)
 
             status = f"  {ticker:<6} 评分={sig['score']:>3}  RSI={sig['rsi14']:>5.1f}  BB%={sig['bb_pct']:>6.3f}  MA200={'✅' if sig['above_ma200'] else '❌'}"
@@ -565,7 +743,7 @@ def run_scan(watchlist: list = None) -> list:
 
 
 if __name__ == '__main__':
-    sigs = run_scan()
+    sigs = run_scan(panel='--panel' in sys.argv)
     if sigs:
         print(f"\n{'='*60}")
         print("📨 待发送信号:")
@@ -16,9 +16,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../src'))
 
 from fast_scan import phase1_filter
-from analyzer.indicators import add_all_indicators
-from signal_engine import score_signal, _structure_signals
-from data_store import sync_and_load
+from analyzer.incremental import add_all_indicators_incremental
+from analyzer.panel import compute_panel
+from strategy.structure import STRUCTURE_NEEDS
+from signal_engine import score_signal, _structure_signals, SCORE_SIGNAL_NEEDS
+from data_store import sync_and_load, sync_many
 import config as cfg
 
 
@@ -31,7 +33,27 @@ def _pick_baseline_row(df: pd.DataFrame):
     return day_df.index[-1], day_df.iloc[-1]
 
 
-def run_scan(watchlist=None, min_score=None):
+def _sync_1h(tickers: list) -> dict:
+    """Concurrent sync of all candidates (data_store.sync_many) -> {ticker: df}."""
+    res = sync_many(tickers, interval='1h', lookback_days=120, max_auto_lookback_days=730)
+    return {t: r.df for t, r in res.items()}
+
+
+def _load_1h(t: str, synced: dict = None):
+    if synced is not None and t in synced:
+        df = synced[t]
+    else:
+        df = sync_and_load(t, interval='1h', lookback_days=120, max_auto_lookback_days=730)
+    if df is None or df.empty or len(df) < 50:
+        return None
+    df = df.copy()
+    df.columns = [x.lower() for x in df.columns]
+    return df
+
+
+def run_scan(watchlist=None, min_score=None, panel=False):
+    """panel=True: load every candidate first, then compute indicators for all of them
+    in one analyzer.panel pass (instead of per-ticker incremental cache)."""
     watchlist = watchlist or cfg.WATCHLIST_FULL
     notify = cfg.NOTIFY
     min_score = min_score if min_score is not None else notify.get('min_score', 70)
@@ -42,17 +64,33 @@ def run_scan(watchlist=None, min_score=None):
     errs = 0
     base_date = None
 
+    synced = _sync_1h([c['ticker'] for c in candidates])
+
+    ind_panel = None
+    if panel:
+        frames = {}
+        for c in candidates:
+            try:
+                df = _load_1h(c['ticker'], synced)
+                if df is not None:
+                    frames[c['ticker']] = df
+            except Exception:
+                errs += 1
+        ind_panel = compute_panel(frames, needs=SCORE_SIGNAL_NEEDS | STRUCTURE_NEEDS)
+
     for c in candidates:
         t = c['ticker']
         try:
-            df = sync_and_load(t, interval='1h', lookback_days=120, max_auto_lookback_days=730)
-            if df is None or df.empty or len(df) < 50:
-                continue
-
-            df = df.copy()
-            df.columns = [x.lower() for x in df.columns]
-            if 'rsi14' not in df.columns:
-                df = add_all_indicators(df)
+            if ind_panel is not None:
+                if t not in ind_panel.tickers:
+                    continue
+                df = ind_panel.frame(t)
+            else:
+                df = _load_1h(t, synced)
+                if df is None:
+                    continue
+                if 'rsi14' not in df.columns:
+                    df = add_all_indicators_incremental(df, t, interval='1h')
 
             bar_time, row = _pick_baseline_row(df)
             if row is None:
@@ -105,7 +143,7 @@ def run_scan(watchlist=None, min_score=None):
 
 
 def main():
-    res = run_scan()
+    res = run_scan(panel='--panel' in sys.argv)
     out = res['out']
 
     os.makedirs(os.path.join(os.path.dirname(__file__), '../data/tmp'), exist_ok=True)
@@ -0,0 +1,233 @@
+"""Incremental indicator engine (append-only bars)
+
+Goal
+- `add_all_indicators` recomputes every column over the whole history. The hourly scans
+  feed it 120-730d of 1H bars per ticker, although only 1-2 bars are new since last run.
+- Persist the enriched frame next to the parquet store and compute only the new rows.
+
+Storage
+- data/store/{interval}/indicators/{TICKER}.parquet
+  - all columns produced by add_all_indicators
+  - plus hidden carry columns (_ema12, _ema26) that MACD needs but does not expose
+
+State
+- Recursive indicators (EMA*, MACD signal, KDJ K/D) are resumed from the last cached row
+  (EMA carry). Rolling indicators (MA/RSI/BB/ATR/52w/vol/ret) are recomputed for the new
+  rows from the last CONTEXT_BARS raw bars (rolling-window buffer).
+- The cached frame must be a prefix of the incoming one. The first row whose OHLCV differs
+  (e.g. a partial last bar that yfinance later finalised) and everything after it is
+  recomputed; any other mismatch falls back to a full recompute.
+
+Tolerance
+- EMA / MACD / KDJ columns and rolling max/min columns match the full recompute bit-for-bit.
+- Rolling mean/std based columns (ma*, rsi*, bb_*, atr*, vol_*) can differ in the last
+  bits because pandas accumulates rolling sums from the start of the series:
+  |a - b| <= 1e-9 * max(1, |b|)  (see TOLERANCE / verify_incremental).
+
+Usage
+  from analyzer.incremental import add_all_indicators_incremental
+  df = add_all_indicators_incremental(df, 'TSLA', interval='1h')
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from analyzer.indicators import add_all_indicators
+
+# longest lookback in add_all_indicators is the 252-bar 52w window
+CONTEXT_BARS = 260
+TOLERANCE = 1e-9
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+EMA_SPANS = [5, 10, 20, 50, 120, 200]
+CARRY_COLUMNS = ['_ema12', '_ema26']
+
+
+def _cache_path(ticker: str, interval: str, base_dir: Optional[str] = None) -> str:
+    if base_dir is None:
+        try:
+            from data_store import StoreConfig
+            base_dir = StoreConfig().base_dir
+        except Exception:
+            base_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'store')
+    d = os.path.join(base_dir, interval.lower(), 'indicators')
+    os.makedirs(d, exist_ok=True)
+    safe = ticker.replace('/', '_').replace(':', '_')
+    return os.path.join(d, f'{safe}.parquet')
+
+
+def _save_cache(out: pd.DataFrame, p: str) -> None:
+    """tmp file + os.replace (as data_store._write_atomic): concurrent scans / backtests never
+    read a torn cache file. A failed write is logged; the next run recomputes."""
+    tmp = f"{p}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        out.to_parquet(tmp)
+        os.replace(tmp, p)
+    except Exception as e:
+        print(f"[indicator cache write failed] {p}: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def _ewm_carry(values: np.ndarray, carry: float, **kwargs) -> np.ndarray:
+    """Continue an adjust=False EWM from the previous output value.
+
+    pandas seeds the recursion with the first value, so prepending the carry
+    reproduces the full-series arithmetic exactly.
+    """
+    s = pd.Series(np.concatenate([[carry], values]))
+    return s.ewm(adjust=False, **kwargs).mean().to_numpy()[1:]
+
+
+def _full(df: pd.DataFrame) -> pd.DataFrame:
+    out = add_all_indicators(df)
+    out['_ema12'] = out['close'].ewm(span=12, adjust=False).mean()
+    out['_ema26'] = out['close'].ewm(span=26, adjust=False).mean()
+    return out
+
+
+def _first_mismatch(cached: pd.DataFrame, df: pd.DataFrame) -> int:
+    """Number of leading rows of `df` that are identical to the cache (index + OHLCV)."""
+    n = min(len(cached), len(df))
+    if n == 0:
+        return 0
+    same = cached.index[:n] == df.index[:n]
+    for c in OHLCV:
+        if c not in df.columns or c not in cached.columns:
+            continue
+        a = cached[c].to_numpy(dtype=float)[:n]
+        b = df[c].to_numpy(dtype=float)[:n]
+        same &= (a == b) | (np.isnan(a) & np.isnan(b))
+    bad = np.flatnonzero(~same)
+    return int(bad[0]) if len(bad) else n
+
+
+def _extend(base: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """Compute indicator rows of df[len(base):] given enriched `base` == df[:len(base)]."""
+    k = len(base)
+    ctx = df.iloc[max(0, k - CONTEXT_BARS):]
+    offset = k - max(0, k - CONTEXT_BARS)
+    new = add_all_indicators(ctx).iloc[offset:].copy()
+
+    last = base.iloc[-1]
+    close = new['close'].to_numpy(dtype=float)
+
+    for n in EMA_SPANS:
+        new[f'ema{n}'] = _ewm_carry(close, float(last[f'ema{n}']), span=n)
+
+    ema12 = _ewm_carry(close, float(last['_ema12']), span=12)
+    ema26 = _ewm_carry(close, float(last['_ema26']), span=26)
+    macd = ema12 - ema26
+    new['macd'] = macd
+    new['macd_signal'] = _ewm_carry(macd, float(last['macd_signal']), span=9)
+    new['macd_hist'] = new['macd'] - new['macd_signal']
+    new['_ema12'] = ema12
+    new['_ema26'] = ema26
+
+    low_n = ctx['low'].rolling(9).min().iloc[offset:]
+    high_n = ctx['high'].rolling(9).max().iloc[offset:]
+    rsv = ((new['close'] - low_n) / (high_n - low_n + 1e-9) * 100).to_numpy(dtype=float)
+    new['kdj_k'] = _ewm_carry(rsv, float(last['kdj_k']), com=2)
+    new['kdj_d'] = _ewm_carry(new['kdj_k'].to_numpy(dtype=float), float(last['kdj_d']), com=2)
+    new['kdj_j'] = 3 * new['kdj_k'] - 2 * new['kdj_d']
+
+    return pd.concat([base, new[base.columns]], axis=0)
+
+
+def _resumable(base: pd.DataFrame) -> bool:
+    if len(base) < CONTEXT_BARS:
+        return False
+    last = base.iloc[-1]
+    cols = [f'ema{n}' for n in EMA_SPANS] + CARRY_COLUMNS + ['macd_signal', 'kdj_k', 'kdj_d']
+    try:
+        return all(np.isfinite(float(last[c])) for c in cols)
+    except Exception:
+        return False
+
+
+def extend_indicators(cached: Optional[pd.DataFrame], df: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+    """Return (enriched frame incl. carry columns, number of rows computed)."""
+    if cached is None or cached.empty:
+        return _full(df), len(df)
+    if list(cached.columns[:len(df.columns)]) != list(df.columns):
+        return _full(df), len(df)
+
+    keep = _first_mismatch(cached, df)
+    base = cached.iloc[:keep]
+    if keep == len(df) and keep == len(cached):
+        return cached, 0
+    if not _resumable(base) or any(c not in base.columns for c in CARRY_COLUMNS):
+        return _full(df), len(df)
+    if keep == len(df):
+        # incoming frame is a strict prefix of the cache: nothing to compute
+        return base, 0
+    return _extend(base, df), len(df) - keep
+
+
+def add_all_indicators_incremental(
+    df: pd.DataFrame,
+    ticker: str,
+    interval: str = '1h',
+    base_dir: Optional[str] = None,
+) -> pd.DataFrame:
+    """Same output as add_all_indicators(df), computing only bars not yet cached.
+
+    `df` must be the full stored history (e.g. from data_store.sync_and_load), with
+    lowercase OHLCV columns and a sorted DatetimeIndex.
+    """
+    if df is None or df.empty:
+        return add_all_indicators(df)
+
+    p = _cache_path(ticker, interval, base_dir)
+    cached = None
+    if os.path.exists(p):
+        try:
+            cached = pd.read_parquet(p)
+        except Exception:
+            cached = None
+
+    try:
+        out, computed = extend_indicators(cached, df)
+    except Exception:
+        out, computed = _full(df), len(df)
+
+    if computed:
+        _save_cache(out, p)
+
+    return out.drop(columns=CARRY_COLUMNS, errors='ignore')
+
+
+def verify_incremental(df: pd.DataFrame, split: int, tol: float = TOLERANCE) -> dict:
+    """Compare full recompute vs (cache df[:split], then extend to df) on every column.
+
+    Returns {'max_abs_err': .., 'bad_columns': [...], 'rows_computed': ..}.
+    """
+    full = add_all_indicators(df)
+    cached, _ = extend_indicators(None, df.iloc[:split])
+    inc, computed = extend_indicators(cached, df)
+    inc = inc.drop(columns=CARRY_COLUMNS)
+
+    bad = []
+    max_err = 0.0
+    if list(inc.columns) != list(full.columns) or not inc.index.equals(full.index):
+        bad.append('__shape__')
+    for c in full.columns:
+        a = pd.to_numeric(full[c], errors='coerce').to_numpy(dtype=float)
+        b = pd.to_numeric(inc[c], errors='coerce').to_numpy(dtype=float)
+        both_nan = np.isnan(a) & np.isnan(b)
+        err = np.where(both_nan, 0.0, np.abs(a - b))
+        limit = tol * np.maximum(1.0, np.abs(a))
+        if np.any(np.isnan(err)) or np.any(err > limit):
+            bad.append(c)
+        finite = err[np.isfinite(err)]
+        if len(finite):
+            max_err = max(max_err, float(finite.max()))
+    return {'max_abs_err': max_err, 'bad_columns': bad, 'rows_computed': int(computed)}
@@ -1,94 +1,190 @@
 """
 技术指标计算模块
 使用 ta 库，覆盖主流技术指标
+
+按需计算
+- 每一列在 INDICATOR_SPECS 里登记（依赖列 + 计算函数），`compute_indicators(df, needs=...)`
+  只计算 needs 及其依赖（如 bb_pct20 -> bb_upper20/bb_lower20 -> bb_mid20 + _std20）。
+- 以下划线开头的是内部中间量（_delta / _tr / _std20 ...），不会写入结果。
+- `add_all_indicators(df)` == `compute_indicators(df, needs=ALL_COLUMNS)`，数值与列顺序不变。
+
+用法
+  from analyzer.indicators import compute_indicators
+  df = compute_indicators(df, needs={'rsi14', 'bb_pct20', 'atr14'})
 """
 
+from typing import Callable, Dict, Iterable, List, Tuple
+
 import pandas as pd
 import numpy as np
 
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
 
-def add_all_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    """在 OHLCV DataFrame 上添加所有常用技术指标"""
-    df = df.copy()
+# column -> (依赖列, fn(cols) -> Series)；cols 为已算好的列（含 OHLCV）
+INDICATOR_SPECS: Dict[str, Tuple[Tuple[str, ...], Callable]] = {}
+
+
+def _spec(name: str, deps: Iterable[str]):
+    def deco(fn):
+        INDICATOR_SPECS[name] = (tuple(deps), fn)
+        return fn
+    return deco
+
+
+# -------- 均线 --------
+for _n in [5, 10, 20, 50, 120, 200]:
+    _spec(f'ma{_n}', ['close'])(lambda c, n=_n: c['close'].rolling(n).mean())
+    _spec(f'ema{_n}', ['close'])(lambda c, n=_n: c['close'].ewm(span=n, adjust=False).mean())
+
+# -------- MACD --------
+_spec('_ema12', ['close'])(lambda c: c['close'].ewm(span=12, adjust=False).mean())
+_spec('_ema26', ['close'])(lambda c: c['close'].ewm(span=26, adjust=False).mean())
+_spec('macd', ['_ema12', '_ema26'])(lambda c: c['_ema12'] - c['_ema26'])
+_spec('macd_signal', ['macd'])(lambda c: c['macd'].ewm(span=9, adjust=False).mean())
+_spec('macd_hist', ['macd', 'macd_signal'])(lambda c: c['macd'] - c['macd_signal'])
+
+# -------- RSI（共享一次 diff）--------
+_spec('_delta', ['close'])(lambda c: c['close'].diff())
+
+
+def _rsi(c, n):
+    gain = c['_delta'].clip(lower=0).rolling(n).mean()
+    loss = (-c['_delta'].clip(upper=0)).rolling(n).mean()
+    rs = gain / loss.replace(0, np.nan)
+    return 100 - 100 / (1 + rs)
+
+
+for _n in [6, 14, 21]:
+    _spec(f'rsi{_n}', ['_delta'])(lambda c, n=_n: _rsi(c, n))
+
+# -------- Bollinger Bands（mid 与 ma20 同一计算）--------
+_spec('_std20', ['close'])(lambda c: c['close'].rolling(20).std())
+_spec('bb_mid20', ['ma20'])(lambda c: c['ma20'])
+_spec('bb_upper20', ['bb_mid20', '_std20'])(lambda c: c['bb_mid20'] + 2 * c['_std20'])
+_spec('bb_lower20', ['bb_mid20', '_std20'])(lambda c: c['bb_mid20'] - 2 * c['_std20'])
+_spec('bb_pct20', ['close', 'bb_upper20', 'bb_lower20'])(
+    lambda c: (c['close'] - c['bb_lower20']) / (c['bb_upper20'] - c['bb_lower20']))
+_spec('bb_width20', ['bb_upper20', 'bb_lower20', 'bb_mid20'])(
+    lambda c: (c['bb_upper20'] - c['bb_lower20']) / c['bb_mid20'])
+
+
+# -------- ATR (波动率) --------
+@_spec('_tr', ['high', 'low', 'close'])
+def _true_range(c):
+    high_low = c['high'] - c['low']
+    high_close = (c['high'] - c['close'].shift()).abs()
+    low_close  = (c['low']  - c['close'].shift()).abs()
+    return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
 
-    # -------- 均线 --------
-    for n in [5, 10, 20, 50, 120, 200]:
-        df[f'ma{n}'] = df['close'].rolling(n).mean()
-        df[f'ema{n}'] = df['close'].ewm(span=n, adjust=False).mean()
-
-    # -------- MACD --------
-    ema12 = df['close'].ewm(span=12, adjust=False).mean()
-    ema26 = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = ema12 - ema26
-    df['macd_signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    df['macd_hist'] = df['macd'] - df['macd_signal']
-
-    # -------- RSI --------
-    for n in [6, 14, 21]:
-        delta = df['close'].diff()
-        gain = delta.clip(lower=0).rolling(n).mean()
-        loss = (-delta.clip(upper=0)).rolling(n).mean()
-        rs = gain / loss.replace(0, np.nan)
-        df[f'rsi{n}'] = 100 - 100 / (1 + rs)
-
-    # -------- Bollinger Bands --------
-    for n in [20]:
-        mid = df['close'].rolling(n).mean()
-        std = df['close'].rolling(n).std()
-        df[f'bb_mid{n}'] = mid
-        df[f'bb_upper{n}'] = mid + 2 * std
-        df[f'bb_lower{n}'] = mid - 2 * std
-        df[f'bb_pct{n}'] = (df['close'] - df[f'bb_lower{n}']) / (df[f'bb_upper{n}'] - df[f'bb_lower{n}'])
-        df[f'bb_width{n}'] = (df[f'bb_upper{n}'] - df[f'bb_lower{n}']) / mid
-
-    # -------- ATR (波动率) --------
-    for n in [14]:
-        high_low = df['high'] - df['low']
-        high_close = (df['high'] - df['close'].shift()).abs()
-        low_close  = (df['low']  - df['close'].shift()).abs()
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        df[f'atr{n}'] = tr.rolling(n).mean()
-        df[f'atr_pct{n}'] = df[f'atr{n}'] / df['close']  # 相对ATR
-
-    # -------- KDJ --------
-    low_n  = df['low'].rolling(9).min()
-    high_n = df['high'].rolling(9).max()
-    rsv = (df['close'] - low_n) / (high_n - low_n + 1e-9) * 100
-    df['kdj_k'] = rsv.ewm(com=2, adjust=False).mean()
-    df['kdj_d'] = df['kdj_k'].ewm(com=2, adjust=False).mean()
-    df['kdj_j'] = 3 * df['kdj_k'] - 2 * df['kdj_d']
-
-    # -------- Volume 指标 --------
-    df['vol_ma5']  = df['volume'].rolling(5).mean()
-    df['vol_ma20'] = df['volume'].rolling(20).mean()
-    df['vol_ratio'] = df['volume'] / df['vol_ma20']  # 量比
-
-    # -------- 价格位置 --------
-    df['high_52w'] = df['high'].rolling(252).max()
-    df['low_52w']  = df['low'].rolling(252).min()
-    df['pct_from_52w_high'] = (df['close'] - df['high_52w']) / df['high_52w']
-    df['pct_from_52w_low']  = (df['close'] - df['low_52w'])  / df['low_52w']
-
-    # -------- 涨跌幅 --------
-    for n in [1, 3, 5, 10, 20]:
-        df[f'ret_{n}d'] = df['close'].pct_change(n)
-
-    # -------- 趋势判断 --------
-    df['above_ma20']  = (df['close'] > df['ma20']).astype(int)
-    df['above_ma50']  = (df['close'] > df['ma50']).astype(int)
-    df['above_ma200'] = (df['close'] > df['ma200']).astype(int)
-    df['ma20_slope']  = df['ma20'].diff(5) / df['ma20'].shift(5)   # MA20 斜率
-
-    # -------- K线形态 --------
-    df['is_gap_up']   = (df['open'] > df['close'].shift(1)).astype(int)
-    df['is_gap_down']  = (df['open'] < df['close'].shift(1)).astype(int)
-    body = (df['close'] - df['open']).abs()
-    candle_range = df['high'] - df['low']
-    df['body_ratio'] = body / (candle_range + 1e-9)  # 实体占比
 
+_spec('atr14', ['_tr'])(lambda c: c['_tr'].rolling(14).mean())
+_spec('atr_pct14', ['atr14', 'close'])(lambda c: c['atr14'] / c['close'])  # 相对ATR
+
+
+# -------- KDJ --------
+@_spec('_rsv', ['close', 'high', 'low'])
+def _rsv(c):
+    low_n  = c['low'].rolling(9).min()
+    high_n = c['high'].rolling(9).max()
+    return (c['close'] - low_n) / (high_n - low_n + 1e-9) * 100
+
+
+_spec('kdj_k', ['_rsv'])(lambda c: c['_rsv'].ewm(com=2, adjust=False).mean())
+_spec('kdj_d', ['kdj_k'])(lambda c: c['kdj_k'].ewm(com=2, adjust=False).mean())
+_spec('kdj_j', ['kdj_k', 'kdj_d'])(lambda c: 3 * c['kdj_k'] - 2 * c['kdj_d'])
+
+# -------- Volume 指标 --------
+_spec('vol_ma5', ['volume'])(lambda c: c['volume'].rolling(5).mean())
+_spec('vol_ma20', ['volume'])(lambda c: c['volume'].rolling(20).mean())
+_spec('vol_ratio', ['volume', 'vol_ma20'])(lambda c: c['volume'] / c['vol_ma20'])  # 量比
+
+# -------- 价格位置 --------
+_spec('high_52w', ['high'])(lambda c: c['high'].rolling(252).max())
+_spec('low_52w', ['low'])(lambda c: c['low'].rolling(252).min())
+_spec('pct_from_52w_high', ['close', 'high_52w'])(lambda c: (c['close'] - c['high_52w']) / c['high_52w'])
+_spec('pct_from_52w_low', ['close', 'low_52w'])(lambda c: (c['close'] - c['low_52w']) / c['low_52w'])
+
+# -------- 涨跌幅 --------
+for _n in [1, 3, 5, 10, 20]:
+    _spec(f'ret_{_n}d', ['close'])(lambda c, n=_n: c['close'].pct_change(n))
+
+# -------- 趋势判断 --------
+for _n in [20, 50, 200]:
+    _spec(f'above_ma{_n}', ['close', f'ma{_n}'])(lambda c, n=_n: (c['close'] > c[f'ma{n}']).astype(int))
+_spec('ma20_slope', ['ma20'])(lambda c: c['ma20'].diff(5) / c['ma20'].shift(5))   # MA20 斜率
+
+# -------- K线形态 --------
+_spec('is_gap_up', ['open', 'close'])(lambda c: (c['open'] > c['close'].shift(1)).astype(int))
+_spec('is_gap_down', ['open', 'close'])(lambda c: (c['open'] < c['close'].shift(1)).astype(int))
+_spec('body_ratio', ['open', 'close', 'high', 'low'])(
+    lambda c: (c['close'] - c['open']).abs() / (c['high'] - c['low'] + 1e-9))  # 实体占比
+
+# add_all_indicators 的输出列（顺序即登记顺序，不含内部中间量）
+ALL_COLUMNS: List[str] = [k for k in INDICATOR_SPECS if not k.startswith('_')]
+
+
+def resolve_indicators(needs: Iterable[str]) -> List[str]:
+    """needs 及其全部依赖，按计算顺序（依赖在前）返回；OHLCV 等原始列不在其中。
+
+    未登记的列名抛 KeyError。
+    """
+    order: List[str] = []
+    seen = set()
+
+    def visit(name: str):
+        if name in seen:
+            return
+        if name not in INDICATOR_SPECS:
+            if name in OHLCV:
+                return
+            raise KeyError(f"unknown indicator: {name}")
+        seen.add(name)
+        for dep in INDICATOR_SPECS[name][0]:
+            visit(dep)
+        order.append(name)
+
+    for name in needs:
+        visit(name)
+    return order
+
+
+def compute_indicators(df: pd.DataFrame, needs: Iterable[str], engine: str = 'pandas') -> pd.DataFrame:
+    """只计算 needs（及其依赖）的指标列
+
+    - 返回 df 的副本，新增 needs 以及它依赖的公开列（按 ALL_COLUMNS 顺序）
+    - 数值与 add_all_indicators 相同列完全一致
+    - engine 同 add_all_indicators
+    """
+    plan = resolve_indicators(needs)
+    wanted = set(plan)
+    out_cols = [c for c in ALL_COLUMNS if c in wanted]
+
+    if engine == 'numpy':
+        from analyzer.indicators_np import add_all_indicators_np
+        return add_all_indicators_np(df, columns=out_cols)
+    if engine != 'pandas':
+        raise ValueError(f"unsupported engine: {engine}")
+
+    df = df.copy()
+    cols = {c: df[c] for c in OHLCV if c in df.columns}
+    for name in plan:
+        deps, fn = INDICATOR_SPECS[name]
+        cols[name] = fn(cols)
+    for name in out_cols:
+        df[name] = cols[name]
     return df
 
 
+def add_all_indicators(df: pd.DataFrame, engine: str = 'pandas') -> pd.DataFrame:
+    """在 OHLCV DataFrame 上添加所有常用技术指标
+
+    engine:
+      - 'pandas'（默认，参考实现）
+      - 'numpy'：单次向量化内核（analyzer.indicators_np），列名/顺序一致，适合全量扫描
+    """
+    return compute_indicators(df, needs=ALL_COLUMNS, engine=engine)
+
+
 def add_crossover_signals(df: pd.DataFrame) -> pd.DataFrame:
     """添加金叉/死叉信号"""
     df = df.copy()
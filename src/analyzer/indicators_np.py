@@ -0,0 +1,273 @@
+"""NumPy indicator kernel (engine='numpy' of add_all_indicators)
+
+Why
+- The pandas path makes ~60 rolling/ewm passes, each allocating a full-length Series,
+  and recomputes close.diff() for every RSI window.
+- This kernel works on contiguous float64 arrays: one shared diff / true range,
+  cumulative-sum rolling means, block prefix/suffix rolling max/min (van Herk / Gil-Werman),
+  and a single sliding-window pass for the Bollinger std.
+
+Shape
+- Every input array is (T,) for one ticker or (T, N) for N tickers laid out column-wise.
+  Rows are bars (axis 0). Leading NaN (shorter histories in a panel) are handled like pandas:
+  a rolling value is NaN unless all `n` values in its window are present.
+
+Parity
+- Same column names / order / dtypes as the pandas path.
+- EMA/MACD/KDJ and rolling max/min match exactly; cumulative-sum means and the std
+  differ by float rounding only: |a - b| <= TOLERANCE * max(1, |b|).
+- Windows of identical closes (halted / illiquid names): std is exactly 0 here, so
+  bb_pct20 is NaN, while pandas may return rounding noise for the std and bb_pct20 = 0.5.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+TOLERANCE = 1e-6
+
+MA_WINDOWS = [5, 10, 20, 50, 120, 200]
+RSI_WINDOWS = [6, 14, 21]
+RET_WINDOWS = [1, 3, 5, 10, 20]
+
+
+def _shift(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+    return out
+
+
+def _first_valid(x: np.ndarray, valid: np.ndarray):
+    """First finite value per column (0 for all-NaN columns)."""
+    first = np.argmax(valid, axis=0)
+    if x.ndim == 1:
+        v = x[first]
+    else:
+        v = np.take_along_axis(x, first[None, ...], axis=0)[0]
+    return np.nan_to_num(v, nan=0.0)
+
+
+def _constant_windows(x: np.ndarray, n: int) -> np.ndarray:
+    """Mask (rows n-1..T-1) of windows whose n values are all equal.
+
+    pandas returns the exact value (mean) / exactly 0 (std) for such windows;
+    RSI relies on it to map an all-zero loss window to NaN.
+    """
+    same = np.concatenate([np.zeros((1,) + x.shape[1:], dtype=bool), x[1:] == x[:-1]])
+    cs = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(same, axis=0, dtype=float)])
+    # pairs (j-1, j) for j in (i-n+1, i]
+    return (cs[n:] - cs[1:len(x) - n + 2]) == n - 1
+
+
+def _rolling_mean(x: np.ndarray, n: int) -> np.ndarray:
+    """Rolling mean via cumulative sums; NaN unless the whole window is present.
+
+    Values are anchored on their first valid row before summing to keep the
+    cumulative sums small.
+    """
+    valid = np.isfinite(x)
+    anchor = _first_valid(x, valid)
+    y = np.where(valid, x - anchor, 0.0)
+
+    zero = np.zeros((1,) + x.shape[1:])
+    cs = np.concatenate([zero, np.cumsum(y, axis=0)])
+    cnt = np.concatenate([zero, np.cumsum(valid, axis=0, dtype=float)])
+
+    out = np.full(x.shape, np.nan)
+    if len(x) < n:
+        return out
+    s = cs[n:] - cs[:-n]
+    c = cnt[n:] - cnt[:-n]
+    m = np.where(_constant_windows(x, n), x[n - 1:], s / n + anchor)
+    out[n - 1:] = np.where(c == n, m, np.nan)
+    return out
+
+
+def _rolling_std(x: np.ndarray, n: int) -> np.ndarray:
+    """Sample std (ddof=1) over a sliding window (two-pass per window, numerically stable)."""
+    out = np.full(x.shape, np.nan)
+    if len(x) < n:
+        return out
+    w = np.lib.stride_tricks.sliding_window_view(x, n, axis=0)
+    out[n - 1:] = np.where(_constant_windows(x, n), 0.0, w.std(axis=-1, ddof=1))
+    return out
+
+
+def _rolling_extreme(x: np.ndarray, n: int, op) -> np.ndarray:
+    """Rolling max/min in O(T) with block prefix/suffix accumulation (van Herk / Gil-Werman)."""
+    out = np.full(x.shape, np.nan)
+    T = len(x)
+    if T < n:
+        return out
+    fill = -np.inf if op is np.maximum else np.inf
+    valid = np.isfinite(x)
+    xv = np.where(valid, x, fill)
+
+    pad = (-T) % n
+    if pad:
+        xv = np.concatenate([xv, np.full((pad,) + x.shape[1:], fill)])
+    blocks = xv.reshape((-1, n) + x.shape[1:])
+    prefix = op.accumulate(blocks, axis=1).reshape(xv.shape)
+    suffix = op.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(xv.shape)
+
+    res = op(suffix[:T - n + 1], prefix[n - 1:T])
+    cnt = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(valid, axis=0, dtype=float)])
+    full = (cnt[n:] - cnt[:-n]) == n
+    out[n - 1:] = np.where(full, res, np.nan)
+    return out
+
+
+def _ewm(x: np.ndarray, **kwargs) -> np.ndarray:
+    """adjust=False EWM along axis 0 (pandas' Cython recursion, all columns in one call)."""
+    if x.ndim == 1:
+        return pd.Series(x).ewm(adjust=False, **kwargs).mean().to_numpy()
+    return pd.DataFrame(x).ewm(adjust=False, **kwargs).mean().to_numpy()
+
+
+def compute_indicator_arrays(
+    open_: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    columns: Optional[Iterable[str]] = None,
+) -> Dict[str, np.ndarray]:
+    """Return {column: array} for the add_all_indicators column set, in the same order.
+
+    columns: only compute these (dependencies such as ma20 for bb_* are computed but not
+    returned); None = all.
+    """
+    o = np.asarray(open_, dtype=np.float64)
+    h = np.asarray(high, dtype=np.float64)
+    l = np.asarray(low, dtype=np.float64)
+    c = np.asarray(close, dtype=np.float64)
+    v = np.asarray(volume, dtype=np.float64)
+
+    want = None if columns is None else set(columns)
+
+    def need(*names: str) -> bool:
+        return want is None or any(n in want for n in names)
+
+    ma: Dict[int, np.ndarray] = {}
+
+    def ma_of(n: int) -> np.ndarray:
+        if n not in ma:
+            ma[n] = _rolling_mean(c, n)
+        return ma[n]
+
+    cols: Dict[str, np.ndarray] = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # -------- 均线 --------
+        for n in MA_WINDOWS:
+            if need(f'ma{n}'):
+                cols[f'ma{n}'] = ma_of(n)
+            if need(f'ema{n}'):
+                cols[f'ema{n}'] = _ewm(c, span=n)
+
+        # -------- MACD --------
+        if need('macd', 'macd_signal', 'macd_hist'):
+            macd = _ewm(c, span=12) - _ewm(c, span=26)
+            sig = _ewm(macd, span=9)
+            cols['macd'] = macd
+            cols['macd_signal'] = sig
+            cols['macd_hist'] = macd - sig
+
+        # -------- RSI（共享一次 diff）--------
+        prev_c = _shift(c, 1)
+        rsi_n = [n for n in RSI_WINDOWS if need(f'rsi{n}')]
+        if rsi_n:
+            delta = c - prev_c
+            gain = np.where(np.isnan(delta), np.nan, np.maximum(delta, 0.0))
+            loss = np.where(np.isnan(delta), np.nan, -np.minimum(delta, 0.0))
+            for n in rsi_n:
+                g = _rolling_mean(gain, n)
+                ls = _rolling_mean(loss, n)
+                rs = g / np.where(ls == 0, np.nan, ls)
+                cols[f'rsi{n}'] = 100 - 100 / (1 + rs)
+
+        # -------- Bollinger Bands --------
+        if need('bb_mid20', 'bb_upper20', 'bb_lower20', 'bb_pct20', 'bb_width20'):
+            mid = ma_of(20)
+            std = _rolling_std(c, 20)
+            upper = mid + 2 * std
+            lower = mid - 2 * std
+            cols['bb_mid20'] = mid
+            cols['bb_upper20'] = upper
+            cols['bb_lower20'] = lower
+            cols['bb_pct20'] = (c - lower) / (upper - lower)
+            cols['bb_width20'] = (upper - lower) / mid
+
+        # -------- ATR（共享一次 true range）--------
+        if need('atr14', 'atr_pct14'):
+            tr = np.fmax(np.fmax(h - l, np.abs(h - prev_c)), np.abs(l - prev_c))
+            atr = _rolling_mean(tr, 14)
+            cols['atr14'] = atr
+            cols['atr_pct14'] = atr / c
+
+        # -------- KDJ --------
+        if need('kdj_k', 'kdj_d', 'kdj_j'):
+            low_n = _rolling_extreme(l, 9, np.minimum)
+            high_n = _rolling_extreme(h, 9, np.maximum)
+            rsv = (c - low_n) / (high_n - low_n + 1e-9) * 100
+            k = _ewm(rsv, com=2)
+            d = _ewm(k, com=2)
+            cols['kdj_k'] = k
+            cols['kdj_d'] = d
+            cols['kdj_j'] = 3 * k - 2 * d
+
+        # -------- Volume 指标 --------
+        if need('vol_ma5', 'vol_ma20', 'vol_ratio'):
+            vol_ma20 = _rolling_mean(v, 20)
+            cols['vol_ma5'] = _rolling_mean(v, 5)
+            cols['vol_ma20'] = vol_ma20
+            cols['vol_ratio'] = v / vol_ma20
+
+        # -------- 价格位置 --------
+        if need('high_52w', 'low_52w', 'pct_from_52w_high', 'pct_from_52w_low'):
+            hi52 = _rolling_extreme(h, 252, np.maximum)
+            lo52 = _rolling_extreme(l, 252, np.minimum)
+            cols['high_52w'] = hi52
+            cols['low_52w'] = lo52
+            cols['pct_from_52w_high'] = (c - hi52) / hi52
+            cols['pct_from_52w_low'] = (c - lo52) / lo52
+
+        # -------- 涨跌幅 --------
+        for n in RET_WINDOWS:
+            if need(f'ret_{n}d'):
+                cols[f'ret_{n}d'] = c / _shift(c, n) - 1
+
+        # -------- 趋势判断 --------
+        for n in (20, 50, 200):
+            if need(f'above_ma{n}'):
+                cols[f'above_ma{n}'] = (c > ma_of(n)).astype(np.int64)
+        if need('ma20_slope'):
+            ma20_s5 = _shift(ma_of(20), 5)
+            cols['ma20_slope'] = (ma_of(20) - ma20_s5) / ma20_s5
+
+        # -------- K线形态 --------
+        if need('is_gap_up', 'is_gap_down', 'body_ratio'):
+            cols['is_gap_up'] = (o > prev_c).astype(np.int64)
+            cols['is_gap_down'] = (o < prev_c).astype(np.int64)
+            cols['body_ratio'] = np.abs(c - o) / (h - l + 1e-9)
+
+    if want is None:
+        return cols
+    return {k: cols[k] for k in cols if k in want}
+
+
+def add_all_indicators_np(df: pd.DataFrame, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """DataFrame wrapper: same output as the pandas add_all_indicators (or compute_indicators)."""
+    cols = compute_indicator_arrays(
+        df['open'].to_numpy(dtype=np.float64),
+        df['high'].to_numpy(dtype=np.float64),
+        df['low'].to_numpy(dtype=np.float64),
+        df['close'].to_numpy(dtype=np.float64),
+        df['volume'].to_numpy(dtype=np.float64),
+        columns=columns,
+    )
+    base = df.drop(columns=[c for c in cols if c in df.columns])
+    return pd.concat([base, pd.DataFrame(cols, index=df.index)], axis=1)
@@ -0,0 +1,126 @@
+"""Panel indicator engine (all tickers in one vectorized pass)
+
+Goal
+- Scans loop ticker by ticker: one small frame -> one pandas indicator pipeline -> one row.
+  For a 500-name universe that is ~500 small pipelines.
+- Stack every ticker into (T, N) arrays and run the NumPy kernel (analyzer.indicators_np)
+  once, so each indicator is a handful of large array operations.
+
+Layout
+- Right-aligned by bar position, not by timestamp: column j holds the last T bars of
+  ticker j, shorter histories are NaN-padded at the top. The kernel treats leading NaN like
+  a shorter series, so each column equals the per-ticker result (within
+  indicators_np.TOLERANCE) and no ticker's rolling windows see another ticker's gaps.
+- Bar timestamps are kept per cell in `index` (NaT for padding).
+
+Usage
+  from analyzer.panel import compute_panel
+  panel = compute_panel(frames, needs=SCORE_SIGNAL_NEEDS)   # frames: {ticker: OHLCV df}
+  latest = panel.latest()              # one row per ticker (what score_signal consumes)
+  row = panel.latest_row('TSLA')       # pd.Series, name = bar time
+  df = panel.frame('TSLA')             # per-ticker enriched frame (stabilization / structure)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analyzer.indicators import ALL_COLUMNS, OHLCV, resolve_indicators
+from analyzer.indicators_np import compute_indicator_arrays
+
+
+@dataclass
+class IndicatorPanel:
+    tickers: List[str]
+    index: np.ndarray               # (T, N) datetime64[ns], NaT = padding
+    lengths: np.ndarray             # (N,) valid bars per ticker
+    columns: Dict[str, np.ndarray]  # OHLCV + indicators, each (T, N)
+
+    def _pos(self, ticker: str) -> int:
+        try:
+            return self.tickers.index(ticker)
+        except ValueError:
+            raise KeyError(ticker) from None
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        """Enriched frame of one ticker (padding dropped)."""
+        j = self._pos(ticker)
+        start = len(self.index) - int(self.lengths[j])
+        idx = pd.DatetimeIndex(self.index[start:, j])
+        return pd.DataFrame({c: a[start:, j] for c, a in self.columns.items()}, index=idx)
+
+    def latest_row(self, ticker: str) -> pd.Series:
+        """Last bar of one ticker; Series.name is the bar time (like df.iloc[-1])."""
+        j = self._pos(ticker)
+        s = pd.Series({c: a[-1, j] for c, a in self.columns.items()})
+        s.name = pd.Timestamp(self.index[-1, j])
+        return s
+
+    def latest(self) -> pd.DataFrame:
+        """Last bar of every ticker: index = ticker, plus a bar_time column."""
+        out = pd.DataFrame({c: a[-1] for c, a in self.columns.items()}, index=pd.Index(self.tickers, name='ticker'))
+        out.insert(0, 'bar_time', pd.DatetimeIndex(self.index[-1]))
+        return out
+
+
+def build_panel(frames: Dict[str, pd.DataFrame], bars: Optional[int] = None):
+    """Right-align OHLCV frames into (T, N) arrays.
+
+    bars: keep only the last `bars` bars per ticker (None = longest history). Trimming
+    shortens the EMA warm-up, so EMA/MACD/KDJ then differ from the full-history values.
+
+    Returns (tickers, index, lengths, {ohlcv column: (T, N) array}).
+    """
+    items = [(t, df) for t, df in frames.items() if df is not None and not df.empty]
+    tickers = [t for t, _ in items]
+    T = max((len(df) for _, df in items), default=0)
+    if bars is not None:
+        T = min(T, int(bars))
+    N = len(items)
+
+    index = np.full((T, N), np.datetime64('NaT'), dtype='datetime64[ns]')
+    lengths = np.zeros(N, dtype=np.int64)
+    cols = {c: np.full((T, N), np.nan) for c in OHLCV}
+    for j, (_, df) in enumerate(items):
+        tail = df.iloc[-T:] if T else df.iloc[:0]
+        n = len(tail)
+        lengths[j] = n
+        if not n:
+            continue
+        index[T - n:, j] = pd.DatetimeIndex(tail.index).to_numpy(dtype='datetime64[ns]')
+        for c in OHLCV:
+            cols[c][T - n:, j] = tail[c].to_numpy(dtype=np.float64)
+    return tickers, index, lengths, cols
+
+
+def compute_panel(
+    frames: Dict[str, pd.DataFrame],
+    needs: Optional[Iterable[str]] = None,
+    bars: Optional[int] = None,
+) -> IndicatorPanel:
+    """Compute indicators for every ticker at once.
+
+    frames: {ticker: DataFrame with lowercase OHLCV columns and a sorted DatetimeIndex}
+    needs: indicator columns (+ their dependencies), as in compute_indicators; None = all.
+    """
+    tickers, index, lengths, ohlcv = build_panel(frames, bars=bars)
+    if needs is None:
+        out_cols = list(ALL_COLUMNS)
+    else:
+        wanted = set(resolve_indicators(needs))
+        out_cols = [c for c in ALL_COLUMNS if c in wanted]
+
+    columns: Dict[str, np.ndarray] = dict(ohlcv)
+    if len(index) and tickers:
+        arrays = compute_indicator_arrays(
+            ohlcv['open'], ohlcv['high'], ohlcv['low'], ohlcv['close'], ohlcv['volume'],
+            columns=out_cols,
+        )
+        columns.update(arrays)
+    else:
+        columns.update({c: np.full(index.shape, np.nan) for c in out_cols})
+    return IndicatorPanel(tickers=tickers, index=index, lengths=lengths, columns=columns)
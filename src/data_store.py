@@ -5,45 +5,143 @@ Goal
 - Make scans/backtests fast and reproducible.
 
 Storage
-- data/store/{interval}/{TICKER}.parquet
+- data/store/{interval}/parts/{TICKER}/  (partitioned layout, default for new tickers)
+  - month=YYYY-MM.parquet       compacted monthly partitions
+  - delta-{ns}.parquet          append-only deltas: only the rows a sync added or changed
+  - _synced                     marker, its mtime is the last sync write (freshness check)
+- data/store/{interval}/{TICKER}.parquet  (legacy flat layout, rewritten in full per sync)
   - interval: "1h" or "1d"
   - columns: open, high, low, close, volume (+ optional dividends/splits)
   - index: naive timestamp (tz removed)
+- load_local reads either layout: months then deltas in write order, later rows win.
+- compact() folds deltas into the months they touch (automatic after cfg.compact_after deltas,
+  or periodically via jobs/compact_store.py); migrate() converts a flat file to partitions.
 
 Design choices
 - Append-only with de-dup by index.
-- Sync fetches a sliding calendar window (default 60d) and merges.
+- Freshness policy (market_calendar): if the latest *closed* bar is stored and the file was
+  written after that bar closed, sync makes no network call at all. Otherwise it fetches only
+  the tail from the last stored bar (small overlap). A tail whose overlap disagrees with the
+  stored bars (dividend/split re-adjustment) triggers one full `lookback_days` refetch.
+- Without local data (or freshness=False) sync fetches a sliding calendar window (default 60d).
 - For 1H, yfinance only offers ~730d rolling, but by running sync daily we can accumulate >2y.
+- sync_many: thread pool + shared token-bucket rate limit + jittered retry, and one
+  yf.download per group of tickers that need the same window.
 
 Usage
-  from data_store import load_local, sync_and_load
+  from data_store import load_local, sync_and_load, sync_many, compact, migrate
   df = sync_and_load('TSLA', interval='1h', lookback_days=60)
+  results = sync_many(WATCHLIST, interval='1h', lookback_days=120)   # {ticker: SyncResult}
+  print(format_sync_stats())   # fetches skipped / bytes fetched / rows merged since reset_sync_stats()
 """
 
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Optional
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import pandas as pd
 import yfinance as yf
 
+from frame_cache import FRAME_CACHE, cached
+from market_calendar import latest_closed_bar, utc_now
+
+# tail fetch starts this many days before the last stored bar (overlap for re-adjust check)
+TAIL_OVERLAP_DAYS = 4
+# relative close difference on overlapping bars that counts as a re-adjusted history
+READJUST_TOL = 1e-4
+
+
+# partitioned layout
+PARTS_DIR = "parts"
+MONTH_PREFIX = "month="
+DELTA_PREFIX = "delta-"
+SYNCED_MARKER = "_synced"
+# fold deltas into monthly partitions once this many have piled up (0 = only on compact())
+COMPACT_AFTER_DELTAS = 48
+
 
 @dataclass
 class StoreConfig:
     base_dir: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "store")
+    # "auto": keep whatever layout a ticker already has, partitioned for new tickers
+    layout: str = "auto"
+    compact_after: int = COMPACT_AFTER_DELTAS
 
 
-def _path(cfg: StoreConfig, ticker: str, interval: str) -> str:
+def _safe(ticker: str) -> str:
+    return ticker.replace("/", "_").replace(":", "_")
+
+
+def _interval_dir(cfg: StoreConfig, interval: str) -> str:
     interval = interval.lower()
     if interval not in {"1h", "1d"}:
         raise ValueError(f"unsupported interval: {interval}")
     d = os.path.join(cfg.base_dir, interval)
     os.makedirs(d, exist_ok=True)
-    safe = ticker.replace("/", "_").replace(":", "_")
-    return os.path.join(d, f"{safe}.parquet")
+    return d
+
+
+def _path(cfg: StoreConfig, ticker: str, interval: str) -> str:
+    """Flat (legacy) file: data/store/{interval}/{TICKER}.parquet"""
+    return os.path.join(_interval_dir(cfg, interval), f"{_safe(ticker)}.parquet")
+
+
+def _part_dir(cfg: StoreConfig, ticker: str, interval: str) -> str:
+    """Partition directory: data/store/{interval}/parts/{TICKER}/ (not created)."""
+    return os.path.join(_interval_dir(cfg, interval), PARTS_DIR, _safe(ticker))
+
+
+def _layout(cfg: StoreConfig, ticker: str, interval: str) -> str:
+    """'flat' or 'partitioned' for this ticker under cfg.layout."""
+    if cfg.layout in {"flat", "partitioned"}:
+        return cfg.layout
+    if cfg.layout != "auto":
+        raise ValueError(f"unsupported layout: {cfg.layout}")
+    if os.path.isdir(_part_dir(cfg, ticker, interval)):
+        return "partitioned"
+    if os.path.exists(_path(cfg, ticker, interval)):
+        return "flat"
+    return "partitioned"
+
+
+def _partition_files(d: str) -> Tuple[List[str], List[str]]:
+    """(month files, delta files) in read order; deltas sort by write time."""
+    if not os.path.isdir(d):
+        return [], []
+    names = sorted(os.listdir(d))
+    months = [os.path.join(d, n) for n in names if n.startswith(MONTH_PREFIX) and n.endswith(".parquet")]
+    deltas = [os.path.join(d, n) for n in names if n.startswith(DELTA_PREFIX) and n.endswith(".parquet")]
+    return months, deltas
+
+
+def _write_atomic(df: pd.DataFrame, p: str) -> int:
+    """Write parquet via tmp file + rename (readers never see a half-written file); returns bytes."""
+    tmp = f"{p}.tmp-{os.getpid()}-{threading.get_ident()}"
+    df.to_parquet(tmp)
+    os.replace(tmp, p)
+    return os.path.getsize(p)
+
+
+def _month_path(d: str, month: pd.Period) -> str:
+    return os.path.join(d, f"{MONTH_PREFIX}{month.strftime('%Y-%m')}.parquet")
+
+
+def _write_months(d: str, df: pd.DataFrame) -> int:
+    """Write df split by calendar month (one file per month present); returns bytes written."""
+    os.makedirs(d, exist_ok=True)
+    if df.empty:
+        return 0
+    written = 0
+    for month, part in df.groupby(df.index.to_period("M")):
+        written += _write_atomic(part, _month_path(d, month))
+    return written
 
 
 def _normalize(df: pd.DataFrame) -> pd.DataFrame:
@@ -64,28 +162,121 @@ def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def load_local(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> pd.DataFrame:
-    cfg = cfg or StoreConfig()
-    p = _path(cfg, ticker, interval)
-    if not os.path.exists(p):
-        return pd.DataFrame()
+def _read_frame(p: str) -> pd.DataFrame:
     df = pd.read_parquet(p)
     if "index" in df.columns and not isinstance(df.index, pd.DatetimeIndex):
         df = df.set_index("index")
     if not isinstance(df.index, pd.DatetimeIndex):
         df.index = pd.to_datetime(df.index)
+    return df
+
+
+def _read_partitioned(d: str) -> pd.DataFrame:
+    months, deltas = _partition_files(d)
+    frames = [_read_frame(p) for p in months + deltas]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, axis=0) if len(frames) > 1 else frames[0]
+    # deltas are read last, so a re-written bar (partial -> final) keeps its latest version
+    return df[~df.index.duplicated(keep="last")]
+
+
+def load_local(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None,
+               use_cache: bool = True) -> pd.DataFrame:
+    """Stored history of one ticker (either layout).
+
+    use_cache: serve repeated loads of unchanged data from frame_cache (keyed by
+    store_signature, so any write is a miss); bulk readers pass False.
+    """
+    cfg = cfg or StoreConfig()
+    if use_cache:
+        sig = store_signature(ticker, interval, cfg)
+        if sig is None:
+            return pd.DataFrame()
+        return cached(ticker, interval.lower(), (cfg.base_dir, sig), "ohlcv",
+                      lambda: load_local(ticker, interval, cfg, use_cache=False))
+    if _layout(cfg, ticker, interval) == "partitioned":
+        df = _read_partitioned(_part_dir(cfg, ticker, interval))
+        return df.sort_index() if not df.empty else df
+    p = _path(cfg, ticker, interval)
+    if not os.path.exists(p):
+        return pd.DataFrame()
+    df = _read_frame(p)
     df = df.sort_index()
     return df
 
 
 def save_local(ticker: str, df: pd.DataFrame, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> None:
+    """Replace the stored history of `ticker` with df (full rewrite, both layouts)."""
     cfg = cfg or StoreConfig()
+    if _layout(cfg, ticker, interval) == "partitioned":
+        d = _part_dir(cfg, ticker, interval)
+        old_months, old_deltas = _partition_files(d)
+        _write_months(d, df)
+        keep = {_month_path(d, m) for m in df.index.to_period("M").unique()} if not df.empty else set()
+        for p in old_deltas + [p for p in old_months if p not in keep]:
+            os.remove(p)
+        _touch_written(cfg, ticker, interval)
+        return
     p = _path(cfg, ticker, interval)
     df = df.copy()
     # parquet preserves index, but keep it explicit for safety
     df.to_parquet(p)
 
 
+def append_local(ticker: str, rows: pd.DataFrame, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> int:
+    """Append rows (new or changed bars) to the store; returns bytes written.
+
+    Partitioned: one small delta file, no existing partition is touched.
+    Flat: falls back to load + merge + full rewrite.
+    """
+    cfg = cfg or StoreConfig()
+    if rows is None or rows.empty:
+        return 0
+    if _layout(cfg, ticker, interval) == "flat":
+        existing = load_local(ticker, interval, cfg)
+        merged = pd.concat([existing, rows], axis=0) if not existing.empty else rows
+        merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+        save_local(ticker, merged, interval, cfg)
+        return os.path.getsize(_path(cfg, ticker, interval))
+    d = _part_dir(cfg, ticker, interval)
+    os.makedirs(d, exist_ok=True)
+    p = os.path.join(d, f"{DELTA_PREFIX}{time.time_ns():020d}-{os.getpid()}.parquet")
+    written = _write_atomic(rows.sort_index(), p)
+    _touch_written(cfg, ticker, interval)
+    _count(deltas_written=1)
+    if cfg.compact_after and len(_partition_files(d)[1]) >= cfg.compact_after:
+        compact(ticker, interval, cfg)
+    return written
+
+
+def _touch_written(cfg: StoreConfig, ticker: str, interval: str) -> None:
+    """Record a sync write (freshness check reads this time back via _written_at)."""
+    if _layout(cfg, ticker, interval) == "flat":
+        os.utime(_path(cfg, ticker, interval))
+        return
+    d = _part_dir(cfg, ticker, interval)
+    os.makedirs(d, exist_ok=True)
+    marker = os.path.join(d, SYNCED_MARKER)
+    with open(marker, "a"):
+        pass
+    os.utime(marker)
+
+
+def _changed_rows(existing: pd.DataFrame, merged: pd.DataFrame) -> pd.DataFrame:
+    """Rows of merged that are new or differ from existing (the delta a sync must persist)."""
+    if existing.empty:
+        return merged
+    common = merged.index.intersection(existing.index)
+    a = merged.loc[common]
+    b = existing.loc[common].reindex(columns=a.columns)
+    same = ((a == b) | (a.isna() & b.isna())).all(axis=1).to_numpy()
+    keep = ~merged.index.isin(existing.index)
+    keep[merged.index.get_indexer(common[~same])] = True
+    return merged[keep]
+
+
 def fetch_yf(ticker: str, interval: str, start: datetime, end: datetime, auto_adjust: bool = True) -> pd.DataFrame:
     df = yf.Ticker(ticker).history(
         start=start.strftime("%Y-%m-%d"),
@@ -96,6 +287,309 @@ def fetch_yf(ticker: str, interval: str, start: datetime, end: datetime, auto_ad
     return _normalize(df)
 
 
+def fetch_yf_batch(tickers: List[str], interval: str, start: datetime, end: datetime, auto_adjust: bool = True) -> Dict[str, pd.DataFrame]:
+    """One yf.download call for several tickers sharing the same window -> {ticker: normalized df}."""
+    raw = yf.download(
+        tickers,
+        start=start.strftime("%Y-%m-%d"),
+        end=end.strftime("%Y-%m-%d"),
+        interval=interval,
+        auto_adjust=auto_adjust,
+        group_by="ticker",
+        progress=False,
+        threads=True,
+    )
+    out: Dict[str, pd.DataFrame] = {}
+    if raw is None or raw.empty:
+        return out
+    if not isinstance(raw.columns, pd.MultiIndex):
+        if len(tickers) == 1:
+            out[tickers[0]] = _normalize(raw)
+        return out
+    level0 = set(raw.columns.get_level_values(0))
+    for t in tickers:
+        if t in level0:
+            out[t] = _normalize(raw[t])
+    return out
+
+
+def _effective_lookback(existing: pd.DataFrame, lookback_days: int, max_auto_lookback_days: int, gap_days_threshold: int) -> int:
+    """lookback_days, widened to cover a stale local gap (capped by max_auto_lookback_days)."""
+    effective_lookback = int(lookback_days)
+    if not existing.empty:
+        last_ts = pd.to_datetime(existing.index.max())
+        gap_days = (datetime.now() - last_ts.to_pydatetime()).days
+        if gap_days > gap_days_threshold:
+            # cover missing days + small buffer
+            effective_lookback = min(max_auto_lookback_days, max(effective_lookback, gap_days + 10))
+    return effective_lookback
+
+
+def _sync_window(effective_lookback: int) -> Tuple[datetime, datetime]:
+    end = datetime.now() + timedelta(days=1)  # yfinance end non-inclusive
+    start = end - timedelta(days=effective_lookback)
+    return start, end
+
+
+def _fetch_period(ticker: str, interval: str, effective_lookback: int, max_auto_lookback_days: int) -> pd.DataFrame:
+    """Period-based fetch, used when the start/end fetch returned nothing."""
+    try:
+        # yfinance 1h supports up to ~730d reliably; clamp period to 730d.
+        period_days = min(730, int(min(effective_lookback, max_auto_lookback_days)))
+        return _normalize(
+            yf.Ticker(ticker).history(
+                period=f"{period_days}d",
+                interval=interval,
+                auto_adjust=True,
+            )
+        )
+    except Exception:
+        return pd.DataFrame()
+
+
+# ---------------------------------------------------------------------------
+# I/O counters
+# ---------------------------------------------------------------------------
+
+_STATS_KEYS = ("fetches", "fetches_skipped", "rows_fetched", "bytes_fetched",
+               "rows_merged", "bytes_written", "files_unchanged", "readjusted",
+               "deltas_written", "compactions")
+_stats: Dict[str, int] = dict.fromkeys(_STATS_KEYS, 0)
+_stats_lock = threading.Lock()
+
+
+def _count(**kw: int) -> None:
+    with _stats_lock:
+        for k, v in kw.items():
+            _stats[k] += int(v)
+
+
+def sync_stats() -> Dict[str, int]:
+    """Process-wide sync counters since the last reset_sync_stats().
+
+    bytes_fetched is the in-memory size of the fetched frames (proxy for network payload);
+    bytes_written is the size of the parquet files actually written (a delta file for the
+    partitioned layout, the whole file for flat).
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_sync_stats() -> None:
+    with _stats_lock:
+        for k in _STATS_KEYS:
+            _stats[k] = 0
+
+
+def format_sync_stats(stats: Optional[Dict[str, int]] = None) -> str:
+    s = stats or sync_stats()
+    return "SYNC_STATS " + " ".join(f"{k}={s[k]}" for k in _STATS_KEYS)
+
+
+def _record_fetch(fetched: pd.DataFrame) -> None:
+    n = 0 if fetched is None else len(fetched)
+    b = 0 if not n else int(fetched.memory_usage(deep=True).sum())
+    _count(fetches=1, rows_fetched=n, bytes_fetched=b)
+
+
+# ---------------------------------------------------------------------------
+# Freshness policy
+# ---------------------------------------------------------------------------
+
+
+def _written_at(ticker: str, interval: str, cfg: StoreConfig) -> Optional[datetime]:
+    """Last sync write time (naive UTC): flat file mtime or the partition marker; None if missing."""
+    if _layout(cfg, ticker, interval) == "partitioned":
+        p = os.path.join(_part_dir(cfg, ticker, interval), SYNCED_MARKER)
+    else:
+        p = _path(cfg, ticker, interval)
+    if not os.path.exists(p):
+        return None
+    return datetime.fromtimestamp(os.path.getmtime(p), timezone.utc).replace(tzinfo=None)
+
+
+def _last_ts_in_file(p: str) -> Optional[pd.Timestamp]:
+    """Max index value of one parquet file from row-group statistics (falls back to a read)."""
+    try:
+        import json
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(p)
+        name = json.loads(pf.schema_arrow.metadata[b"pandas"])["index_columns"][0]
+        j = pf.schema_arrow.get_field_index(name)
+        stats = [pf.metadata.row_group(i).column(j).statistics for i in range(pf.metadata.num_row_groups)]
+        if stats and all(s is not None and s.has_min_max for s in stats):
+            return pd.Timestamp(max(s.max for s in stats))
+    except Exception:
+        pass
+    df = _read_frame(p)
+    return pd.Timestamp(df.index.max()) if not df.empty else None
+
+
+def store_signature(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> Optional[Tuple[pd.Timestamp, datetime]]:
+    """(last stored bar, last sync write) without loading the history; None if nothing stored.
+
+    Only file metadata is read (newest month + deltas for the partitioned layout). Derived
+    caches key on this: a new bar moves the timestamp, a re-written (partial) bar moves
+    the write time.
+    """
+    cfg = cfg or StoreConfig()
+    if _layout(cfg, ticker, interval) == "partitioned":
+        months, deltas = _partition_files(_part_dir(cfg, ticker, interval))
+        files = months[-1:] + deltas
+    else:
+        p = _path(cfg, ticker, interval)
+        files = [p] if os.path.exists(p) else []
+    stamps = [t for t in (_last_ts_in_file(p) for p in files) if t is not None]
+    written = _written_at(ticker, interval, cfg)
+    if not stamps or written is None:
+        return None
+    return max(stamps), written
+
+
+def is_fresh(ticker: str, existing: pd.DataFrame, interval: str, cfg: Optional[StoreConfig] = None,
+             now: Optional[datetime] = None) -> bool:
+    """True when the latest closed bar is stored and was written after that bar closed.
+
+    The write-time check matters for 1H: a bar stored mid-bar (partial) is not final until
+    the file is rewritten after the bar's close.
+    """
+    if existing is None or existing.empty:
+        return False
+    cfg = cfg or StoreConfig()
+    try:
+        bar_start, bar_end = latest_closed_bar(interval, now)
+    except Exception:
+        return False
+    written = _written_at(ticker, interval, cfg)
+    return (written is not None
+            and pd.Timestamp(existing.index.max()) >= pd.Timestamp(bar_start)
+            and written >= bar_end)
+
+
+def _tail_window(existing: pd.DataFrame, max_auto_lookback_days: int) -> Tuple[datetime, datetime]:
+    """From the last stored bar (minus overlap) to tomorrow, capped by max_auto_lookback_days."""
+    end = datetime.now() + timedelta(days=1)  # yfinance end non-inclusive
+    last_ts = pd.Timestamp(existing.index.max()).to_pydatetime()
+    start = max(last_ts - timedelta(days=TAIL_OVERLAP_DAYS), end - timedelta(days=max_auto_lookback_days))
+    return start, end
+
+
+def _readjusted(existing: pd.DataFrame, fetched: pd.DataFrame) -> bool:
+    """Overlapping closed bars moved -> yfinance re-adjusted history (dividend/split)."""
+    if existing.empty or fetched.empty or "close" not in fetched.columns:
+        return False
+    # the last stored bar may have been partial when written; don't compare it
+    common = fetched.index.intersection(existing.index[:-1])
+    if common.empty:
+        return False
+    old = existing.loc[common, "close"].astype(float)
+    new = fetched.loc[common, "close"].astype(float)
+    return bool(((new - old).abs() > READJUST_TOL * old.abs()).any())
+
+
+def _merge_save(ticker: str, existing: pd.DataFrame, fetched: pd.DataFrame, interval: str, cfg: StoreConfig) -> pd.DataFrame:
+    if fetched.empty and not existing.empty:
+        return existing
+    merged = pd.concat([existing, fetched], axis=0) if not existing.empty else fetched
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    new_rows = len(merged) - len(existing)
+    delta = _changed_rows(existing, merged)
+    if not existing.empty and delta.empty:
+        # nothing new: bump the write time so the freshness check sees this fetch, skip the write
+        _touch_written(cfg, ticker, interval)
+        _count(files_unchanged=1)
+        return existing
+    if _layout(cfg, ticker, interval) == "flat":
+        save_local(ticker, merged, interval, cfg)
+        written = os.path.getsize(_path(cfg, ticker, interval))
+    else:
+        written = append_local(ticker, delta, interval, cfg)
+    _count(rows_merged=new_rows, bytes_written=written)
+    sig = store_signature(ticker, interval, cfg)
+    if sig is not None:
+        # the next load_local of this ticker (e.g. a later scan phase) is then a cache hit
+        FRAME_CACHE.put((ticker, interval.lower(), (cfg.base_dir, sig), "ohlcv"), merged.copy(deep=False))
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# Compaction / migration
+# ---------------------------------------------------------------------------
+
+
+def compact(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> Dict[str, int]:
+    """Fold delta files into the monthly partitions they touch.
+
+    Months are written before deltas are removed, so an interrupted compaction only leaves
+    redundant deltas behind (they still win on read) and can simply be re-run.
+    Returns {"deltas": files folded, "months": partitions rewritten, "bytes": bytes written}.
+    """
+    cfg = cfg or StoreConfig()
+    d = _part_dir(cfg, ticker, interval)
+    _, deltas = _partition_files(d)
+    if not deltas:
+        return {"deltas": 0, "months": 0, "bytes": 0}
+    rows = pd.concat([_read_frame(p) for p in deltas], axis=0)
+    rows = rows[~rows.index.duplicated(keep="last")]
+    written = 0
+    months = 0
+    if not rows.empty:
+        for month, part in rows.groupby(rows.index.to_period("M")):
+            p = _month_path(d, month)
+            if os.path.exists(p):
+                part = pd.concat([_read_frame(p), part], axis=0)
+                part = part[~part.index.duplicated(keep="last")]
+            written += _write_atomic(part.sort_index(), p)
+            months += 1
+    for p in deltas:
+        os.remove(p)
+    _count(compactions=1)
+    return {"deltas": len(deltas), "months": months, "bytes": written}
+
+
+def migrate(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None, keep_flat: bool = False) -> int:
+    """Convert the flat {TICKER}.parquet into monthly partitions; returns rows migrated.
+
+    Rows already present in a partition directory win over the flat file. The flat file's
+    mtime carries over to the sync marker so the freshness check is not reset.
+    """
+    cfg = cfg or StoreConfig()
+    flat = _path(cfg, ticker, interval)
+    if not os.path.exists(flat):
+        return 0
+    df = _read_frame(flat)
+    d = _part_dir(cfg, ticker, interval)
+    parted = _read_partitioned(d)
+    if not parted.empty:
+        df = pd.concat([df, parted], axis=0)
+        df = df[~df.index.duplicated(keep="last")]
+    df = df.sort_index()
+    mtime = os.path.getmtime(flat)
+    save_local(ticker, df, interval, StoreConfig(base_dir=cfg.base_dir, layout="partitioned",
+                                                 compact_after=cfg.compact_after))
+    os.utime(os.path.join(d, SYNCED_MARKER), (mtime, mtime))
+    if not keep_flat:
+        os.remove(flat)
+    return len(df)
+
+
+def stored_tickers(interval: str = "1h", cfg: Optional[StoreConfig] = None) -> Dict[str, str]:
+    """{ticker: layout} for everything in the store (ticker = file-safe name)."""
+    cfg = cfg or StoreConfig()
+    base = _interval_dir(cfg, interval)
+    out: Dict[str, str] = {}
+    for n in sorted(os.listdir(base)):
+        if n.endswith(".parquet") and os.path.isfile(os.path.join(base, n)):
+            out[n[: -len(".parquet")]] = "flat"
+    parts = os.path.join(base, PARTS_DIR)
+    if os.path.isdir(parts):
+        for n in sorted(os.listdir(parts)):
+            if os.path.isdir(os.path.join(parts, n)):
+                out[n] = "partitioned"
+    return out
+
+
 def sync(
     ticker: str,
     interval: str = "1h",
@@ -103,9 +597,15 @@ def sync(
     cfg: Optional[StoreConfig] = None,
     max_auto_lookback_days: int = 730,
     gap_days_threshold: int = 7,
+    freshness: bool = True,
 ) -> pd.DataFrame:
     """Sync recent window from yfinance and merge into local parquet.
 
+    Freshness (freshness=True, local data present):
+    - Latest closed bar already stored -> return local data, no network call.
+    - Otherwise fetch only the tail since the last stored bar; a re-adjusted overlap
+      falls back to the full lookback window below.
+
     Auto-backfill:
     - If local data is stale (gap > gap_days_threshold), automatically increase lookback_days
       to cover the gap (capped by max_auto_lookback_days).
@@ -114,42 +614,29 @@ def sync(
     existing = load_local(ticker, interval, cfg)
 
     # decide lookback based on staleness
-    effective_lookback = int(lookback_days)
-    if not existing.empty:
-        last_ts = pd.to_datetime(existing.index.max())
-        gap_days = (datetime.now() - last_ts.to_pydatetime()).days
-        if gap_days > gap_days_threshold:
-            # cover missing days + small buffer
-            effective_lookback = min(max_auto_lookback_days, max(effective_lookback, gap_days + 10))
+    effective_lookback = _effective_lookback(existing, lookback_days, max_auto_lookback_days, gap_days_threshold)
 
-    end = datetime.now() + timedelta(days=1)  # yfinance end non-inclusive
-    start = end - timedelta(days=effective_lookback)
+    if freshness and not existing.empty:
+        if is_fresh(ticker, existing, interval, cfg):
+            _count(fetches_skipped=1)
+            return existing
+        start, end = _tail_window(existing, max_auto_lookback_days)
+        fetched = fetch_yf(ticker, interval, start=start, end=end)
+        _record_fetch(fetched)
+        if not _readjusted(existing, fetched):
+            return _merge_save(ticker, existing, fetched, interval, cfg)
+        _count(readjusted=1)
+
+    start, end = _sync_window(effective_lookback)
 
     fetched = fetch_yf(ticker, interval, start=start, end=end)
 
     # If start/end fetch returned empty (common for 1h on some tickers), fallback to period-based fetch.
     if fetched.empty:
-        try:
-            # yfinance supports 1h up to ~730d.
-            # yfinance 1h supports up to ~730d reliably; clamp period to 730d.
-            period_days = min(730, int(min(effective_lookback, max_auto_lookback_days)))
-            fetched = _normalize(
-                yf.Ticker(ticker).history(
-                    period=f"{period_days}d",
-                    interval=interval,
-                    auto_adjust=True,
-                )
-            )
-        except Exception:
-            pass
+        fetched = _fetch_period(ticker, interval, effective_lookback, max_auto_lookback_days)
+    _record_fetch(fetched)
 
-    if fetched.empty and not existing.empty:
-        return existing
-
-    merged = pd.concat([existing, fetched], axis=0) if not existing.empty else fetched
-    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
-    save_local(ticker, merged, interval, cfg)
-    return merged
+    return _merge_save(ticker, existing, fetched, interval, cfg)
 
 
 def sync_and_load(
@@ -160,3 +647,199 @@ def sync_and_load(
     **kwargs,
 ) -> pd.DataFrame:
     return sync(ticker, interval=interval, lookback_days=lookback_days, cfg=cfg, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Multi-ticker sync
+# ---------------------------------------------------------------------------
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens/sec, at most `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                need = (tokens - self._tokens) / self.rate
+            time.sleep(need)
+            waited += need
+
+
+@dataclass
+class SyncResult:
+    ticker: str
+    ok: bool = False
+    rows: int = 0
+    fetched_rows: int = 0
+    seconds: float = 0.0
+    attempts: int = 0
+    batched: bool = False
+    skipped: bool = False   # local data already fresh, no network call
+    error: str = ""
+    df: pd.DataFrame = field(default_factory=pd.DataFrame, repr=False)
+
+
+def _with_retry(fn, limiter: TokenBucket, retries: int, backoff: float, res: SyncResult):
+    """Call fn() under the rate limiter, retrying exceptions with jittered exponential backoff."""
+    last: Optional[Exception] = None
+    for attempt in range(max(1, retries)):
+        limiter.acquire()
+        res.attempts += 1
+        try:
+            return fn()
+        except Exception as e:
+            last = e
+            if attempt + 1 < retries:
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+    raise last
+
+
+def sync_many(
+    tickers: Iterable[str],
+    interval: str = "1h",
+    lookback_days: int = 60,
+    cfg: Optional[StoreConfig] = None,
+    max_auto_lookback_days: int = 730,
+    gap_days_threshold: int = 7,
+    max_workers: int = 8,
+    rate_per_sec: float = 4.0,
+    burst: int = 8,
+    retries: int = 3,
+    backoff: float = 1.0,
+    batch_size: int = 50,
+    fetcher: Optional[Callable[..., pd.DataFrame]] = None,
+    batch_fetcher: Optional[Callable[..., Dict[str, pd.DataFrame]]] = None,
+    freshness: bool = True,
+) -> Dict[str, SyncResult]:
+    """sync() for many tickers concurrently.
+
+    - Same freshness policy as sync(): fresh tickers are answered from disk, the rest fetch
+      only their tail window (which usually coincides across the watchlist -> one batch).
+    - Tickers whose gap resolves to the same (start, end) window are fetched together with
+      one batch_fetcher call (yf.download, up to batch_size tickers); tickers missing from
+      the batch result fall back to a per-ticker fetch.
+    - Per-ticker fetches run in a bounded thread pool (max_workers).
+    - Every network call takes a token from one shared bucket (rate_per_sec, burst) and is
+      retried with jittered exponential backoff on exceptions.
+    - fetcher(ticker, interval, start, end) / batch_fetcher(tickers, interval, start, end)
+      default to fetch_yf / fetch_yf_batch; pass stubs for offline runs.
+      batch_fetcher=False disables batching.
+
+    Returns {ticker: SyncResult} (result.df is the merged local history).
+    """
+    cfg = cfg or StoreConfig()
+    tickers = list(dict.fromkeys(tickers))
+    fetcher = fetcher or fetch_yf
+    if batch_fetcher is None:
+        batch_fetcher = fetch_yf_batch
+    limiter = TokenBucket(rate_per_sec, burst)
+    results = {t: SyncResult(ticker=t) for t in tickers}
+
+    # local state + windows (cheap, no network)
+    now = utc_now()
+    plan: Dict[str, Tuple[pd.DataFrame, int, datetime, datetime]] = {}
+    for t in tickers:
+        try:
+            existing = load_local(t, interval, cfg)
+        except Exception:
+            existing = pd.DataFrame()
+        lb = _effective_lookback(existing, lookback_days, max_auto_lookback_days, gap_days_threshold)
+        tail = freshness and not existing.empty
+        if tail and is_fresh(t, existing, interval, cfg, now=now):
+            r = results[t]
+            r.ok, r.skipped, r.df, r.rows = True, True, existing, len(existing)
+            _count(fetches_skipped=1)
+            continue
+        start, end = _tail_window(existing, max_auto_lookback_days) if tail else _sync_window(lb)
+        plan[t] = (existing, lb, start, end)
+    pending = [t for t in tickers if t in plan]
+
+    prefetched: Dict[str, pd.DataFrame] = {}
+
+    def run_batch(group: List[str]) -> None:
+        _, _, start, end = plan[group[0]]
+        probe = SyncResult(ticker=",".join(group))
+        try:
+            got = _with_retry(lambda: batch_fetcher(group, interval, start, end), limiter, retries, backoff, probe)
+        except Exception:
+            return
+        for t in group:
+            df = got.get(t) if got else None
+            if df is not None and not df.empty:
+                _record_fetch(df)
+                prefetched[t] = df
+                results[t].batched = True
+                results[t].attempts += probe.attempts
+
+    def run_one(t: str) -> None:
+        res = results[t]
+        t0 = time.perf_counter()
+        existing, lb, start, end = plan[t]
+        try:
+            fetched = prefetched.get(t)
+            if fetched is None:
+                fetched = _with_retry(lambda: fetcher(t, interval, start, end), limiter, retries, backoff, res)
+                if fetched.empty and fetcher is fetch_yf:
+                    limiter.acquire()
+                    fetched = _fetch_period(t, interval, lb, max_auto_lookback_days)
+                _record_fetch(fetched)
+            if _readjusted(existing, fetched):
+                # history re-adjusted upstream -> refetch the full lookback window
+                _count(readjusted=1)
+                s2, e2 = _sync_window(lb)
+                fetched = _with_retry(lambda: fetcher(t, interval, s2, e2), limiter, retries, backoff, res)
+                _record_fetch(fetched)
+            res.fetched_rows = len(fetched)
+            res.df = _merge_save(t, existing, fetched, interval, cfg)
+            res.rows = len(res.df)
+            res.ok = True
+        except Exception as e:
+            res.error = f"{type(e).__name__}: {e}"
+            res.df = existing
+            res.rows = len(existing)
+        res.seconds = time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers))) as ex:
+        if batch_fetcher:
+            groups: Dict[Tuple[datetime, datetime], List[str]] = {}
+            for t in pending:
+                _, _, start, end = plan[t]
+                # same calendar days -> same yfinance request window
+                groups.setdefault((start.date(), end.date()), []).append(t)
+            chunks = [g[i:i + batch_size] for g in groups.values() for i in range(0, len(g), max(1, batch_size))]
+            list(ex.map(run_batch, [c for c in chunks if len(c) > 1]))
+        list(ex.map(run_one, pending))
+
+    return results
+
+
+def format_sync_report(results: Dict[str, SyncResult]) -> str:
+    """One line per ticker + summary (rows, fetched rows, seconds, attempts, errors)."""
+    lines = []
+    for r in results.values():
+        status = "OK " if r.ok else "ERR"
+        src = "fresh" if r.skipped else ("batch" if r.batched else "single")
+        lines.append(f"{r.ticker:<8} {status} rows={r.rows:>6} fetched={r.fetched_rows:>5} "
+                     f"t={r.seconds:6.2f}s attempts={r.attempts} {src} {r.error}".rstrip())
+    failed = [r.ticker for r in results.values() if not r.ok]
+    skipped = sum(1 for r in results.values() if r.skipped)
+    lines.append(f"SYNC_SUMMARY tickers={len(results)} ok={len(results) - len(failed)} "
+                 f"skipped={skipped} failed={len(failed)}" + (f" ({','.join(failed)})" if failed else ""))
+    return "\n".join(lines)
@@ -0,0 +1,289 @@
+"""Consolidated multi-ticker OHLCV dataset (hive-partitioned parquet)
+
+Goal
+- The per-ticker store (data_store) is one directory/file per ticker, so universe-wide
+  reads ("last 300 bars of every name" for a panel scan, "all closes at X" for regime / RS)
+  open hundreds of files.
+- Keep an optional consolidated copy with a ticker column and read it through
+  pyarrow.dataset filters, so only the needed partitions, row groups and columns are read.
+
+Storage
+- data/store/dataset/interval={interval}/month=YYYY-MM/part-0.parquet
+  - columns: ticker, ts (naive timestamp = bar start), open, high, low, close, volume
+  - rows sorted by (ticker, ts), ROW_GROUP_ROWS per row group -> ticker / ts min-max
+    statistics let filters skip row groups; the month key skips whole partitions
+- Derived data: the per-ticker store stays the source of truth. consolidate() rebuilds the
+  months it is asked for (jobs/compact_store.py --consolidate, e.g. --since the last month).
+  Months are partitions (not days) to match data_store's monthly layout and keep 1H files
+  large enough to be worth a row-group index.
+
+Reads
+- load_panel(tickers, start, end, columns, bars=N) -> {ticker: df}, ready for
+  analyzer.panel.compute_panel. With bars and no start it reads months newest-first and stops
+  once every ticker has N bars.
+- load_cross_section(ts) -> one row per ticker: the bar at ts (exact=True) or the last bar at
+  or before ts.
+- Both fall back to data_store.load_local per ticker when the dataset has not been built.
+
+Usage
+  from dataset_store import consolidate, load_panel, load_cross_section
+  consolidate('1h', since='2026-09')
+  frames = load_panel(WATCHLIST, bars=300, columns=['close', 'volume'])
+  closes = load_cross_section('2026-03-02', interval='1d', columns=['close'])['close']
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from data_store import StoreConfig, load_local, stored_tickers
+
+DATASET_DIR = "dataset"
+COLUMNS = ["open", "high", "low", "close", "volume"]
+ROW_GROUP_ROWS = 8192
+
+
+def _dataset_dir(cfg: StoreConfig, interval: str) -> str:
+    interval = interval.lower()
+    if interval not in {"1h", "1d"}:
+        raise ValueError(f"unsupported interval: {interval}")
+    return os.path.join(cfg.base_dir, DATASET_DIR, f"interval={interval}")
+
+
+def _months(d: str) -> List[str]:
+    """Month keys present in the dataset, ascending."""
+    if not os.path.isdir(d):
+        return []
+    return sorted(n.split("=", 1)[1] for n in os.listdir(d)
+                  if n.startswith("month=") and os.path.isdir(os.path.join(d, n)))
+
+
+def has_dataset(interval: str = "1h", cfg: Optional[StoreConfig] = None) -> bool:
+    return bool(_months(_dataset_dir(cfg or StoreConfig(), interval)))
+
+
+def _schema():
+    import pyarrow as pa
+
+    return pa.schema([("ticker", pa.string()), ("ts", pa.timestamp("ns"))]
+                     + [(c, pa.float64()) for c in COLUMNS])
+
+
+def _open(d: str):
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+
+    part = pds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    return pds.dataset(d, format="parquet", partitioning=part, schema=_schema().append(pa.field("month", pa.string())))
+
+
+def _long(ticker: str, df: pd.DataFrame) -> pd.DataFrame:
+    out = df.reindex(columns=COLUMNS).astype("float64")
+    out.index = pd.DatetimeIndex(out.index).astype("datetime64[ns]")
+    out.index.name = "ts"
+    out = out.reset_index()
+    out.insert(0, "ticker", ticker)
+    return out
+
+
+def consolidate(
+    interval: str = "1h",
+    cfg: Optional[StoreConfig] = None,
+    tickers: Optional[Iterable[str]] = None,
+    since: Optional[str] = None,
+) -> Dict[str, int]:
+    """Rebuild dataset months from the per-ticker store.
+
+    since: "YYYY-MM" -> only months >= since are rewritten (older partitions are kept);
+    None rebuilds every month. Months left without rows are removed.
+    tickers: refresh only these tickers' rows; the other tickers in each month are kept.
+    Returns {month: rows written}.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+    import pyarrow.parquet as pq
+
+    cfg = cfg or StoreConfig()
+    subset = tickers is not None
+    tickers = list(tickers) if subset else list(stored_tickers(interval, cfg))
+    start = pd.Period(since, freq="M").to_timestamp() if since else None
+
+    frames = []
+    for t in tickers:
+        df = load_local(t, interval, cfg, use_cache=False)
+        if start is not None and not df.empty:
+            df = df[df.index >= start]
+        if not df.empty:
+            frames.append(_long(t, df))
+    d = _dataset_dir(cfg, interval)
+    new: Dict[str, pd.DataFrame] = {}
+    if frames:
+        rows = pd.concat(frames, axis=0, ignore_index=True)
+        rows["_month"] = rows["ts"].dt.strftime("%Y-%m")
+        new = {m: part.drop(columns="_month") for m, part in rows.groupby("_month", sort=True)}
+    # existing months in range are rebuilt too, so rows that left the store are dropped
+    touched = sorted(set(new) | {m for m in _months(d) if since is None or m >= _month_key(start)})
+
+    written: Dict[str, int] = {}
+    for month in touched:
+        md = os.path.join(d, f"month={month}")
+        part = new.get(month, pd.DataFrame(columns=["ticker", "ts"] + COLUMNS))
+        if subset and os.path.isdir(md):
+            # keep the other tickers' rows of this month
+            others = pds.dataset(md, format="parquet", schema=_schema())
+            others = others.to_table(filter=~pds.field("ticker").isin(tickers)).to_pandas()
+            part = pd.concat([others, part], axis=0, ignore_index=True) if not part.empty else others
+        if part.empty:
+            if os.path.isdir(md):
+                shutil.rmtree(md)
+            continue
+        part = part.sort_values(["ticker", "ts"], kind="stable")
+        os.makedirs(md, exist_ok=True)
+        tmp = os.path.join(md, f".part-0.parquet.tmp-{os.getpid()}-{threading.get_ident()}")
+        table = pa.Table.from_pandas(part, schema=_schema(), preserve_index=False)
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS)
+        os.replace(tmp, os.path.join(md, "part-0.parquet"))
+        written[month] = len(part)
+    return written
+
+
+def _filter(tickers: Optional[List[str]], start, end, month_lo: Optional[str], month_hi: Optional[str]):
+    import pyarrow.dataset as pds
+
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if tickers is not None:
+        _and(pds.field("ticker").isin(tickers))
+    if month_lo is not None:
+        _and(pds.field("month") >= month_lo)
+    if month_hi is not None:
+        _and(pds.field("month") <= month_hi)
+    if start is not None:
+        _and(pds.field("ts") >= pd.Timestamp(start).to_datetime64())
+    if end is not None:
+        _and(pds.field("ts") <= pd.Timestamp(end).to_datetime64())
+    return expr
+
+
+def _read(d: str, columns: List[str], expr) -> pd.DataFrame:
+    table = _open(d).to_table(columns=["ticker", "ts"] + columns, filter=expr)
+    return table.to_pandas()
+
+
+def _split(rows: pd.DataFrame, columns: List[str], bars: Optional[int]) -> Dict[str, pd.DataFrame]:
+    out: Dict[str, pd.DataFrame] = {}
+    if rows.empty:
+        return out
+    rows = rows.sort_values(["ticker", "ts"], kind="stable")
+    for t, g in rows.groupby("ticker", sort=False):
+        df = g.set_index("ts")[columns]
+        df.index.name = None
+        out[t] = df.iloc[-bars:] if bars else df
+    return out
+
+
+def _month_key(ts) -> str:
+    return pd.Timestamp(ts).strftime("%Y-%m")
+
+
+def load_panel(
+    tickers: Optional[Iterable[str]] = None,
+    start=None,
+    end=None,
+    columns: Optional[List[str]] = None,
+    interval: str = "1h",
+    bars: Optional[int] = None,
+    cfg: Optional[StoreConfig] = None,
+) -> Dict[str, pd.DataFrame]:
+    """{ticker: OHLCV df} for tickers (None = whole dataset) within [start, end].
+
+    Only the month partitions / row groups matching the filters and the requested columns
+    are read. bars keeps the last N bars per ticker; without start, months are read
+    newest-first until every ticker has N bars.
+    """
+    cfg = cfg or StoreConfig()
+    columns = list(columns) if columns else list(COLUMNS)
+    tickers = list(dict.fromkeys(tickers)) if tickers is not None else None
+    d = _dataset_dir(cfg, interval)
+    months = _months(d)
+
+    if not months:
+        out = {}
+        for t in tickers if tickers is not None else stored_tickers(interval, cfg):
+            df = load_local(t, interval, cfg, use_cache=False)
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            if end is not None:
+                df = df[df.index <= pd.Timestamp(end)]
+            if not df.empty:
+                df = df.reindex(columns=columns)
+                out[t] = df.iloc[-bars:] if bars else df
+        return out
+
+    hi = _month_key(end) if end is not None else None
+    if start is not None or not bars:
+        lo = _month_key(start) if start is not None else None
+        rows = _read(d, columns, _filter(tickers, start, end, lo, hi))
+        return _split(rows, columns, bars)
+
+    # last N bars: walk months newest-first, stop once every ticker is covered
+    wanted = tickers if tickers is not None else list(stored_tickers(interval, cfg))
+    chunks = []
+    counts: Dict[str, int] = {}
+    for month in reversed([m for m in months if hi is None or m <= hi]):
+        part = _read(d, columns, _filter(tickers, None, end, month, month))
+        if not part.empty:
+            chunks.append(part)
+            for t, n in part["ticker"].value_counts().items():
+                counts[t] = counts.get(t, 0) + int(n)
+        if all(counts.get(t, 0) >= bars for t in wanted):
+            break
+    rows = pd.concat(chunks, axis=0, ignore_index=True) if chunks else pd.DataFrame()
+    return _split(rows, columns, bars)
+
+
+def load_cross_section(
+    ts,
+    interval: str = "1h",
+    tickers: Optional[Iterable[str]] = None,
+    columns: Optional[List[str]] = None,
+    exact: bool = False,
+    cfg: Optional[StoreConfig] = None,
+) -> pd.DataFrame:
+    """One row per ticker at ts: index = ticker, plus a bar_time column.
+
+    exact=True keeps only tickers with a bar exactly at ts; otherwise each ticker's last bar
+    at or before ts (looking back at most into the previous month).
+    """
+    cfg = cfg or StoreConfig()
+    columns = list(columns) if columns else list(COLUMNS)
+    tickers = list(dict.fromkeys(tickers)) if tickers is not None else None
+    ts = pd.Timestamp(ts)
+    d = _dataset_dir(cfg, interval)
+
+    if _months(d):
+        month = ts.to_period("M")
+        lo = month if exact else month - 1
+        expr = _filter(tickers, ts if exact else None, ts, str(lo), str(month))
+        rows = _read(d, columns, expr)
+    else:
+        frames = load_panel(tickers, start=ts if exact else ts - pd.DateOffset(months=1), end=ts,
+                            columns=columns, interval=interval, cfg=cfg)
+        rows = pd.concat([df.rename_axis("ts").reset_index().assign(ticker=t) for t, df in frames.items()],
+                         axis=0, ignore_index=True) if frames else pd.DataFrame(columns=["ticker", "ts"] + columns)
+
+    if rows.empty:
+        return pd.DataFrame(columns=["bar_time"] + columns, index=pd.Index([], name="ticker"))
+    last = rows.sort_values(["ticker", "ts"], kind="stable").groupby("ticker", sort=True).tail(1)
+    out = last.set_index("ticker")[["ts"] + columns].rename(columns={"ts": "bar_time"})
+    out.index.name = "ticker"
+    return out
@@ -0,0 +1,131 @@
+"""In-process LRU cache for loaded / indicator-enriched frames
+
+Goal
+- One scan loads the same ticker several times (held-price sync, phase2 scoring, RS_1Y via
+  rs_strength) and every load re-reads parquet and re-normalizes.
+- Keep the frames of this process in one LRU keyed by what they were built from, so a second
+  load of unchanged data is a dict lookup.
+
+Key
+- (ticker, interval, version, needs)
+  - version: identifies the source data, e.g. data_store.store_signature (last stored bar +
+    last sync write) or the last bar of a fetched frame. New data -> new key.
+  - needs: indicator set (frozenset of columns) or a tag such as "ohlcv" / "rs".
+- put() drops older versions of the same (ticker, interval, needs), so a re-synced ticker
+  does not keep its stale frame alive.
+
+Eviction
+- Size based: frame memory (DataFrame.memory_usage, shallow) summed over entries is kept
+  under max_bytes (env FRAME_CACHE_MB, default 256); least recently used entries go first.
+
+Frames are shared
+- get() returns a shallow copy: adding/replacing columns on it is private to the caller,
+  but values must not be modified in place.
+
+Usage
+  from frame_cache import FRAME_CACHE, cached, format_frame_cache_stats
+  df = cached('TSLA', '1h', sig, 'ohlcv', lambda: read_it())
+  print(format_frame_cache_stats())   # FRAME_CACHE hits=.. misses=.. evictions=.. entries=.. mb=..
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+Key = Tuple[str, str, Hashable, Hashable]
+
+
+def _nbytes(df: pd.DataFrame) -> int:
+    try:
+        return int(df.memory_usage(index=True, deep=False).sum())
+    except Exception:
+        return 0
+
+
+class FrameCache:
+    """Thread-safe LRU of DataFrames bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = int(max_bytes)
+        self._items: "OrderedDict[Key, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = dict.fromkeys(("hits", "misses", "evictions"), 0)
+
+    def get(self, key: Key) -> Optional[pd.DataFrame]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self._stats["hits"] += 1
+            return item[0].copy(deep=False)
+
+    def put(self, key: Key, df: pd.DataFrame) -> None:
+        if df is None or df.empty:
+            return
+        size = _nbytes(df)
+        if size > self.max_bytes:
+            return
+        ticker, interval, _, needs = key
+        with self._lock:
+            # older versions of the same frame are stale once a new one arrives
+            for k in [k for k in self._items if k[0] == ticker and k[1] == interval and k[3] == needs]:
+                self._drop(k)
+            self._items[key] = (df, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                self._drop(next(iter(self._items)))
+                self._stats["evictions"] += 1
+
+    def _drop(self, key: Key) -> None:
+        _, size = self._items.pop(key)
+        self._bytes -= size
+
+    def invalidate(self, ticker: Optional[str] = None, interval: Optional[str] = None) -> None:
+        """Drop every entry (or those of one ticker / interval)."""
+        with self._lock:
+            for k in [k for k in self._items
+                      if (ticker is None or k[0] == ticker) and (interval is None or k[1] == interval)]:
+                self._drop(k)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._items), "bytes": self._bytes}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in ("hits", "misses", "evictions"):
+                self._stats[k] = 0
+
+
+FRAME_CACHE = FrameCache(max_bytes=int(float(os.environ.get("FRAME_CACHE_MB", "256")) * 1024 * 1024))
+
+
+def cached(ticker: str, interval: str, version: Hashable, needs: Hashable,
+           loader: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """FRAME_CACHE lookup; on a miss run loader() and keep its result."""
+    key = (ticker, interval, version, needs)
+    df = FRAME_CACHE.get(key)
+    if df is not None:
+        return df
+    df = loader()
+    FRAME_CACHE.put(key, df)
+    return df.copy(deep=False) if df is not None else df
+
+
+def frame_cache_stats() -> Dict[str, int]:
+    return FRAME_CACHE.stats()
+
+
+def format_frame_cache_stats(stats: Optional[Dict[str, int]] = None) -> str:
+    s = stats or frame_cache_stats()
+    mb = s["bytes"] / (1024 * 1024)
+    return (f"FRAME_CACHE hits={s['hits']} misses={s['misses']} evictions={s['evictions']} "
+            f"entries={s['entries']} mb={mb:.1f}")
@@ -0,0 +1,148 @@
+"""US equity session calendar (NYSE regular hours)
+
+Goal
+- Know which bars *should* exist so the data store can tell "already current" from "missing".
+
+Rules
+- Regular session 09:30-16:00 America/New_York, Mon-Fri.
+- NYSE full-day holidays (rule based, incl. Saturday -> Friday / Sunday -> Monday observance;
+  a Saturday New Year's Day is not observed on the prior Friday).
+- Early closes at 13:00: July 3 (weekday), day after Thanksgiving, Christmas Eve (weekday).
+
+Bars (as stored by data_store: naive UTC timestamps = bar start)
+- 1h: yfinance bars start at 09:30, 10:30, ... ET; the last bar ends at the session close.
+- 1d: one bar per session, stamped at 00:00 ET of the session date; closed at session close.
+
+Usage
+  from market_calendar import latest_closed_bar
+  start, end = latest_closed_bar('1h')   # naive UTC start / end of the newest finished bar
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+ET = ZoneInfo("America/New_York")
+OPEN = time(9, 30)
+CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    d = date(year, month, 1)
+    d += timedelta(days=(weekday - d.weekday()) % 7)
+    return d + timedelta(weeks=n - 1)
+
+
+def _last_weekday(year: int, month: int, weekday: int) -> date:
+    d = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return d - timedelta(days=(d.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d: date) -> date:
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=None)
+def holidays(year: int) -> frozenset:
+    out = set()
+    ny = date(year, 1, 1)
+    if ny.weekday() != 5:  # Saturday New Year's Day is not observed
+        out.add(_observed(ny))
+    out.add(_nth_weekday(year, 1, 0, 3))          # MLK Day
+    out.add(_nth_weekday(year, 2, 0, 3))          # Presidents' Day
+    out.add(_easter(year) - timedelta(days=2))    # Good Friday
+    out.add(_last_weekday(year, 5, 0))            # Memorial Day
+    if year >= 2022:
+        out.add(_observed(date(year, 6, 19)))     # Juneteenth
+    out.add(_observed(date(year, 7, 4)))          # Independence Day
+    out.add(_nth_weekday(year, 9, 0, 1))          # Labor Day
+    out.add(_nth_weekday(year, 11, 3, 4))         # Thanksgiving
+    out.add(_observed(date(year, 12, 25)))        # Christmas
+    return frozenset(out)
+
+
+@lru_cache(maxsize=None)
+def early_closes(year: int) -> frozenset:
+    out = set()
+    jul3 = date(year, 7, 3)
+    if jul3.weekday() < 5 and jul3 not in holidays(year):
+        out.add(jul3)
+    out.add(_nth_weekday(year, 11, 3, 4) + timedelta(days=1))
+    xmas_eve = date(year, 12, 24)
+    if xmas_eve.weekday() < 5 and xmas_eve not in holidays(year):
+        out.add(xmas_eve)
+    return frozenset(out)
+
+
+def is_trading_day(d: date) -> bool:
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+
+def session_close(d: date) -> time:
+    return EARLY_CLOSE if d in early_closes(d.year) else CLOSE
+
+
+def _to_utc_naive(d: date, t: time) -> datetime:
+    return datetime.combine(d, t, tzinfo=ET).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def session_close_utc(d: date) -> datetime:
+    """Naive UTC time at which session `d` (and its 1d bar) closes."""
+    return _to_utc_naive(d, session_close(d))
+
+
+def session_bars(d: date, interval: str) -> List[Tuple[datetime, datetime]]:
+    """[(start, end)] naive UTC for every bar of session `d` (empty on non-trading days)."""
+    if not is_trading_day(d):
+        return []
+    close = _to_utc_naive(d, session_close(d))
+    if interval.lower() == "1d":
+        return [(_to_utc_naive(d, time(0, 0)), close)]
+    if interval.lower() != "1h":
+        raise ValueError(f"unsupported interval: {interval}")
+    bars = []
+    start = _to_utc_naive(d, OPEN)
+    while start < close:
+        end = min(start + timedelta(hours=1), close)
+        bars.append((start, end))
+        start = start + timedelta(hours=1)
+    return bars
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def latest_closed_bar(interval: str, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """(start, end) naive UTC of the newest bar with end <= now (now: naive UTC)."""
+    now = now or utc_now()
+    d = now.replace(tzinfo=timezone.utc).astimezone(ET).date()
+    for _ in range(15):
+        closed = [b for b in session_bars(d, interval) if b[1] <= now]
+        if closed:
+            return closed[-1]
+        d -= timedelta(days=1)
+    raise RuntimeError(f"no trading session found before {now}")
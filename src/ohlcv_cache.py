@@ -0,0 +1,131 @@
+"""Memory-mapped OHLCV cache for backtests (Arrow IPC, zero-copy)
+
+Goal
+- Backtests and parameter sweeps re-read (or re-download) the same history on every run and
+  copy it into pandas. Keep a binary copy of the parquet store that is opened with mmap:
+  loading is a page-table operation, and concurrent processes share the same OS pages.
+
+Storage
+- data/store/mmap/{interval}/{TICKER}.arrow
+  - Arrow IPC file: open, high, low, close, volume (float64) + the bar-time index
+  - schema metadata `source` = data_store.store_signature (last stored bar + last sync write)
+- Rebuilt from the parquet store when the signature differs (new bar, re-written partial bar,
+  re-adjusted history). Written to a tmp file and renamed, so readers that still have the
+  old file mapped keep a consistent view.
+
+Zero-copy
+- Columns come back as read-only NumPy views on the mapped file. Anything that writes to
+  OHLCV in place must .copy() first; adding indicator columns is fine.
+
+Usage
+  from ohlcv_cache import load_cached, load_history
+  df = load_cached('TSLA', '1h')                         # store -> mmap, no network
+  df = load_history('TSLA', '1h', days=730)   # default sync_store=True: freshness-aware sync first, then mmap
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional
+
+import pandas as pd
+
+from data_store import StoreConfig, load_local, store_signature, sync
+
+CACHE_DIR = "mmap"
+COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def _cache_path(cfg: StoreConfig, ticker: str, interval: str) -> str:
+    interval = interval.lower()
+    if interval not in {"1h", "1d"}:
+        raise ValueError(f"unsupported interval: {interval}")
+    d = os.path.join(cfg.base_dir, CACHE_DIR, interval)
+    os.makedirs(d, exist_ok=True)
+    safe = ticker.replace("/", "_").replace(":", "_")
+    return os.path.join(d, f"{safe}.arrow")
+
+
+def _signature_key(sig) -> str:
+    last_ts, written = sig
+    return f"{pd.Timestamp(last_ts).isoformat()}|{pd.Timestamp(written).isoformat()}"
+
+
+def _open(p: str):
+    """(table, source key) of a cache file, mapped read-only."""
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(p, "r")).read_all()
+    meta = table.schema.metadata or {}
+    return table, meta.get(b"source", b"").decode()
+
+
+def build_cache(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> int:
+    """(Re)write the mmap file from the parquet store; returns rows cached (0 = nothing stored)."""
+    import pyarrow as pa
+
+    cfg = cfg or StoreConfig()
+    sig = store_signature(ticker, interval, cfg)
+    df = load_local(ticker, interval, cfg, use_cache=False)
+    if sig is None or df.empty:
+        return 0
+    df = df.reindex(columns=COLUMNS).astype("float64")
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"source": _signature_key(sig).encode()})
+    p = _cache_path(cfg, ticker, interval)
+    tmp = f"{p}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with pa.OSFile(tmp, "wb") as f:
+        with pa.ipc.new_file(f, table.schema) as w:
+            w.write_table(table)
+    os.replace(tmp, p)
+    return len(df)
+
+
+def load_cached(ticker: str, interval: str = "1h", cfg: Optional[StoreConfig] = None) -> pd.DataFrame:
+    """OHLCV history of one ticker as a zero-copy view on the mmap cache.
+
+    Rebuilds the cache first when the store signature changed; empty frame if nothing stored.
+    """
+    cfg = cfg or StoreConfig()
+    sig = store_signature(ticker, interval, cfg)
+    if sig is None:
+        return pd.DataFrame()
+    p = _cache_path(cfg, ticker, interval)
+    table = None
+    if os.path.exists(p):
+        try:
+            table, key = _open(p)
+        except Exception:
+            table, key = None, ""
+        if key != _signature_key(sig):
+            table = None
+    if table is None:
+        if not build_cache(ticker, interval, cfg):
+            return pd.DataFrame()
+        table, _ = _open(p)
+    df = table.to_pandas(split_blocks=True)
+    df.index.name = None
+    return df
+
+
+def load_history(
+    ticker: str,
+    interval: str = "1h",
+    days: Optional[int] = None,
+    sync_store: bool = True,
+    lookback_days: int = 120,
+    cfg: Optional[StoreConfig] = None,
+    **sync_kwargs,
+) -> pd.DataFrame:
+    """Backtest loader: optional data_store.sync, then the mmap view, trimmed to the last `days`.
+
+    sync_store=False never touches the network (parameter sweeps over a fixed history).
+    """
+    cfg = cfg or StoreConfig()
+    if sync_store:
+        sync(ticker, interval=interval, lookback_days=lookback_days, cfg=cfg, **sync_kwargs)
+    df = load_cached(ticker, interval, cfg)
+    if days and not df.empty:
+        df = df[df.index >= df.index[-1] - pd.Timedelta(days=int(days))]
+    return df
@@ -2,11 +2,25 @@
 相对强度模块（RS）
 计算股票相对于 SPY 的强度，用于跨牛熊的趋势过滤
 
+RS 表（每日构建）：
+  - rs_1y_history：整个 1D 面板 vs SPY 一次向量化算出每个交易日的 RS_1Y（日期 × 标的）
+  - build_rs_table 落盘到 data/store/rs/rs_1y.parquet（sync_store --interval 1d 之后自动构建）
+  - compute_rs_1y 变成查表（O(1)）；表过期或缺标的时才单独计算并记入内存（空结果不缓存，RS_MISS_TTL_SEC 后重试）
+  - rs_1y_asof / rs_1y_series：回测用的时点 RS —— 只用在 ts 之前已收盘的日线，不看未来；
+    rs_1y_series 对整段 1H K线一次 as-of join（每只标的一次，不再逐 bar 调用）
+
 用法：
-  from rs_strength import compute_rs_1y
+  from rs_strength import compute_rs_1y, rs_1y_asof
   rs = compute_rs_1y('AAPL')  # 返回 AAPL 相对 SPY 的 1 年相对强度（%）
+  rs_then = rs_1y_asof('AAPL', '2025-06-02 15:30')  # 该时刻已知的 RS_1Y（naive UTC）
+  rs_bars = rs_1y_series('AAPL', df_1h.index)        # 与 1H K线对齐的 RS_1Y（-999 = 无数据）
 """
+import os
+import threading
+import time
+
 import yfinance as yf
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from functools import lru_cache
@@ -14,6 +28,8 @@ from functools import lru_cache
 SPY_TICKER = 'SPY'
 TRADING_DAYS_1Y = 252
 CALENDAR_DAYS_1Y = 400  # ~252 trading days + weekends/holidays
+# 拉取失败 / 无数据的标的只在这段时间内直接返回 -999，之后重试（长驻进程不会一直没有 RS）
+RS_MISS_TTL_SEC = float(os.environ.get('RS_MISS_TTL_SEC', '300'))
 
 
 def _normalize(df: pd.DataFrame) -> pd.DataFrame:
@@ -33,10 +49,14 @@ def _normalize(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def _load_local_1d(ticker: str) -> pd.DataFrame:
-    """Try load 1D data from local parquet store."""
+    """Try load 1D data from local parquet store (normalized frame cached per store version)."""
     try:
-        from data_store import load_local
-        return _normalize(load_local(ticker, interval='1d'))
+        from data_store import load_local, store_signature
+        from frame_cache import cached
+        sig = store_signature(ticker, '1d')
+        if sig is None:
+            return pd.DataFrame()
+        return cached(ticker, '1d', sig, 'rs', lambda: _normalize(load_local(ticker, interval='1d')))
     except Exception:
         return pd.DataFrame()
 
@@ -60,19 +80,20 @@ def get_spy_history(days: int = CALENDAR_DAYS_1Y) -> pd.DataFrame:
     return _normalize(df)
 
 
-def compute_rs_1y(ticker: str) -> float:
-    """
-    计算 1 年相对强度（vs SPY）
-    返回：stock_1y_return - spy_1y_return（百分比，例如 +5.2 表示跑赢 5.2%）
-    """
-    end = datetime.now()
-    start = end - timedelta(days=CALENDAR_DAYS_1Y)
+def _spy_1d() -> pd.DataFrame:
+    """get_spy_history(CALENDAR_DAYS_1Y)；空结果不留在 lru_cache 里"""
+    spy = get_spy_history(CALENDAR_DAYS_1Y)
+    if spy.empty:
+        get_spy_history.cache_clear()
+    return spy
 
-    # 1) local store first
-    stock_df = _load_local_1d(ticker)
 
-    # 2) fallback yfinance
+def _fetch_1d(ticker: str) -> pd.DataFrame:
+    """1D 历史：本地 store 优先，否则 yfinance 最近 CALENDAR_DAYS_1Y 天"""
+    stock_df = _load_local_1d(ticker)
     if stock_df.empty:
+        end = datetime.now()
+        start = end - timedelta(days=CALENDAR_DAYS_1Y)
         try:
             stock_df = yf.Ticker(ticker).history(
                 start=start.strftime('%Y-%m-%d'),
@@ -81,39 +102,211 @@ def compute_rs_1y(ticker: str) -> float:
             )
             stock_df = _normalize(stock_df)
         except Exception:
-            return -999.0
+            return pd.DataFrame()
+    return stock_df
 
-    if stock_df.empty or 'close' not in stock_df.columns:
-        return -999.0
 
-    spy_df = get_spy_history(CALENDAR_DAYS_1Y)
-    if spy_df.empty or 'close' not in spy_df.columns:
-        return -999.0
+def rs_1y_history(frames: dict, spy_df: pd.DataFrame) -> pd.DataFrame:
+    """每个交易日的 RS_1Y（日期 × 标的，百分比，未四舍五入）
 
-    # 对齐索引
-    common_idx = stock_df.index.intersection(spy_df.index)
-    if len(common_idx) < TRADING_DAYS_1Y + 10:
-        return -999.0
+    一次向量化：所有标的收盘价堆成长表，只保留与 SPY 共同的交易日，按标的分组 shift。
+    与 compute_rs_1y 的单只口径一致：共同交易日 ≥ TRADING_DAYS_1Y + 10 才有值，
+    收益 = close[t] / close[t - (TRADING_DAYS_1Y - 1)] - 1。
+    """
+    if spy_df is None or spy_df.empty or 'close' not in spy_df.columns:
+        return pd.DataFrame()
+    spy_close = spy_df['close'].astype(float)
+    spy_close = spy_close[~spy_close.index.duplicated(keep='last')]
+    closes = {t: df['close'].astype(float) for t, df in frames.items()
+              if df is not None and not df.empty and 'close' in df.columns}
+    if not closes:
+        return pd.DataFrame()
+
+    long = pd.concat(closes, names=['ticker', 'date']).rename('close').reset_index()
+    long = long[long['date'].isin(spy_close.index)]
+    long['spy'] = spy_close.reindex(long['date']).to_numpy()
+    long = long.sort_values(['ticker', 'date'], kind='stable')
+
+    g = long.groupby('ticker', sort=False)
+    lag = TRADING_DAYS_1Y - 1
+    stock_1y = long['close'] / g['close'].shift(lag) - 1
+    spy_1y = long['spy'] / g['spy'].shift(lag) - 1
+    rs = (stock_1y - spy_1y) * 100
+    rs[g.cumcount() < TRADING_DAYS_1Y + 10 - 1] = np.nan
+    long['rs'] = rs
+    return long.pivot(index='date', columns='ticker', values='rs').sort_index()
+
+
+# ── RS 表（进程内只读一次）─────────────────────────────────────────────────────
+_table_lock = threading.Lock()
+_table = {'rs': None, 'latest': {}, 'extra': {}, 'asof': {}, 'miss': {}}
+
+
+def _rs_table_path() -> str:
+    try:
+        from data_store import StoreConfig
+        base_dir = StoreConfig().base_dir
+    except Exception:
+        base_dir = os.path.join(os.path.dirname(__file__), '..', 'data', 'store')
+    d = os.path.join(base_dir, 'rs')
+    os.makedirs(d, exist_ok=True)
+    return os.path.join(d, 'rs_1y.parquet')
+
+
+def _set_table(rs: pd.DataFrame) -> None:
+    latest = rs.ffill().iloc[-1].dropna().to_dict() if not rs.empty else {}
+    with _table_lock:
+        _table.update(rs=rs, latest=latest, extra={}, asof={}, miss={})
 
-    stock_close = stock_df.loc[common_idx, 'close']
-    spy_close = spy_df.loc[common_idx, 'close']
 
-    if len(stock_close) < TRADING_DAYS_1Y + 1:
+def _missed(ticker: str) -> bool:
+    """最近 RS_MISS_TTL_SEC 内单独计算过但没有结果"""
+    with _table_lock:
+        t = _table['miss'].get(ticker)
+    return t is not None and time.monotonic() - t < RS_MISS_TTL_SEC
+
+
+def _remember(ticker: str, series: pd.Series) -> None:
+    """单独算出的序列进 extra；空序列只记一次 miss（带 TTL），不当成结果缓存"""
+    with _table_lock:
+        if series.empty:
+            _table['extra'].pop(ticker, None)
+            _table['miss'][ticker] = time.monotonic()
+        else:
+            _table['extra'][ticker] = series
+            _table['miss'].pop(ticker, None)
+
+
+def build_rs_table(tickers: list = None, save: bool = True) -> pd.DataFrame:
+    """构建整个股票池的 RS_1Y 表（默认：本地 store 里所有 1D 标的），并落盘"""
+    if tickers is None:
+        try:
+            from data_store import stored_tickers
+            tickers = list(stored_tickers('1d'))
+        except Exception:
+            tickers = []
+    frames = {t: _fetch_1d(t) for t in tickers if t != SPY_TICKER}
+    rs = rs_1y_history(frames, get_spy_history(CALENDAR_DAYS_1Y))
+    if save and not rs.empty:
+        rs.to_parquet(_rs_table_path())
+    _set_table(rs)
+    return rs
+
+
+def load_rs_table() -> pd.DataFrame:
+    """当前可用的 RS 表：内存 → 磁盘；比 SPY 最新日线旧的表视为过期（返回空表）"""
+    with _table_lock:
+        rs = _table['rs']
+    if rs is not None:
+        return rs
+    rs = pd.DataFrame()
+    try:
+        p = _rs_table_path()
+        if os.path.exists(p):
+            rs = pd.read_parquet(p)
+            spy_df = get_spy_history(CALENDAR_DAYS_1Y)
+            if rs.empty or spy_df.empty or rs.index.max() < spy_df.index.max():
+                rs = pd.DataFrame()
+    except Exception:
+        rs = pd.DataFrame()
+    _set_table(rs)
+    return rs
+
+
+def _rs_series(ticker: str) -> pd.Series:
+    """某只标的逐日 RS_1Y（表里有就用表，否则单独算一次并记住）"""
+    rs = load_rs_table()
+    if ticker in rs.columns:
+        return rs[ticker].dropna()
+    with _table_lock:
+        hit = _table['extra'].get(ticker)
+    if hit is not None:
+        return hit
+    if _missed(ticker):
+        return pd.Series(dtype=float)
+    hist = rs_1y_history({ticker: _fetch_1d(ticker)}, _spy_1d())
+    series = hist[ticker].dropna() if ticker in hist.columns else pd.Series(dtype=float)
+    _remember(ticker, series)
+    return series
+
+
+def compute_rs_1y(ticker: str) -> float:
+    """
+    计算 1 年相对强度（vs SPY）
+    返回：stock_1y_return - spy_1y_return（百分比，例如 +5.2 表示跑赢 5.2%）
+
+    RS 表里有该标的时直接查表；否则单独算一次（结果进程内缓存；拉取失败/无数据只记 RS_MISS_TTL_SEC，之后重试）。
+    """
+    load_rs_table()
+    with _table_lock:
+        v = _table['latest'].get(ticker)
+    if v is None:
+        series = _rs_series(ticker)
+        if series.empty:
+            return -999.0
+        v = float(series.iloc[-1])
+    return round(float(v), 2)
+
+
+def _rs_by_availability(ticker: str) -> pd.Series:
+    """RS_1Y 按“可用时间”（该日线收盘的 naive UTC 时刻）索引"""
+    with _table_lock:
+        hit = _table['asof'].get(ticker)
+    if hit is not None:
+        return hit
+    from market_calendar import session_close_utc
+    series = _rs_series(ticker)
+    avail = pd.DatetimeIndex([session_close_utc(d.date()) for d in series.index])
+    out = pd.Series(series.to_numpy(), index=avail).sort_index()
+    if not out.empty:
+        with _table_lock:
+            _table['asof'][ticker] = out
+    return out
+
+
+def rs_1y_asof(ticker: str, ts) -> float:
+    """ts（naive UTC）时刻已知的 RS_1Y：只用 ts 之前已收盘的日线；没有则 -999"""
+    series = _rs_by_availability(ticker)
+    if series.empty:
         return -999.0
+    v = series.asof(pd.Timestamp(ts))
+    return -999.0 if pd.isna(v) else round(float(v), 2)
+
 
-    stock_1y = float(stock_close.iloc[-1]) / float(stock_close.iloc[-TRADING_DAYS_1Y]) - 1
-    spy_1y = float(spy_close.iloc[-1]) / float(spy_close.iloc[-TRADING_DAYS_1Y]) - 1
+def rs_1y_series(ticker: str, index=None) -> pd.Series:
+    """时点 RS_1Y（回测用，无未来函数）
 
-    rs = (stock_1y - spy_1y) * 100  # 转成百分比
-    return round(rs, 2)
+    - index=None：逐日序列，日线 t 的值 = 截至 t 收盘的 stock 252d 收益 - SPY 252d 收益（%）
+    - index=K线时间（naive UTC，K线开始时间，如 1H df.index）：as-of join，
+      每根K线取开始时刻之前已收盘的最近一根日线的 RS（当天盘中用前一日收盘的值）；
+      更早没有数据的K线为 -999
+    """
+    if index is None:
+        return _rs_series(ticker).round(2)
+    index = pd.DatetimeIndex(index)
+    series = _rs_by_availability(ticker)
+    if series.empty:
+        return pd.Series(-999.0, index=index)
+    pos = series.index.searchsorted(index, side='right') - 1
+    values = np.where(pos >= 0, series.to_numpy()[np.maximum(pos, 0)], -999.0)
+    return pd.Series(np.where(pos >= 0, np.round(values, 2), -999.0), index=index)
 
 
 def compute_rs_multi(tickers: list, window: str = '1y') -> dict:
-    """批量计算多只股票的 RS"""
+    """批量计算多只股票的 RS（表里没有的标的一次向量化补算）"""
     result = {}
+    if window != '1y':
+        return result
+    rs = load_rs_table()
+    with _table_lock:
+        known = set(rs.columns) | set(_table['extra'])
+    missing = [t for t in tickers if t not in known and t != SPY_TICKER and not _missed(t)]
+    if missing:
+        hist = rs_1y_history({t: _fetch_1d(t) for t in missing}, _spy_1d())
+        for t in missing:
+            _remember(t, hist[t].dropna() if t in hist.columns else pd.Series(dtype=float))
     for t in tickers:
-        if window == '1y':
-            result[t] = compute_rs_1y(t)
+        result[t] = compute_rs_1y(t)
     return result
 
 
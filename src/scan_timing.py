@@ -0,0 +1,245 @@
+"""Per-stage timing for the scan pipeline (wall time, network calls, bytes, rows)
+
+Goal
+- run_fast_scan printed one total and full_scan.main printed nothing about where the time
+  goes (order reconcile, live exit quotes, regime, phase1 download, phase2 sync / indicators /
+  score / structure / RS, dashboard + push_history writes).
+- Record every stage, and every ticker inside a stage, so cron runs can be compared:
+  regressions, slowest stages, slowest tickers.
+
+Recording
+- Context manager:   with stage('phase1.download') as st: ...; st.add(net_calls=1, bytes=n, rows=m)
+- Explicit stop:     st = stage('live_exit'); try: ... finally: st.stop()   (long try blocks)
+- Decorator:         @timed('phase2')
+- ticker=...: the stage's self time (nested stages excluded, so per-ticker times add up)
+  is also booked to (ticker, stage) -> slowest tickers.
+- Every stage picks up the data_store sync counters that moved while it ran
+  (fetches -> net_calls, bytes_fetched -> bytes, rows_fetched -> rows); other network calls
+  (yf.download, broker quotes) are counted by the caller via add() / stage(..., net_calls=1).
+- Stages nest ('phase2' around 'phase2.sync', ...); each name is inclusive of its children.
+
+Output
+- format_scan_timing() -> one line:
+  SCAN_TIMING total=41.2s phase1=20.3s phase1.download=18.9s[net=6,kb=2140,rows=31500] ... slowest=NVDA:1.21s,...
+- report_scan_timing('full_scan') prints that line and appends one JSON record to
+  data/metrics/scan_timing.jsonl (env SCAN_TIMING_FILE): stages, per-ticker seconds, extra fields.
+- SCAN_TIMER.note(execution={...}) adds run-level fields to that record (e.g. bar-close ->
+  submit latency from monitor/exec_pipeline.py).
+
+Usage
+  from scan_timing import SCAN_TIMER, stage, timed, report_scan_timing
+  SCAN_TIMER.reset()
+  with stage('regime'):
+      regime = get_market_regime()
+  report_scan_timing('full_scan')
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from data_store import sync_stats as _sync_stats
+except Exception:
+    _sync_stats = None
+
+METRICS_FILE = os.environ.get(
+    "SCAN_TIMING_FILE",
+    os.path.join(os.path.dirname(__file__), "..", "data", "metrics", "scan_timing.jsonl"),
+)
+COUNTERS = ("net_calls", "bytes", "rows")
+# data_store counter -> stage counter
+_SYNC_MAP = (("fetches", "net_calls"), ("bytes_fetched", "bytes"), ("rows_fetched", "rows"))
+
+
+def _io_snapshot() -> Optional[Dict[str, int]]:
+    if _sync_stats is None:
+        return None
+    try:
+        return _sync_stats()
+    except Exception:
+        return None
+
+
+class Stage:
+    """One running stage; stop() (or leaving the with block) books it to the timer."""
+
+    def __init__(self, timer: "ScanTimer", name: str, ticker: Optional[str] = None, **counts: int):
+        self.timer = timer
+        self.name = name
+        self.ticker = ticker
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.add(**counts)
+        self.seconds: Optional[float] = None
+        self._child_s = 0.0
+        self._stack = timer._stack()
+        self._stack.append(self)
+        self._io0 = _io_snapshot()
+        self._t0 = time.perf_counter()
+
+    def add(self, **counts: int) -> "Stage":
+        for k, v in counts.items():
+            if k not in self.counts:
+                raise KeyError(f"unknown stage counter: {k}")
+            self.counts[k] += int(v or 0)
+        return self
+
+    def stop(self) -> float:
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self._t0
+            io1 = _io_snapshot() if self._io0 is not None else None
+            if io1 is not None:
+                for src, dst in _SYNC_MAP:
+                    self.counts[dst] += max(0, int(io1.get(src, 0)) - int(self._io0.get(src, 0)))
+            if self in self._stack:
+                i = self._stack.index(self)
+                del self._stack[i]
+                if i:
+                    self._stack[i - 1]._child_s += self.seconds
+            self.timer._book(self)
+        return self.seconds
+
+    def __enter__(self) -> "Stage":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        self.stop()
+        return False
+
+
+class ScanTimer:
+    """Thread-safe totals per stage name and per (ticker, stage) since the last reset()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def _stack(self) -> List[Stage]:
+        """Running stages of the calling thread (innermost last)."""
+        st = getattr(self._local, "stack", None)
+        if st is None:
+            st = self._local.stack = []
+        return st
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = datetime.now()
+            self._t0 = time.perf_counter()
+            self._stages: Dict[str, Dict[str, float]] = {}
+            self._tickers: Dict[str, Dict[str, float]] = {}
+            self._notes: Dict[str, object] = {}
+
+    def stage(self, name: str, ticker: Optional[str] = None, **counts: int) -> Stage:
+        return Stage(self, name, ticker, **counts)
+
+    def _book(self, st: Stage) -> None:
+        with self._lock:
+            s = self._stages.get(st.name)
+            if s is None:
+                s = self._stages[st.name] = {"seconds": 0.0, "calls": 0, **dict.fromkeys(COUNTERS, 0)}
+            s["seconds"] += st.seconds
+            s["calls"] += 1
+            for k, v in st.counts.items():
+                s[k] += v
+            if st.ticker:
+                t = self._tickers.setdefault(st.ticker, {})
+                t[st.name] = t.get(st.name, 0.0) + max(0.0, st.seconds - st._child_s)
+
+    def note(self, **fields) -> None:
+        """Run-level fields for record() (JSON-serializable)."""
+        with self._lock:
+            self._notes.update(fields)
+
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def stages(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._stages.items()}
+
+    def tickers(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._tickers.items()}
+
+    def slowest_tickers(self, n: int = 10) -> List[Tuple[str, float]]:
+        """Tickers by summed per-ticker seconds (over all stages booked with ticker=...)."""
+        tot = [(t, sum(v.values())) for t, v in self.tickers().items()]
+        return sorted(tot, key=lambda x: x[1], reverse=True)[:n]
+
+    def record(self, kind: str, **extra) -> dict:
+        """JSON-ready snapshot of this run."""
+        r6 = lambda x: round(float(x), 6)
+        with self._lock:
+            notes = dict(self._notes)
+        return {
+            "kind": kind,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_s": r6(self.total_seconds()),
+            "stages": {k: {**v, "seconds": r6(v["seconds"])} for k, v in self.stages().items()},
+            "slowest_tickers": [[t, r6(s)] for t, s in self.slowest_tickers(20)],
+            "tickers": {t: {k: r6(s) for k, s in v.items()} for t, v in self.tickers().items()},
+            **notes,
+            **extra,
+        }
+
+
+SCAN_TIMER = ScanTimer()
+
+
+def stage(name: str, ticker: Optional[str] = None, **counts: int) -> Stage:
+    """Start a stage on SCAN_TIMER (use as a context manager or call .stop())."""
+    return SCAN_TIMER.stage(name, ticker, **counts)
+
+
+def timed(name: str):
+    """Decorator: every call of the function is one `name` stage."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def format_scan_timing(timer: Optional[ScanTimer] = None, top_tickers: int = 5) -> str:
+    timer = timer or SCAN_TIMER
+    parts = [f"SCAN_TIMING total={timer.total_seconds():.1f}s"]
+    for name, s in sorted(timer.stages().items(), key=lambda kv: kv[1]["seconds"], reverse=True):
+        io = []
+        if s["net_calls"]:
+            io.append(f"net={int(s['net_calls'])}")
+        if s["bytes"]:
+            io.append(f"kb={int(s['bytes']) // 1024}")
+        if s["rows"]:
+            io.append(f"rows={int(s['rows'])}")
+        parts.append(f"{name}={s['seconds']:.2f}s" + (f"[{','.join(io)}]" if io else ""))
+    slow = timer.slowest_tickers(top_tickers)
+    if slow:
+        parts.append("slowest=" + ",".join(f"{t}:{s:.2f}s" for t, s in slow))
+    return " ".join(parts)
+
+
+def append_scan_timing(record: dict, path: Optional[str] = None) -> None:
+    path = path or METRICS_FILE
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def report_scan_timing(kind: str, path: Optional[str] = None, **extra) -> str:
+    """Print the SCAN_TIMING line and append this run to the metrics file (never raises)."""
+    line = format_scan_timing()
+    print(line)
+    try:
+        append_scan_timing(SCAN_TIMER.record(kind, **extra), path)
+    except Exception as e:
+        print(f"[scan timing write failed] {e}")
+    return line
@@ -19,9 +19,9 @@ from analyzer.indicators import add_all_indicators, add_crossover_signals
 
 # RS module (relative strength vs SPY)
 try:
-    from rs_strength import compute_rs_1y as compute_rs_1y_fn
+    from rs_strength import rs_1y_series as rs_1y_series_fn
 except Exception:
-    compute_rs_1y_fn = None
+    rs_1y_series_fn = None
 
 
 def ret5_entry_from_no_signal_streak(streak: int) -> float:
@@ -74,13 +74,13 @@ def backtest_ticker(
     hist = add_all_indicators(hist)
     hist = add_crossover_signals(hist)
 
-    # precompute RS_1Y once per ticker (avoid per-bar calls)
-    rs_1y = -999.0
-    if compute_rs_1y_fn is not None:
+    # 逐日时点 RS_1Y（只用当日之前已收盘的数据，无未来函数），每只股票算一次
+    rs_series = np.full(len(hist), -999.0)
+    if rs_1y_series_fn is not None:
         try:
-            rs_1y = float(compute_rs_1y_fn(ticker))
+            rs_series = rs_1y_series_fn(ticker, hist.index).to_numpy(dtype=float)
         except Exception:
-            rs_1y = -999.0
+            pass
 
     ret5_entry = ret5_entry_from_no_signal_streak(no_signal_streak)
 
@@ -100,6 +100,7 @@ def backtest_ticker(
             macd_h = row.get('macd_hist', 0)
 
             # RS_1Y：只在“极弱”时过滤（vs SPY，百分比口径）
+            rs_1y = float(rs_series[i])
             rs_ok = (rs_1y == -999.0) or (rs_1y > rs_1y_floor)
 
             buy_signal = (
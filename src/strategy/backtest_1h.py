@@ -23,7 +23,7 @@ import yfinance as yf
 
 # 允许直接运行：把 src/ 加入路径
 sys.path.insert(0, 'src')
-from analyzer.indicators import add_all_indicators
+from analyzer.indicators import compute_indicators
 
 
 TP_NORMAL = 0.13
@@ -40,6 +40,10 @@ RET5_ENTRY = -0.03
 HOLD_MAX_BARS = 30 * 7  # 约 30 个交易日 * 每天 ~7根（粗略）
 
 
+# compute_score + 进场条件读取的指标列
+SCORE_NEEDS = frozenset({'above_ma200', 'above_ma50', 'rsi14', 'ret_5d', 'macd_hist'})
+
+
 def compute_score(row: pd.Series) -> int:
     """简化版评分（用于区分 strong/normal）
 
@@ -86,6 +90,16 @@ def compute_score(row: pd.Series) -> int:
 
 
 def fetch_1h(ticker: str, period: str = '730d') -> pd.DataFrame:
+    # 优先本地 parquet 仓库（mmap 缓存，重复回测不再重新下载/复制），失败再回退 yfinance
+    try:
+        from ohlcv_cache import load_history
+        days = int(str(period)[:-1]) if str(period).endswith('d') else None
+        df = load_history(ticker, '1h', days=days, lookback_days=min(800, (days or 730) + 10),
+                          max_auto_lookback_days=800)
+        if not df.empty:
+            return df
+    except Exception:
+        pass
     df = yf.Ticker(ticker).history(period=period, interval='1h', auto_adjust=True)
     if df is None or df.empty:
         return pd.DataFrame()
@@ -100,7 +114,7 @@ def backtest_ticker_1h(ticker: str, period='730d') -> pd.DataFrame:
     if len(df) < 400:
         return pd.DataFrame()
 
-    df = add_all_indicators(df)
+    df = compute_indicators(df, needs=SCORE_NEEDS)
 
     trades = []
     in_trade = False
@@ -8,7 +8,7 @@ P3：回测分层验证 - 按市场环境(牛/熊/震荡)分别统计胜率
   这个回测验证「市场环境过滤」是否真的有必要，
   以及各环境下的最优阈值应该是多少。
 
-数据：1H，730天（yfinance 限制）
+数据：1H，730天（本地 parquet 仓库 + mmap 缓存，缺数据时回退 yfinance）
 标的：核心持仓 + Tier2 关注池（共 18 只）
 """
 import warnings
@@ -24,7 +24,7 @@ import yfinance as yf
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../'))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src'))
 
-from analyzer.indicators import add_all_indicators
+from analyzer.indicators import compute_indicators
 
 
 # ── 配置 ─────────────────────────────────────────────────────────────────────
@@ -67,6 +67,10 @@ def classify_regime(spy_close: pd.Series, idx: int) -> str:
         return 'neutral'
 
 
+# compute_score + 进场条件读取的指标列
+SCORE_NEEDS = frozenset({'above_ma200', 'above_ma50', 'rsi14', 'ret_5d', 'macd_hist'})
+
+
 def compute_score(row: pd.Series) -> int:
     """简化版评分（与 backtest_1h.py 一致）"""
     score = 50
@@ -91,14 +95,31 @@ def compute_score(row: pd.Series) -> int:
 
 
 # ── 单股回测 ─────────────────────────────────────────────────────────────────
-def backtest_one(ticker: str, spy_1d: pd.Series, period='730d') -> pd.DataFrame:
-    df = yf.Ticker(ticker).history(period=period, interval='1h', auto_adjust=True)
-    if df is None or len(df) < 400:
+def load_history_or_yf(ticker: str, interval: str = '1h', period: str = '730d') -> pd.DataFrame:
+    """本地 parquet 仓库（mmap 缓存）优先，失败/为空时回退 yfinance；返回 naive 索引 + 小写列"""
+    try:
+        from ohlcv_cache import load_history
+        days = int(str(period)[:-1]) if str(period).endswith('d') else None
+        df = load_history(ticker, interval, days=days, lookback_days=min(800, (days or 730) + 10),
+                          max_auto_lookback_days=800)
+        if not df.empty:
+            return df
+    except Exception:
+        pass
+    df = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=True)
+    if df is None or df.empty:
         return pd.DataFrame()
     df = df.copy()
     df.index = df.index.tz_convert(None)
     df.columns = [c.lower() for c in df.columns]
-    df = add_all_indicators(df)
+    return df
+
+
+def backtest_one(ticker: str, spy_1d: pd.Series, period='730d') -> pd.DataFrame:
+    df = load_history_or_yf(ticker, '1h', period=period)
+    if df is None or len(df) < 400:
+        return pd.DataFrame()
+    df = compute_indicators(df, needs=SCORE_NEEDS)
 
     trades = []
     in_trade = False
@@ -191,8 +212,8 @@ def run():
 
     # 获取 SPY 日线（用于 regime 分类）
     print("  获取 SPY 日线...")
-    spy_hist = yf.Ticker('SPY').history(period='730d', interval='1d', auto_adjust=True)
-    spy_close_1d = spy_hist['Close'].copy()
+    spy_hist = load_history_or_yf('SPY', '1d', period='730d')
+    spy_close_1d = spy_hist['close'].copy()
     spy_close_1d.index = pd.to_datetime([str(d.date()) for d in spy_close_1d.index])
 
     # 逐股回测
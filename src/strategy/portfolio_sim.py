@@ -0,0 +1,419 @@
+"""Array-backed portfolio replay engine (1H, many tickers).
+
+Why
+- A replay over a universe used to walk the union of all timestamps and, for every
+  timestamp, probe every ticker frame (`ts in df.index`, `get_loc`, `df.iloc[i]`):
+  O(T x N) pandas calls, minutes for 180d x 500 names.
+
+Approach
+- build_panel() aligns every ticker once onto the sorted union of bar times:
+  T x N arrays of close / bar position / score / exec mode (NaN / -1 where a ticker has
+  no bar at that time).
+- Eligibility (warm-up, min score, routed mode) is one vectorized mask; the executor loop
+  only visits the few eligible cells of each timestamp.
+- Signal-specific rules (dedupe / upgrade resend) stay with the caller as a gate object:
+    gate.check(ticker, ts, score, exec_mode) -> (ok, reason)
+    gate.mark(ticker, ts, score, exec_mode, reason)   # called for the chosen signal
+
+Executors
+- run_serial: one position at a time, max_new_buys_per_day, Top-1 by (score, STRUCT),
+  fixed TP / SL / max holding bars (the replay_dedupe_backtest executor).
+- run_portfolio: many concurrent positions with cash, sizing and an open-risk budget, using
+  the live broker functions (order_router.try_build_order_intent -> sizing.compute_qty,
+  intent_eval.compute_metrics); records cash / equity / open risk per bar.
+  Needs the repo root on sys.path (broker package).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MODES = ("SKIP", "MR", "STRUCT")
+SKIP, MR, STRUCT = 0, 1, 2
+
+
+@dataclass
+class Trade:
+    entry_time: pd.Timestamp
+    exit_time: pd.Timestamp
+    ticker: str
+    entry: float
+    exit: float
+    ret: float
+    exit_reason: str
+
+
+@dataclass
+class Panel:
+    """Tickers aligned on the union of their bar times (row t, column k)."""
+
+    tickers: List[str]
+    times: pd.DatetimeIndex
+    day: np.ndarray      # (T,) day number of each time (bars of one calendar day share it)
+    close: np.ndarray    # (T, N) float, NaN where ticker k has no bar at time t
+    bar: np.ndarray      # (T, N) int, bar position within ticker k's own frame, -1 if none
+    score: np.ndarray    # (T, N) float, NaN if none
+    mode: np.ndarray     # (T, N) int8 code into MODES
+    last_time: List[pd.Timestamp]
+    last_close: np.ndarray
+    fields: Dict[str, np.ndarray] = field(default_factory=dict)  # extra (T, N) float arrays, NaN if none
+
+    def columns(self, tickers: Optional[Sequence[str]]) -> np.ndarray:
+        """Column numbers of tickers (in panel order); None = all."""
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        wanted = set(tickers)
+        return np.array([k for k, t in enumerate(self.tickers) if t in wanted], dtype=int)
+
+
+def build_panel(
+    frames: Dict[str, pd.DataFrame],
+    scores: Dict[str, np.ndarray],
+    modes: Dict[str, np.ndarray],
+    fields: Optional[Dict[str, Dict[str, np.ndarray]]] = None,
+) -> Panel:
+    """frames: {ticker: df with close, sorted unique index}; scores / modes: per-bar arrays.
+
+    fields: {name: {ticker: per-bar array}} aligned into Panel.fields (e.g. sl / tp prices).
+    """
+    tickers = [t for t, df in frames.items() if not df.empty]
+    if not tickers:
+        empty = np.empty((0, 0))
+        return Panel([], pd.DatetimeIndex([]), np.empty(0, dtype=np.int64), empty, empty.astype(int),
+                     empty, empty.astype(np.int8), [], np.empty(0))
+    times = pd.DatetimeIndex(np.unique(np.concatenate([frames[t].index.values for t in tickers])))
+    T, N = len(times), len(tickers)
+    close = np.full((T, N), np.nan)
+    bar = np.full((T, N), -1, dtype=np.int64)
+    score = np.full((T, N), np.nan)
+    mode = np.zeros((T, N), dtype=np.int8)
+    extra: Dict[str, np.ndarray] = {}
+    for k, t in enumerate(tickers):
+        df = frames[t]
+        rows = times.get_indexer(df.index)
+        close[rows, k] = df["close"].to_numpy(dtype=float)
+        bar[rows, k] = np.arange(len(df))
+        score[rows, k] = np.asarray(scores[t], dtype=float)
+        mode[rows, k] = np.asarray(modes[t], dtype=np.int8)
+        for name, per_ticker in (fields or {}).items():
+            if name not in extra:
+                extra[name] = np.full((T, N), np.nan)
+            if t in per_ticker:
+                extra[name][rows, k] = np.asarray(per_ticker[t], dtype=float)
+    day = times.values.astype("datetime64[D]").astype(np.int64)
+    return Panel(
+        tickers=tickers,
+        times=times,
+        day=day,
+        close=close,
+        bar=bar,
+        score=score,
+        mode=mode,
+        last_time=[frames[t].index[-1] for t in tickers],
+        last_close=np.array([float(frames[t]["close"].iloc[-1]) for t in tickers]),
+        fields=extra,
+    )
+
+
+def eligible_mask(panel: Panel, cols: np.ndarray, min_score: float, warmup: int) -> np.ndarray:
+    """(T, len(cols)) bool: bar past warm-up, score >= min_score, routed (not SKIP), has a close."""
+    bar, score = panel.bar[:, cols], panel.score[:, cols]
+    return (bar >= warmup) & (score >= min_score) & (panel.mode[:, cols] != SKIP) & ~np.isnan(panel.close[:, cols])
+
+
+def run_serial(
+    panel: Panel,
+    *,
+    tp_pct: float,
+    sl_pct: float,
+    hold_max: int,
+    min_score: float,
+    max_new_buys_per_day: int,
+    gate=None,
+    tickers: Optional[Sequence[str]] = None,
+    warmup: int = 300,
+) -> List[Trade]:
+    """Serial executor: at most one open position, Top-1 of the eligible signals per bar.
+
+    Each bar: the open position exits on TP / SL / HOLD_MAX at that bar's close (only when
+    its ticker has a bar); when flat and the day's buy budget is left, the best eligible
+    signal (score, then STRUCT, then panel order) that passes the gate is bought at close.
+    A position still open at the end exits at its ticker's last bar ("EOD").
+    tickers: restrict the run to these panel columns.
+    """
+    cols = panel.columns(tickers)
+    if not len(cols) or not len(panel.times):
+        return []
+    close, bar, score, mode = panel.close[:, cols], panel.bar[:, cols], panel.score[:, cols], panel.mode[:, cols]
+    elig = eligible_mask(panel, cols, min_score, warmup)
+    has_cand = elig.any(axis=1)
+    times, days = panel.times, panel.day
+    names = [panel.tickers[k] for k in cols]
+
+    trades: List[Trade] = []
+    pos = -1
+    entry_i = 0
+    entry_price = 0.0
+    entry_time = None
+    buys: Dict[int, int] = {}
+
+    for t in range(len(times)):
+        if pos >= 0:
+            i = bar[t, pos]
+            if i >= 0:
+                price = close[t, pos]
+                r = (price - entry_price) / entry_price
+                reason = "TP" if r >= tp_pct else "SL" if r <= sl_pct else "HOLD_MAX" if (i - entry_i) >= hold_max else None
+                if reason:
+                    trades.append(Trade(entry_time, times[t], names[pos], entry_price, float(price), float(r), reason))
+                    pos = -1
+            if pos >= 0:
+                continue
+
+        if not has_cand[t] or buys.get(days[t], 0) >= max_new_buys_per_day:
+            continue
+
+        ts = times[t]
+        best: Optional[Tuple[Tuple[float, bool], int, str]] = None
+        for c in np.flatnonzero(elig[t]):
+            s, m = float(score[t, c]), MODES[mode[t, c]]
+            if gate is not None:
+                ok, why = gate.check(names[c], ts, s, m)
+                if not ok:
+                    continue
+            else:
+                why = "first"
+            key = (s, m == "STRUCT")
+            if best is None or key > best[0]:
+                best = (key, c, why)
+        if best is None:
+            continue
+
+        (s, _), c, why = best
+        if gate is not None:
+            gate.mark(names[c], ts, s, MODES[mode[t, c]], why)
+        pos = c
+        entry_i = int(bar[t, c])
+        entry_price = float(close[t, c])
+        entry_time = ts
+        buys[days[t]] = buys.get(days[t], 0) + 1
+
+    if pos >= 0:
+        k = cols[pos]
+        price = float(panel.last_close[k])
+        trades.append(Trade(entry_time, panel.last_time[k], names[pos], entry_price, price,
+                            (price - entry_price) / entry_price, "EOD"))
+    return trades
+
+
+@dataclass
+class PortfolioConfig:
+    """Limits of the multi-position executor (defaults = full_scan's env defaults)."""
+
+    initial_cash: float = 100000.0
+    max_open_pos: int = 10                # MAX_OPEN_POS
+    max_new_buys_per_day: int = 1         # MAX_NEW_BUYS_PER_DAY
+    max_buys_per_bar: int = 1             # live: Top-1 intent per scan
+    total_risk_cap_pct: float = 0.02      # TOTAL_RISK_CAP (open risk / sizing equity)
+    max_price_pct_equity: float = 0.35    # MAX_PRICE_PCT_EQUITY (1 share vs equity)
+    min_price_usd: float = 5.0            # MIN_PRICE_USD
+    min_cash_buffer: float = 50.0         # MIN_CASH_BUFFER_USD
+    hold_max: int = 195
+    paper: Optional[object] = None        # broker.order_router.PaperTradeConfig (sizing / max_sl_pct / max_position_pct)
+
+
+@dataclass
+class PortfolioTrade(Trade):
+    qty: int = 0
+    pnl: float = 0.0
+    exec_mode: str = ""
+    score: float = 0.0
+
+
+@dataclass
+class PortfolioResult:
+    trades: List[PortfolioTrade]
+    equity: pd.DataFrame                  # per bar: cash, equity, open_risk, positions, exposure
+    skips: Dict[str, int]
+
+    def stats(self) -> Dict:
+        eq = self.equity["equity"] if not self.equity.empty else pd.Series(dtype=float)
+        start = float(eq.iloc[0]) if len(eq) else 0.0
+        end = float(eq.iloc[-1]) if len(eq) else 0.0
+        dd = float((eq / eq.cummax() - 1.0).min()) if len(eq) else 0.0
+        rets = np.array([t.ret for t in self.trades], dtype=float)
+        return {
+            "start_equity": start,
+            "end_equity": end,
+            "total_return": (end / start - 1.0) if start else 0.0,
+            "max_drawdown": dd,
+            "trades": len(self.trades),
+            "win_rate": float((rets > 0).mean()) if len(rets) else 0.0,
+            "avg_ret": float(rets.mean()) if len(rets) else 0.0,
+            "pnl": float(sum(t.pnl for t in self.trades)),
+            "max_positions": int(self.equity["positions"].max()) if len(eq) else 0,
+            "avg_exposure": float(self.equity["exposure"].mean()) if len(eq) else 0.0,
+        }
+
+
+def run_portfolio(
+    panel: Panel,
+    cfg: Optional[PortfolioConfig] = None,
+    *,
+    min_score: float,
+    gate=None,
+    tickers: Optional[Sequence[str]] = None,
+    warmup: int = 300,
+) -> PortfolioResult:
+    """Multi-position executor sized and risk-checked by the live broker functions.
+
+    Per bar (all at the bar close):
+    1. exits: open positions whose ticker has a bar exit on close >= tp / close <= sl
+       (the intent's prices) or after hold_max bars; cash += qty * close.
+    2. entries (if positions < max_open_pos and the day's buy budget is left): every
+       eligible, gate-passing signal of a ticker not already held is turned into an intent
+       with broker.order_router.try_build_order_intent (compute_qty on the current cash,
+       max_sl_pct / max_position_pct / notional caps), ranked by
+       broker.intent_eval.compute_metrics; the top max_buys_per_bar are bought unless the
+       open-risk cap (sum of compute_metrics risk_usd, as state_store.total_open_risk_usd)
+       or the cash buffer would be exceeded (live: then nothing is bought this scan).
+    3. the bar's cash / equity (cash + positions at last close) / open risk is recorded.
+
+    panel.fields: sl / tp (the signal's sl_price / tp_price; cells without them are not
+    traded), above_ma50 and dollar_vol (20d average dollar volume) for the router filters.
+    Open positions live in fixed-size slot arrays (max_open_pos), not dicts.
+    """
+    from broker.intent_eval import compute_metrics
+    from broker.order_router import PaperTradeConfig, try_build_order_intent
+
+    cfg = cfg or PortfolioConfig()
+    paper = cfg.paper or PaperTradeConfig()
+    cols = panel.columns(tickers)
+    T = len(panel.times)
+    curve_cols = ["cash", "equity", "open_risk", "positions", "exposure"]
+    if not len(cols) or not T:
+        return PortfolioResult([], pd.DataFrame(columns=curve_cols), {})
+
+    close, bar, score, mode = panel.close[:, cols], panel.bar[:, cols], panel.score[:, cols], panel.mode[:, cols]
+    f = {k: v[:, cols] for k, v in panel.fields.items()}
+    nan = np.full(close.shape, np.nan)
+    sl_px, tp_px = f.get("sl", nan), f.get("tp", nan)
+    above50, dollar_vol = f.get("above_ma50", nan), f.get("dollar_vol", nan)
+    elig = eligible_mask(panel, cols, min_score, warmup) & ~np.isnan(sl_px) & ~np.isnan(tp_px)
+    has_cand = elig.any(axis=1)
+    times, days = panel.times, panel.day
+    names = [panel.tickers[k] for k in cols]
+
+    # position book: one slot per allowed open position
+    S = max(1, int(cfg.max_open_pos))
+    s_col = np.full(S, -1)
+    s_qty = np.zeros(S)
+    s_entry = np.zeros(S)
+    s_sl = np.zeros(S)
+    s_tp = np.zeros(S)
+    s_risk = np.zeros(S)
+    s_bar = np.zeros(S, dtype=np.int64)
+    s_last = np.zeros(S)
+    s_time: List[Optional[pd.Timestamp]] = [None] * S
+    s_meta: List[Tuple[str, float]] = [("", 0.0)] * S
+    held = np.zeros(len(cols), dtype=bool)
+
+    cash = float(cfg.initial_cash)
+    trades: List[PortfolioTrade] = []
+    skips: Dict[str, int] = {}
+    buys: Dict[int, int] = {}
+    curve = np.zeros((T, len(curve_cols)))
+
+    def close_slot(j: int, t: int, price: float, reason: str) -> None:
+        nonlocal cash
+        c = s_col[j]
+        cash += s_qty[j] * price
+        r = (price - s_entry[j]) / s_entry[j]
+        m, sc = s_meta[j]
+        trades.append(PortfolioTrade(s_time[j], times[t] if t >= 0 else panel.last_time[cols[c]], names[c],
+                                     float(s_entry[j]), float(price), float(r), reason,
+                                     qty=int(s_qty[j]), pnl=float(s_qty[j] * (price - s_entry[j])),
+                                     exec_mode=m, score=sc))
+        held[c] = False
+        s_col[j] = -1
+        s_qty[j] = s_risk[j] = 0.0
+
+    for t in range(T):
+        open_ = np.flatnonzero(s_col >= 0)
+        if len(open_):
+            c = s_col[open_]
+            i = bar[t, c]
+            live = i >= 0
+            px = close[t, c]
+            s_last[open_[live]] = px[live]
+            out = live & ((px >= s_tp[open_]) | (px <= s_sl[open_]) | ((i - s_bar[open_]) >= cfg.hold_max))
+            for j, p_, hit_tp, hit_sl in zip(open_[out], px[out], (px >= s_tp[open_])[out], (px <= s_sl[open_])[out]):
+                close_slot(j, t, float(p_), "TP" if hit_tp else "SL" if hit_sl else "HOLD_MAX")
+
+        n_open = int((s_col >= 0).sum())
+        if has_cand[t] and n_open < S and buys.get(days[t], 0) < cfg.max_new_buys_per_day:
+            ts = times[t]
+            ranked = []
+            sizing = replace(paper, equity=cash)
+            for c in np.flatnonzero(elig[t] & ~held):
+                s, m = float(score[t, c]), MODES[mode[t, c]]
+                why = "first"
+                if gate is not None:
+                    ok, why = gate.check(names[c], ts, s, m)
+                    if not ok:
+                        continue
+                last = float(close[t, c])
+                if last > cash * cfg.max_price_pct_equity:
+                    skips["SKIP_HIGH_PRICE"] = skips.get("SKIP_HIGH_PRICE", 0) + 1
+                    continue
+                if last < cfg.min_price_usd:
+                    skips["SKIP_LOW_PRICE"] = skips.get("SKIP_LOW_PRICE", 0) + 1
+                    continue
+                sig = {
+                    "ticker": names[c], "exec_mode": m, "score": s, "price": last,
+                    "sl_price": float(sl_px[t, c]), "tp_price": float(tp_px[t, c]),
+                    "above_ma50": bool(above50[t, c] == 1),
+                    "avg_dollar_vol_20d": 0.0 if np.isnan(dollar_vol[t, c]) else float(dollar_vol[t, c]),
+                }
+                intent, reason = try_build_order_intent(sig, {"last": last, "bid": None, "ask": None}, sizing)
+                if not intent:
+                    skips[reason] = skips.get(reason, 0) + 1
+                    continue
+                ranked.append((compute_metrics(intent, signal_score=s), intent, c, s, m, why))
+            ranked.sort(key=lambda x: x[0].score, reverse=True)
+
+            open_risk = float(s_risk.sum())
+            for metrics, intent, c, s, m, why in ranked[:max(1, int(cfg.max_buys_per_bar))]:
+                if int((s_col >= 0).sum()) >= S or buys.get(days[t], 0) >= cfg.max_new_buys_per_day:
+                    break
+                if open_risk + metrics.risk_usd > cash * cfg.total_risk_cap_pct:
+                    skips["SKIP_RISK_CAP"] = skips.get("SKIP_RISK_CAP", 0) + 1
+                    break
+                if cash - metrics.notional < cfg.min_cash_buffer:
+                    skips["SKIP_CASH_BUFFER"] = skips.get("SKIP_CASH_BUFFER", 0) + 1
+                    break
+                if gate is not None:
+                    gate.mark(names[c], ts, s, m, why)
+                j = int(np.flatnonzero(s_col < 0)[0])
+                px = float(intent.limit_price)
+                s_col[j], s_qty[j], s_entry[j] = c, intent.qty, px
+                s_sl[j], s_tp[j], s_risk[j] = float(intent.sl_price), float(intent.tp_price), metrics.risk_usd
+                s_bar[j], s_last[j], s_time[j], s_meta[j] = int(bar[t, c]), float(close[t, c]), ts, (m, s)
+                held[c] = True
+                cash -= metrics.notional
+                open_risk += metrics.risk_usd
+                buys[days[t]] = buys.get(days[t], 0) + 1
+
+        mv = float((s_qty * s_last).sum())
+        curve[t] = (cash, cash + mv, float(s_risk.sum()), int((s_col >= 0).sum()), mv / (cash + mv) if cash + mv else 0.0)
+
+    for j in np.flatnonzero(s_col >= 0):
+        close_slot(int(j), -1, float(panel.last_close[cols[s_col[j]]]), "EOD")
+
+    equity = pd.DataFrame(curve, index=times, columns=curve_cols)
+    equity["positions"] = equity["positions"].astype(int)
+    return PortfolioResult(trades, equity, skips)
@@ -51,6 +51,10 @@ class StructureParams:
     rr: float = 5 / 3
 
 
+# indicator columns read by the signals below (analyzer.indicators.compute_indicators needs)
+STRUCTURE_NEEDS = frozenset({"atr14", "ma50", "ma200", "above_ma200"})
+
+
 def _ma_slope_pct(ma: pd.Series, window: int = 50) -> float:
     try:
         w = max(5, int(window))
@@ -266,3 +270,156 @@ def structure_2buy_signal(df: pd.DataFrame, i: int, p: StructureParams) -> Optio
         "rr": float(p.rr),
         "zone_level": zone_level,
     }
+
+
+# ---------------------------------------------------------------------------
+# Whole-series detection
+#
+# Same rules as structure_1buy_signal / structure_2buy_signal, evaluated for every bar
+# in one call (replay / backtest loops). Bar i still only sees bars <= i:
+# - boxes: rolling max/min of high/low ending at box_end = i - pullback_max_bars
+# - MA200 slope: ma200[i] vs ma200[i - 49] (what _ma_slope_pct reads for df[:i+1])
+# - breakout: first close > breakout_req[i] in the pullback window (i-W, i], found with a
+#   forward scan over a (bars, W) sliding-window view; pullback low = min low from there to i
+# ---------------------------------------------------------------------------
+
+SERIES_COLUMNS = ["signal", "box_high", "box_low", "breakout_i", "entry", "sl", "tp", "rr"]
+
+
+def _col(df: pd.DataFrame, name: str, default) -> np.ndarray:
+    if name in df.columns:
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)
+    return np.broadcast_to(np.asarray(default, dtype=float), (len(df),)).copy()
+
+
+def _structure_base(df: pd.DataFrame, p: StructureParams, min_bars_ago: int) -> Dict[str, np.ndarray]:
+    """Shared part of 1buy/2buy: trend filters, prior box, first breakout, pullback low."""
+    n = len(df)
+    idx = np.arange(n)
+    close = _col(df, "close", 0.0)
+    high = _col(df, "high", np.nan)
+    low = _col(df, "low", np.nan)
+    atr = _col(df, "atr14", 0.0)
+    atr = np.where(atr > 0, atr, 0.0)
+
+    W = int(p.pullback_max_bars)
+    reject = (idx < p.box_lookback + p.pullback_max_bars + 5) | (close <= 0)
+
+    if p.require_above_ma200:
+        reject |= _col(df, "above_ma200", 0.0) != 1
+
+    if p.require_ma200_slope_nonneg and "ma200" in df.columns:
+        ma200 = _col(df, "ma200", np.nan)
+        w = 50
+        a = np.full(n, np.nan)
+        a[w - 1:] = ma200[: n - w + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(a == 0, 0.0, (ma200 / a - 1.0) * 100.0)
+        slope = np.where(idx + 1 < w + 1, 0.0, slope)
+        reject |= slope < 0
+
+    # prior box ending at box_end = i - W (compute_box: window of max(20, lookback) bars, clipped at 0)
+    lb = max(20, int(p.box_lookback))
+    box_high = np.full(n, np.nan)
+    box_low = np.full(n, np.nan)
+    if 0 <= W < n:
+        box_high[W:] = pd.Series(high).rolling(lb, min_periods=1).max().to_numpy()[: n - W]
+        box_low[W:] = pd.Series(low).rolling(lb, min_periods=1).min().to_numpy()[: n - W]
+
+    breakout_i = np.full(n, -1, dtype=np.int64)
+    pb_low = np.full(n, np.nan)
+    if W < 1 or n < W:
+        reject[:] = True
+    else:
+        req = box_high + p.breakout_buffer_atr * atr
+        cw = np.lib.stride_tricks.sliding_window_view(close, W)       # row r <-> bar i = r + W - 1
+        lw = np.lib.stride_tricks.sliding_window_view(low, W)
+        with np.errstate(invalid="ignore"):
+            mask = cw > req[W - 1:, None]
+        has = mask.any(axis=1)
+        pos = np.argmax(mask, axis=1)
+        bi = idx[W - 1:] - W + 1 + pos
+
+        in_pb = np.arange(W)[None, :] >= pos[:, None]
+        vals = np.where(in_pb & np.isfinite(lw), lw, np.inf).min(axis=1)
+        pb_low[W - 1:] = np.where(np.isinf(vals), np.nan, vals)
+        breakout_i[W - 1:] = np.where(has, bi, -1)
+
+        reject[: W - 1] = True
+        reject[W - 1:] |= ~has
+        reject |= (idx - breakout_i) < min_bars_ago
+
+    return {
+        "reject": reject, "close": close, "atr": atr,
+        "box_high": box_high, "box_low": box_low,
+        "breakout_i": breakout_i, "pb_low": pb_low,
+    }
+
+
+def _series_frame(df: pd.DataFrame, b: Dict[str, np.ndarray], sl: np.ndarray, p: StructureParams, **extra) -> pd.DataFrame:
+    close = b["close"]
+    with np.errstate(invalid="ignore"):
+        b["reject"] |= sl >= close
+    ok = ~b["reject"]
+    out = pd.DataFrame({
+        "signal": ok,
+        "box_high": b["box_high"],
+        "box_low": b["box_low"],
+        "breakout_i": b["breakout_i"],
+        "entry": close,
+        "sl": sl,
+        "tp": close + p.rr * (close - sl),
+        "rr": float(p.rr),
+        **extra,
+    }, index=df.index)
+    return out
+
+
+def structure_1buy_series(df: pd.DataFrame, p: StructureParams) -> pd.DataFrame:
+    """structure_1buy_signal for every bar: one row per bar, `signal` marks the hits."""
+    b = _structure_base(df, p, p.min_breakout_bars_ago)
+    close, atr, level, pb_low = b["close"], b["atr"], b["box_high"], b["pb_low"]
+    with np.errstate(invalid="ignore"):
+        pulled_back = pb_low <= level
+        held = pb_low >= level - p.hold_buffer_atr * atr
+        b["reject"] |= ~(pulled_back & held)
+        b["reject"] |= close <= level + p.confirm_close_buffer_atr * atr
+    sl = pb_low - 0.1 * atr
+    return _series_frame(df, b, sl, p)
+
+
+def structure_2buy_series(df: pd.DataFrame, p: StructureParams) -> pd.DataFrame:
+    """structure_2buy_signal for every bar (adds zone_level)."""
+    b = _structure_base(df, p, 6)
+    close, atr, level, pb_low = b["close"], b["atr"], b["box_high"], b["pb_low"]
+    ma50 = _col(df, "ma50", close) if "ma50" in df.columns else close
+    with np.errstate(invalid="ignore"):
+        # Python max() argument order matters with NaN: max(level, ma50) / max(ma50, level)
+        zone_level = np.where(ma50 > level, ma50, level)
+        confirm_level = np.where(level > ma50, level, ma50)
+        tagged = pb_low <= zone_level
+        held = pb_low >= zone_level - p.hold_buffer_atr * atr
+        b["reject"] |= ~(tagged & held)
+        b["reject"] |= close <= confirm_level + p.confirm_close_buffer_atr * atr
+    sl = pb_low - 0.1 * atr
+    return _series_frame(df, b, sl, p, zone_level=zone_level)
+
+
+def series_signal(frame: pd.DataFrame, i: int, typ: str) -> Optional[Dict]:
+    """Row i of a *_series frame as the dict structure_{typ}_signal(df, i, p) returns (or None)."""
+    r = frame.iloc[i]
+    if not bool(r["signal"]):
+        return None
+    sig = {
+        "type": typ,
+        "box_high": float(r["box_high"]),
+        "box_low": float(r["box_low"]),
+        "breakout_i": int(r["breakout_i"]),
+        "entry": float(r["entry"]),
+        "sl": float(r["sl"]),
+        "tp": float(r["tp"]),
+        "rr": float(r["rr"]),
+    }
+    if "zone_level" in frame.columns:
+        sig["zone_level"] = float(r["zone_level"])
+    return sig